@@ -0,0 +1,186 @@
+"""
+Admission control: requests are grouped into route classes, each with a
+limit of concurrent requests and a bounded wait queue. Requests over the
+limit wait in the queue, requests that find the queue full or wait longer
+than the queue timeout are shed with 503 and Retry-After, so that latency
+of accepted requests stays bounded under overload.
+"""
+import asyncio
+import time
+import typing
+from collections import deque
+
+from starlette.responses import JSONResponse
+
+from app.config import settings
+from app.metrics import admission_queue_wait
+
+AUTH, READ, WRITE, BULK = 'auth', 'read', 'write', 'bulk'
+# Cheap endpoints that must answer under overload
+EXEMPT_PATHS = {'/', '/metrics', '/docs', '/redoc', '/openapi.json'}
+# Writes of the user router hash passwords or issue tokens
+AUTH_PATH = '/user'
+BULK_PATHS = {'/links/bulk', '/links/export'}
+READ_METHODS = {'GET', 'HEAD'}
+
+
+def classify(method: str, path: str) -> typing.Optional[str]:
+    """
+    Return route class of a request, None if it is not limited.
+    """
+    if method == 'OPTIONS' or path in EXEMPT_PATHS:
+        return None
+    if path in BULK_PATHS:
+        return BULK
+    if method in READ_METHODS:
+        return READ
+    if path == AUTH_PATH or path.startswith(AUTH_PATH + '/'):
+        return AUTH
+    return WRITE
+
+
+class AdmissionLimit:
+    """
+    Concurrency limit of one route class with a bounded FIFO wait queue.
+    Used from the event loop only, a released slot is handed to the oldest
+    waiter so that new requests cannot overtake queued ones.
+    """
+    def __init__(self, name: str, limit: int, queue_size: int):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self.admitted = 0
+        self.shed_full = 0
+        self.shed_timeout = 0
+        self._waiters: typing.Deque[asyncio.Future] = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> bool:
+        """
+        Take a slot, waiting at most timeout seconds in the queue.
+        Return False if the request is shed.
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.shed_full += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self.shed_timeout += 1
+            admission_queue_wait.observe(time.perf_counter() - start, route_class=self.name, outcome='timeout')
+            return False
+        except asyncio.CancelledError:
+            # Client went away, give back a slot handed over meanwhile
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+        admission_queue_wait.observe(time.perf_counter() - start, route_class=self.name, outcome='admitted')
+        return True
+
+    def release(self) -> None:
+        """
+        Give the slot to the oldest waiter or free it.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        """
+        Return limit statistics.
+        """
+        return {
+            'limit': self.limit,
+            'queue_size': self.queue_size,
+            'active': self.active,
+            'queue_depth': self.queue_depth,
+            'admitted': self.admitted,
+            'shed_full': self.shed_full,
+            'shed_timeout': self.shed_timeout,
+        }
+
+
+class AdmissionControl:
+    """
+    Limits of all route classes with the shared queue timeout.
+    """
+    def __init__(self, limits: typing.Dict[str, int], queue_size: int, queue_timeout: float, retry_after: int):
+        self.limits = {name: AdmissionLimit(name, limit, queue_size) for name, limit in limits.items()}
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+    def get_limit(self, method: str, path: str) -> typing.Optional[AdmissionLimit]:
+        """
+        Return limit of given request, None if it is not limited.
+        """
+        route_class = classify(method, path)
+        return self.limits.get(route_class) if route_class is not None else None
+
+    def stats(self) -> typing.Iterator[typing.Tuple[str, dict]]:
+        """
+        Yield name and statistics of every route class.
+        """
+        for name, limit in self.limits.items():
+            yield name, limit.stats()
+
+
+admission_control = AdmissionControl(
+    {
+        AUTH: int(settings.ADMISSION_AUTH_LIMIT),
+        READ: int(settings.ADMISSION_READ_LIMIT),
+        WRITE: int(settings.ADMISSION_WRITE_LIMIT),
+        BULK: int(settings.ADMISSION_BULK_LIMIT),
+    },
+    int(settings.ADMISSION_QUEUE_SIZE),
+    float(settings.ADMISSION_QUEUE_TIMEOUT),
+    int(settings.ADMISSION_RETRY_AFTER),
+)
+
+
+class AdmissionMiddleware:
+    """
+    Admit HTTP requests through the limit of their route class,
+    answer 503 with Retry-After when a request is shed.
+    """
+    def __init__(self, app, control: AdmissionControl = admission_control):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        limit = self.control.get_limit(scope['method'], scope['path'])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        if not await limit.acquire(self.control.queue_timeout):
+            response = JSONResponse(
+                {'detail': 'Server is busy, try again later.'},
+                status_code=503,
+                headers={'Retry-After': str(self.control.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
@@ -8,8 +8,50 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.environ.get('SECRET_KEY')
     ALGORITHM: str = os.environ.get('ALGORITHM')
     ACCESS_TOKEN_EXPIRE_MINUTES: int = os.environ.get('ACCESS_TOKEN_EXPIRE_MINUTES', 30)
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = os.environ.get('REFRESH_TOKEN_EXPIRE_MINUTES', 43200)
     TOKEN_TYPE: str = 'Bearer'
     ORIGINS: str = os.environ.get('ORIGINS')
+    MONGO_MAX_POOL_SIZE: int = os.environ.get('MONGO_MAX_POOL_SIZE', 100)
+    MONGO_MIN_POOL_SIZE: int = os.environ.get('MONGO_MIN_POOL_SIZE', 10)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)
+    MONGO_COMPRESSORS: str = os.environ.get('MONGO_COMPRESSORS', '')
+    MONGO_WRITE_CONCERN: str = os.environ.get('MONGO_WRITE_CONCERN', '')
+    MONGO_READ_CONCERN: str = os.environ.get('MONGO_READ_CONCERN', '')
+    USER_CACHE_SIZE: int = os.environ.get('USER_CACHE_SIZE', 1024)
+    USER_CACHE_TTL: int = os.environ.get('USER_CACHE_TTL', 60)
+    TOKEN_CACHE_SIZE: int = os.environ.get('TOKEN_CACHE_SIZE', 10000)
+    TOKEN_VERSION_REFRESH_SECONDS: int = os.environ.get('TOKEN_VERSION_REFRESH_SECONDS', 5)
+    REVOCATION_REFRESH_SECONDS: int = os.environ.get('REVOCATION_REFRESH_SECONDS', 5)
+    BULK_BATCH_SIZE: int = os.environ.get('BULK_BATCH_SIZE', 1000)
+    EXPORT_BATCH_SIZE: int = os.environ.get('EXPORT_BATCH_SIZE', 1000)
+    LINK_FILTER_ENABLED: bool = os.environ.get('LINK_FILTER_ENABLED', True)
+    LINK_FILTER_ERROR_RATE: float = os.environ.get('LINK_FILTER_ERROR_RATE', 0.01)
+    LINK_FILTER_REFRESH_SECONDS: float = os.environ.get('LINK_FILTER_REFRESH_SECONDS', 1)
+    LINK_FILTER_REBUILD_SECONDS: int = os.environ.get('LINK_FILTER_REBUILD_SECONDS', 600)
+    LINK_CACHE_ENABLED: bool = os.environ.get('LINK_CACHE_ENABLED', True)
+    LINK_CACHE_SIZE: int = os.environ.get('LINK_CACHE_SIZE', 4096)
+    LINK_CACHE_TTL: int = os.environ.get('LINK_CACHE_TTL', 300)
+    LINK_PAGE_CACHE_SIZE: int = os.environ.get('LINK_PAGE_CACHE_SIZE', 32)
+    LINK_PAGE_CACHE_TTL: float = os.environ.get('LINK_PAGE_CACHE_TTL', 2)
+    SEARCH_BACKEND: str = os.environ.get('SEARCH_BACKEND', 'memory')
+    SEARCH_REFRESH_SECONDS: int = os.environ.get('SEARCH_REFRESH_SECONDS', 5)
+    JSON_BACKEND: str = os.environ.get('JSON_BACKEND', 'orjson')
+    TRUSTED_ROWS: bool = os.environ.get('TRUSTED_ROWS', True)
+    SLOW_QUERY_MS: float = os.environ.get('SLOW_QUERY_MS', 100)
+    SLOW_QUERY_LOG_SIZE: int = os.environ.get('SLOW_QUERY_LOG_SIZE', 100)
+    SLOW_QUERY_EXPLAIN: bool = os.environ.get('SLOW_QUERY_EXPLAIN', False)
+    HASH_EXECUTOR: str = os.environ.get('HASH_EXECUTOR', 'thread')
+    HASH_WORKERS: int = os.environ.get('HASH_WORKERS', 2)
+    HASH_MAX_PENDING: int = os.environ.get('HASH_MAX_PENDING', 32)
+    ADMISSION_ENABLED: bool = os.environ.get('ADMISSION_ENABLED', True)
+    ADMISSION_AUTH_LIMIT: int = os.environ.get('ADMISSION_AUTH_LIMIT', 8)
+    ADMISSION_READ_LIMIT: int = os.environ.get('ADMISSION_READ_LIMIT', 64)
+    ADMISSION_WRITE_LIMIT: int = os.environ.get('ADMISSION_WRITE_LIMIT', 16)
+    ADMISSION_BULK_LIMIT: int = os.environ.get('ADMISSION_BULK_LIMIT', 2)
+    ADMISSION_QUEUE_SIZE: int = os.environ.get('ADMISSION_QUEUE_SIZE', 64)
+    ADMISSION_QUEUE_TIMEOUT: float = os.environ.get('ADMISSION_QUEUE_TIMEOUT', 2)
+    ADMISSION_RETRY_AFTER: int = os.environ.get('ADMISSION_RETRY_AFTER', 1)
 
     @property
     def get_origins(self) -> list[str]:
@@ -1,18 +1,92 @@
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi_pagination import add_pagination
 
+from app.admission import AdmissionMiddleware, admission_control
 from app.config import settings
-from routes import links, users
+from app.metrics import MetricsMiddleware, StatsCollector, registry
+from app.responses import FastJSONResponse
+from app.slow_queries import slow_query_log
+from db.database import close_client, connect, get_link_collection, get_user_collection
+from models.hashing import hash_pool
+from models.link_services import (
+    create_link_indexes,
+    get_link_filter,
+    get_search_index,
+    link_caches,
+    link_filters,
+    search_indexes
+)
+from models.user_services import (
+    create_user_indexes,
+    revocation_sets,
+    token_cache,
+    token_versions,
+    user_cache
+)
+from routes import admin, links, users
+
+
+def create_indexes():
+    """
+    Create database indexes.
+    """
+    create_link_indexes(get_link_collection())
+    create_user_indexes(get_user_collection())
+
 
+def build_link_filter():
+    """
+    Build bloom filter of stored urls.
+    """
+    link_collection = get_link_collection()
+    link_filter = get_link_filter(link_collection)
+    if link_filter is not None:
+        link_filter.rebuild(link_collection)
 
-app = FastAPI()
+
+def start_search_index():
+    """
+    Build in-process search index in the background.
+    """
+    link_collection = get_link_collection()
+    search_index = get_search_index(link_collection)
+    if search_index is not None:
+        threading.Thread(
+            target=search_index.refresh, args=(link_collection,), daemon=True).start()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Connect to the database and build indexes on startup,
+    stop workers and close database connections on shutdown.
+    """
+    connect()
+    create_indexes()
+    build_link_filter()
+    start_search_index()
+    yield
+    # Stop password hashing workers and explain worker of the slow query log
+    hash_pool.shutdown()
+    slow_query_log.shutdown()
+    close_client()
+
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # Routes
 app.include_router(links.router)
 app.include_router(users.router)
+app.include_router(admin.router)
 
-# Middleware
+# Middleware, admission runs innermost so shed requests get CORS headers and metrics
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, control=admission_control)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.get_origins,
@@ -20,6 +94,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 # Pagination
 add_pagination(app)
 
@@ -27,3 +102,46 @@ add_pagination(app)
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
+
+
+def cache_stats():
+    yield {'cache': 'user', 'collection': ''}, user_cache.stats()
+    yield {'cache': 'token', 'collection': ''}, token_cache.stats()
+    for collection, revocation_set in list(revocation_sets.items()):
+        yield {'cache': 'revoked_token', 'collection': collection}, revocation_set.stats()
+    for collection, versions in list(token_versions.items()):
+        yield {'cache': 'token_version', 'collection': collection}, versions.stats()
+    for collection, link_cache in list(link_caches.items()):
+        for layer, stats in link_cache.stats().items():
+            yield {'cache': f'link_{layer}', 'collection': collection}, stats
+
+
+def index_stats():
+    for kind, indexes in (('bloom', link_filters), ('search', search_indexes)):
+        for collection, index in list(indexes.items()):
+            yield {'index': kind, 'collection': collection}, index.stats()
+
+
+def pool_stats():
+    stats = hash_pool.stats()
+    yield {'pool': 'hash', 'executor': stats['executor']}, stats
+
+
+def admission_stats():
+    for route_class, stats in admission_control.stats():
+        yield {'route_class': route_class}, stats
+
+
+# Statistics of in-process caches, indexes and pools
+registry.register(StatsCollector('app_cache', 'In-process cache statistics.', cache_stats))
+registry.register(StatsCollector('app_index', 'In-process index statistics.', index_stats))
+registry.register(StatsCollector('app_pool', 'Worker pool statistics.', pool_stats))
+registry.register(StatsCollector('app_admission', 'Admission control statistics.', admission_stats))
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Return metrics in Prometheus text format.
+    """
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
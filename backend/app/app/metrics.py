@@ -0,0 +1,316 @@
+"""
+Minimal Prometheus metrics: histograms and gauges rendered in the text
+exposition format, an ASGI middleware timing requests by route template
+and pymongo listeners timing database commands and pool checkouts.
+"""
+import bisect
+import threading
+import time
+import typing
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Checkouts of idle connections take microseconds
+POOL_WAIT_BUCKETS = (0.0001, 0.00025, 0.0005) + DEFAULT_BUCKETS
+# Route label of requests that did not match any route
+UNMATCHED_ROUTE = 'unmatched'
+# Other methods are labelled 'other' to keep label values bounded
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+def escape_label(value: typing.Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: typing.Dict[str, typing.Any]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + '}'
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class Metric:
+    """
+    Base of metrics with a fixed set of label names.
+    """
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> typing.Iterator[typing.Tuple[str, dict, float]]:
+        """
+        Yield name, labels and value of every sample.
+        """
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(f'{name}{format_labels(labels)} {format_value(value)}' for name, labels, value in self.samples())
+        return '\n'.join(lines)
+
+
+class Gauge(Metric):
+    """
+    Value that goes up and down.
+    """
+    type = 'gauge'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> typing.Iterator[typing.Tuple[str, dict, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    """
+    Observations counted in cumulative buckets.
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (),
+                 buckets: typing.Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Count per bucket, the last one is +Inf, then sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[position] += 1
+            counts[-1] += value
+
+    def samples(self) -> typing.Iterator[typing.Tuple[str, dict, float]]:
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', {**labels, 'le': format_value(bound)}, cumulative
+            yield f'{self.name}_sum', labels, counts[-1]
+            yield f'{self.name}_count', labels, cumulative
+
+
+class StatsCollector:
+    """
+    Gauges read at scrape time from stats() dictionaries of caches, pools
+    and indexes. The source yields labels and stats of every instance,
+    numeric values become samples of `<prefix>_<key>` gauges.
+    """
+    def __init__(self, prefix: str, documentation: str,
+                 source: typing.Callable[[], typing.Iterable[typing.Tuple[dict, dict]]]):
+        self.prefix = prefix
+        self.documentation = documentation
+        self.source = source
+
+    def render(self) -> str:
+        families: typing.Dict[str, typing.List[str]] = {}
+        for labels, stats in self.source():
+            for key, value in stats.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f'{self.prefix}_{key}'
+                families.setdefault(name, []).append(f'{name}{format_labels(labels)} {format_value(value)}')
+        lines = []
+        for name, samples in families.items():
+            lines.extend([f'# HELP {name} {self.documentation}', f'# TYPE {name} gauge'])
+            lines.extend(samples)
+        return '\n'.join(lines)
+
+
+class Registry:
+    """
+    Collection of metrics rendered together.
+    """
+    def __init__(self):
+        self._collectors: list = []
+
+    def register(self, collector: typing.Any) -> typing.Any:
+        self._collectors.append(collector)
+        return collector
+
+    def render(self) -> str:
+        parts = [collector.render() for collector in self._collectors]
+        return '\n'.join(part for part in parts if part) + '\n'
+
+
+registry = Registry()
+http_request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency.', ['method', 'route', 'status']))
+http_requests_in_flight = registry.register(Gauge(
+    'http_requests_in_flight', 'HTTP requests being handled.', ['method']))
+mongo_command_duration = registry.register(Histogram(
+    'mongo_command_duration_seconds', 'Mongo command latency.', ['collection', 'command', 'outcome']))
+mongo_pool_checkout_wait = registry.register(Histogram(
+    'mongo_pool_checkout_wait_seconds', 'Time waited for a pooled Mongo connection.', ['outcome'],
+    buckets=POOL_WAIT_BUCKETS))
+mongo_pool_connections = registry.register(Gauge(
+    'mongo_pool_connections', 'Open Mongo connections.', ['address']))
+mongo_pool_checked_out = registry.register(Gauge(
+    'mongo_pool_checked_out_connections', 'Mongo connections in use.', ['address']))
+admission_queue_wait = registry.register(Histogram(
+    'http_admission_queue_wait_seconds', 'Time requests waited for admission.', ['route_class', 'outcome']))
+
+
+class MetricsMiddleware:
+    """
+    Time HTTP requests by method, route template and status code.
+    Route templates keep label values bounded, raw paths are never used.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        method = scope['method'] if scope['method'] in HTTP_METHODS else 'other'
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        http_requests_in_flight.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(method=method)
+            # Matched route is stored in the scope by the router
+            route = scope.get('route')
+            http_request_duration.observe(
+                time.perf_counter() - start, method=method,
+                route=getattr(route, 'path', UNMATCHED_ROUTE), status=status_code)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Time Mongo commands by collection and command name.
+    """
+    def __init__(self):
+        # Collection of started commands by request and connection id
+        self._collections: typing.Dict[tuple, str] = {}
+
+    @staticmethod
+    def _event_key(event) -> tuple:
+        return event.request_id, event.connection_id
+
+    def started(self, event) -> None:
+        name = event.command_name
+        # getMore names the cursor id, the collection is a separate field
+        collection = event.command.get('collection' if name == 'getMore' else name)
+        self._collections[self._event_key(event)] = collection if isinstance(collection, str) else ''
+
+    def _observe(self, event, outcome: str) -> None:
+        collection = self._collections.pop(self._event_key(event), '')
+        mongo_command_duration.observe(
+            event.duration_micros / 1e6, collection=collection, command=event.command_name, outcome=outcome)
+
+    def succeeded(self, event) -> None:
+        self._observe(event, 'success')
+
+    def failed(self, event) -> None:
+        self._observe(event, 'failure')
+
+
+command_metrics = CommandMetrics()
+
+
+def format_address(address: tuple) -> str:
+    host, port = address
+    return f'{host}:{port}' if port is not None else host
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Time connection checkouts and count open and checked out connections.
+    Checkout start and end events are published by the thread checking
+    the connection out, so start times are kept per thread.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def _observe_checkout(self, outcome: str) -> None:
+        start = getattr(self._local, 'start', None)
+        if start is not None:
+            self._local.start = None
+            mongo_pool_checkout_wait.observe(time.perf_counter() - start, outcome=outcome)
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.start = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        self._observe_checkout('success')
+        mongo_pool_checked_out.inc(address=format_address(event.address))
+
+    def connection_check_out_failed(self, event) -> None:
+        # Reason is one of timeout, poolClosed or connectionError
+        self._observe_checkout(event.reason)
+
+    def connection_checked_in(self, event) -> None:
+        mongo_pool_checked_out.dec(address=format_address(event.address))
+
+    def connection_created(self, event) -> None:
+        mongo_pool_connections.inc(address=format_address(event.address))
+
+    def connection_closed(self, event) -> None:
+        mongo_pool_connections.dec(address=format_address(event.address))
+
+    # Not measured, the base class raises NotImplementedError for every event
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+
+pool_metrics = PoolMetrics()
@@ -0,0 +1,89 @@
+import hashlib
+import typing
+
+import ujson
+from bson.objectid import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
+
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_default(obj: typing.Any) -> typing.Any:
+    """
+    Convert values json libraries can not encode natively.
+    """
+    if isinstance(obj, BaseModel):
+        # Shallow, the encoder calls this again for nested models
+        return {field.alias: obj.__dict__.get(name) for name, field in obj.__fields__.items()}
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    # Datetime for ujson, enums, urls, decimals etc.
+    return pydantic_encoder(obj)
+
+
+def orjson_dumps(content: typing.Any) -> bytes:
+    return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def ujson_dumps(content: typing.Any) -> bytes:
+    return ujson.dumps(
+        content, ensure_ascii=False, escape_forward_slashes=False, default=json_default
+    ).encode('utf-8')
+
+
+JSON_ENCODERS = {
+    'orjson': orjson_dumps,
+    'ujson': ujson_dumps,
+}
+
+
+def get_json_encoder(backend: str) -> typing.Callable[[typing.Any], bytes]:
+    """
+    Return JSON encoder of given backend, ujson if orjson is not installed.
+    """
+    if backend not in JSON_ENCODERS:
+        raise ValueError(f'JSON backend must be one of {", ".join(JSON_ENCODERS)}, not {backend!r}.')
+    if backend == 'orjson' and orjson is None:
+        backend = 'ujson'
+    return JSON_ENCODERS[backend]
+
+
+# Fail on import for a misconfigured backend, not on every response
+get_json_encoder(settings.JSON_BACKEND)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson or ujson, see JSON_BACKEND setting.
+    Datetime, ObjectId and pydantic models can be passed as content directly,
+    without jsonable_encoder.
+    """
+    def render(self, content: typing.Any) -> bytes:
+        return get_json_encoder(settings.JSON_BACKEND)(content)
+
+
+def make_etag(*parts: typing.Any) -> str:
+    """
+    Return strong ETag of given parts.
+    """
+    digest = hashlib.sha1('\x00'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: typing.Optional[str], etag: str) -> bool:
+    """
+    Return True if If-None-Match header value matches given ETag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match uses weak comparison
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
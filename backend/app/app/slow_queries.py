@@ -0,0 +1,198 @@
+"""
+Slow Mongo operation log built on pymongo command monitoring.
+Commands slower than a threshold are logged with the shape of their
+filter, values are never recorded. Query plans can be captured with
+explain in a background thread.
+"""
+import logging
+import threading
+import typing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from pymongo import MongoClient, monitoring
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Command name to field holding the filter
+FILTER_FIELDS = {
+    'find': 'filter',
+    'count': 'query',
+    'distinct': 'query',
+    'findAndModify': 'query',
+    'aggregate': 'pipeline',
+}
+# Commands with a list of statements, the first statement filter is used
+STATEMENT_FIELDS = {
+    'update': 'updates',
+    'delete': 'deletes',
+}
+EXPLAINABLE = set(FILTER_FIELDS) | set(STATEMENT_FIELDS)
+# Command fields added by the driver, explain rejects them
+DRIVER_FIELDS = {'lsid', 'txnNumber', 'autocommit', 'startTransaction'}
+
+
+def query_shape(value: typing.Any) -> typing.Any:
+    """
+    Return given filter with values replaced by '?', keeping field names
+    and operators.
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Clauses of $and/$or and pipeline stages are shaped one by one,
+        # plain values like $in operands collapse so their number does not matter
+        if any(isinstance(item, (dict, list, tuple)) for item in value):
+            return [query_shape(item) for item in value]
+        return ['?'] if value else []
+    return '?'
+
+
+def get_command_filter(command_name: str, command: typing.Mapping) -> typing.Any:
+    """
+    Return filter of given command, None if it has none.
+    """
+    if command_name in FILTER_FIELDS:
+        return command.get(FILTER_FIELDS[command_name], {})
+    if command_name in STATEMENT_FIELDS:
+        statements = command.get(STATEMENT_FIELDS[command_name]) or [{}]
+        return statements[0].get('q', {})
+    return None
+
+
+def summarize_plan(explain: dict) -> dict:
+    """
+    Return stages and index names of the winning plan of explain output.
+    """
+    plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+    # Plans of newer servers are wrapped in queryPlan
+    plan = plan.get('queryPlan', plan)
+    stages, indexes = [], []
+    while plan:
+        stages.append(plan.get('stage', '?'))
+        if 'indexName' in plan:
+            indexes.append(plan['indexName'])
+        plan = plan.get('inputStage') or (plan.get('inputStages') or [None])[0]
+    return {'stages': stages, 'indexes': indexes, 'collscan': 'COLLSCAN' in stages}
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """
+    Record commands slower than threshold_ms in a ring buffer of given size.
+    """
+    # Slow commands are not explained while this many explains wait
+    MAX_PENDING_EXPLAINS = 8
+
+    def __init__(self, threshold_ms: float, size: int, explain: bool = False):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.client: typing.Optional[MongoClient] = None
+        self._entries: deque = deque(maxlen=size)
+        # Started commands by request and connection id
+        self._started: typing.Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._executor: typing.Optional[ThreadPoolExecutor] = None
+        self._pending_explains = 0
+
+    def attach(self, client: MongoClient) -> None:
+        """
+        Use given client to run explain.
+        """
+        self.client = client
+
+    @staticmethod
+    def _event_key(event) -> tuple:
+        return event.request_id, event.connection_id
+
+    def started(self, event) -> None:
+        name = event.command_name
+        collection = event.command.get('collection' if name == 'getMore' else name)
+        # Only commands with a filter are kept, inserts may be large
+        command = event.command if name in EXPLAINABLE else {}
+        self._started[self._event_key(event)] = (event.database_name, collection, command)
+
+    def succeeded(self, event) -> None:
+        self._finished(event, 'success')
+
+    def failed(self, event) -> None:
+        self._finished(event, 'failure')
+
+    def _finished(self, event, outcome: str) -> None:
+        started = self._started.pop(self._event_key(event), None)
+        duration_ms = event.duration_micros / 1000
+        if started is None or duration_ms < self.threshold_ms:
+            return
+        database, collection, command = started
+        command_filter = get_command_filter(event.command_name, command)
+        entry = {
+            'date': datetime.utcnow(),
+            'database': database,
+            'collection': collection if isinstance(collection, str) else '',
+            'command': event.command_name,
+            'outcome': outcome,
+            'duration_ms': duration_ms,
+            'filter': query_shape(command_filter) if command_filter is not None else None,
+            'sort': query_shape(command.get('sort')) if command.get('sort') else None,
+            'plan': None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+        logger.warning(
+            'Slow mongo %s on %s.%s took %.1f ms, filter %s',
+            entry['command'], database, entry['collection'], duration_ms, entry['filter'])
+        if self.explain and self.client is not None and event.command_name in EXPLAINABLE:
+            self._submit_explain(entry, database, command)
+
+    def _submit_explain(self, entry: dict, database: str, command: typing.Mapping) -> None:
+        with self._lock:
+            if self._pending_explains >= self.MAX_PENDING_EXPLAINS:
+                entry['plan'] = {'error': 'Explain skipped, too many pending.'}
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain')
+            self._pending_explains += 1
+            self._executor.submit(self._explain, entry, database, command)
+
+    def _explain(self, entry: dict, database: str, command: typing.Mapping) -> None:
+        # Runs in the background, explain of a slow query can be slow too
+        explained = {key: value for key, value in command.items()
+                     if not key.startswith('$') and key not in DRIVER_FIELDS}
+        try:
+            result = self.client[database].command(
+                {'explain': explained, 'verbosity': 'queryPlanner'})
+            entry['plan'] = summarize_plan(result)
+        except Exception as e:
+            entry['plan'] = {'error': str(e)}
+        finally:
+            with self._lock:
+                self._pending_explains -= 1
+
+    def entries(self, limit: int = None) -> typing.List[dict]:
+        """
+        Return recorded slow commands, newest first.
+        """
+        with self._lock:
+            entries = list(reversed(self._entries))
+        return entries[:limit] if limit is not None else entries
+
+    def clear(self) -> None:
+        """
+        Remove recorded slow commands.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        Stop explain worker.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_MS, settings.SLOW_QUERY_LOG_SIZE, settings.SLOW_QUERY_EXPLAIN)
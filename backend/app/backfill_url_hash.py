@@ -0,0 +1,53 @@
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+
+from db.database import get_link_collection
+from models.link_services import create_link_indexes
+from models.urls import get_url_hash
+
+
+def backfill_url_hash(collection: Collection = None, batch_size: int = 1000) -> dict:
+    """
+    Store canonical url hash on links added before url normalization.
+    Return number of updated links and ids of links that duplicate
+    another link after normalization, those are left without hash.
+    """
+    if collection is None:
+        collection = get_link_collection()
+    create_link_indexes(collection)
+    updated = 0
+    duplicates = []
+
+    def write(link_ids):
+        nonlocal updated
+        requests = [
+            UpdateOne({'_id': link_id}, {'$set': {'url_hash': hashes[link_id]}})
+            for link_id in link_ids]
+        try:
+            updated += collection.bulk_write(requests, ordered=False).modified_count
+        except BulkWriteError as e:
+            updated += e.details.get('nModified', 0)
+            duplicates.extend(link_ids[error['index']] for error in e.details['writeErrors'])
+        hashes.clear()
+
+    hashes = {}
+    for obj in collection.find({'url_hash': {'$exists': False}}, {'url': 1}):
+        hashes[obj['_id']] = get_url_hash(obj['url'])
+        if len(hashes) >= batch_size:
+            write(list(hashes))
+    if hashes:
+        write(list(hashes))
+
+    # Url hash index replaces the old unique url index
+    if 'url_1' in collection.index_information():
+        collection.drop_index('url_1')
+    return {'updated': updated, 'duplicates': duplicates}
+
+
+if __name__ == "__main__":
+    result = backfill_url_hash()
+    print(f"Updated {result['updated']} links.")
+    for link_id in result['duplicates']:
+        print(f"Link {link_id} duplicates another link after normalization.")
+    print("Restart the API so that link filters are rebuilt.")
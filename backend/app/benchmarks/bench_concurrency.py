@@ -0,0 +1,123 @@
+"""
+Concurrency benchmark for the async data layer.
+
+Drives the app in-process with a mixed load (full list, cursor page,
+exists check, single link and the cheap root endpoint) and reports latency
+percentiles per route. Non-2xx responses are counted as errors and left
+out of the latencies. It runs twice: once with the service layer calling
+pymongo inline on the event loop (how the routes behaved before the async
+layer) and once with the calls offloaded to worker threads.
+
+    python -m benchmarks.bench_concurrency --links 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import httpx
+
+from app.main import app
+from db.database import get_client
+from models import async_link_services, async_user_services
+from routes.links import get_collection
+from routes.users import get_user_collection
+from .common import BENCH_DATABASE, print_table, seed_links, seed_user, summarize, write_results
+
+COLUMNS = ['count', 'errors', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+
+
+async def _run_inline(func, *args, **kwargs):
+    # Call blocking function directly on the event loop
+    return func(*args, **kwargs)
+
+
+@contextmanager
+def blocking_services():
+    """
+    Make the async services call pymongo inline, like the old routes did.
+    """
+    modules = (async_link_services, async_user_services)
+    originals = [module.run_in_threadpool for module in modules]
+    for module in modules:
+        module.run_in_threadpool = _run_inline
+    try:
+        yield
+    finally:
+        for module, original in zip(modules, originals):
+            module.run_in_threadpool = original
+
+
+async def run_load(headers: dict, link_ids: list, concurrency: int, duration: float) -> dict:
+    """
+    Run mixed load for given duration and return latencies and errors per route.
+    """
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    scenarios = [
+        ('GET /', lambda: '/'),
+        ('GET /links/', lambda: '/links/'),
+        ('GET /links/cursor', lambda: '/links/cursor'),
+        ('GET /links/exists', lambda: f'/links/exists?url=https://missing{random.randint(0, 10**6)}.com'),
+        ('GET /links/{item_id}', lambda: f'/links/{random.choice(link_ids)}'),
+    ]
+    weights = [4, 1, 4, 4, 4]
+    deadline = time.perf_counter() + duration
+
+    async def worker(http: httpx.AsyncClient):
+        while time.perf_counter() < deadline:
+            name, url = random.choices(scenarios, weights)[0]
+            start = time.perf_counter()
+            response = await http.get(url(), headers=headers)
+            # Failed requests are often fast, timing them would hide slowdowns
+            if response.is_success:
+                latencies[name].append(time.perf_counter() - start)
+            else:
+                errors[name] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as http:
+        await asyncio.gather(*(worker(http) for _ in range(concurrency)))
+    return {
+        name: {**summarize(latencies[name]), 'errors': errors[name]}
+        for name in dict.fromkeys([*latencies, *errors])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--links', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--output', default='bench_concurrency.json')
+    args = parser.parse_args()
+
+    client = get_client()
+    database = client[BENCH_DATABASE]
+    links, users = database.links, database.users
+    seed_links(links, args.links)
+    headers = {'Authorization': seed_user(users)}
+    link_ids = [str(obj['_id']) for obj in links.find({}, {'_id': 1}).limit(1000)]
+
+    app.dependency_overrides[get_collection] = lambda: links
+    app.dependency_overrides[get_user_collection] = lambda: users
+    results = {}
+    try:
+        with blocking_services():
+            results['blocking'] = asyncio.run(
+                run_load(headers, link_ids, args.concurrency, args.duration))
+        results['offloaded'] = asyncio.run(
+            run_load(headers, link_ids, args.concurrency, args.duration))
+    finally:
+        app.dependency_overrides.clear()
+        client.drop_database(BENCH_DATABASE)
+
+    for mode, rows in results.items():
+        print_table(f'{mode} ({args.concurrency} concurrent clients)', rows, COLUMNS)
+    write_results(args.output, 'concurrency', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+JSON encoding benchmark for link payloads.
+
+Encodes a page of 100 links and a payload of 10k links with FastAPI's
+default path (jsonable_encoder and stdlib json in JSONResponse) and with
+FastJSONResponse on each available backend.
+
+    python -m benchmarks.bench_json --repeat 50
+"""
+import argparse
+from unittest.mock import patch
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.responses import FastJSONResponse, orjson
+from models.schemas import LinkCursorPage
+from models.serializers import link_serializer
+from .bench_serializers import make_rows
+from .common import print_table, summarize, timeit, write_results
+
+
+def default_response(page: LinkCursorPage) -> bytes:
+    return JSONResponse(jsonable_encoder(page, by_alias=True)).body
+
+
+def fast_response(page: LinkCursorPage, backend: str) -> bytes:
+    with patch.object(settings, 'JSON_BACKEND', backend):
+        return FastJSONResponse(page).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10000])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', default='bench_json.json')
+    args = parser.parse_args()
+
+    backends = ['ujson'] + (['orjson'] if orjson is not None else [])
+    results = {}
+    for size in args.sizes:
+        rows = make_rows(size)
+        page = LinkCursorPage.construct(items=[link_serializer(row) for row in rows], next=None)
+        rows = {'jsonable_encoder + json': summarize(timeit(lambda: default_response(page), args.repeat))}
+        for backend in backends:
+            rows[backend] = summarize(timeit(lambda: fast_response(page, backend), args.repeat))
+        print_table(f'encoding {size} links', rows)
+        results[size] = rows
+    write_results(args.output, 'json', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Access token verification benchmark.
+
+Compares jwt.decode with signature and claim checks against the verified
+token cache: the digest used as cache key alone, a cache hit and
+decode_access_token on a cold and on a warm cache. No database is needed.
+
+    python -m benchmarks.bench_jwt --repeat 10000
+"""
+import argparse
+
+import jwt
+
+from app.config import settings
+from models.user_services import create_access_token, decode_access_token, get_token_digest, token_cache
+from .common import print_table, summarize, timeit, write_results
+
+
+def decode_cold(token: str) -> dict:
+    token_cache.clear()
+    return decode_access_token(token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=10000)
+    parser.add_argument('--output', default='bench_jwt.json')
+    args = parser.parse_args()
+
+    token = create_access_token({'sub': 'bench@example.com'})
+    digest = get_token_digest(token)
+    decode_access_token(token)
+    rows = {
+        'jwt.decode': summarize(timeit(
+            lambda: jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]), args.repeat)),
+        'token digest': summarize(timeit(lambda: get_token_digest(token), args.repeat)),
+        'cache lookup': summarize(timeit(lambda: token_cache.get(digest), args.repeat)),
+        'decode_access_token cold': summarize(timeit(lambda: decode_cold(token), args.repeat)),
+    }
+    decode_access_token(token)
+    rows['decode_access_token cached'] = summarize(timeit(lambda: decode_access_token(token), args.repeat))
+    columns = ['count', 'mean_ms', 'p50_ms', 'p99_ms', 'max_ms']
+    print_table(f'verifying one {settings.ALGORITHM} token', rows, columns)
+    write_results(args.output, 'jwt', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Search index benchmark.
+
+Builds the in-process search index from a generated dataset and measures
+per-query latency for single word, multi word and prefix queries. Exits
+with status 1 if p99 latency is above the budget.
+
+    python -m benchmarks.bench_search --count 1000000 --budget-ms 20
+"""
+import argparse
+import random
+import sys
+import time
+
+from bson.objectid import ObjectId
+
+from models.search import LinkSearchIndex
+from .common import print_table, summarize, timeit, write_results
+from .generate_links import WORDS, generate_links
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--budget-ms', type=float, default=20.0)
+    parser.add_argument('--output', default='bench_search.json')
+    args = parser.parse_args()
+
+    search_index = LinkSearchIndex(refresh_interval=float('inf'))
+    search_index._ready = True
+    start = time.perf_counter()
+    for document in generate_links(args.count):
+        document['_id'] = ObjectId()
+        search_index.add(document)
+    search_index.warm()
+    build_seconds = time.perf_counter() - start
+    print(f'Indexed {args.count} links in {build_seconds:.1f}s, {search_index.stats()["tokens"]} tokens')
+
+    rng = random.Random(1)
+    query_sets = {
+        'one word': lambda: rng.choice(WORDS),
+        'two words': lambda: f'{rng.choice(WORDS)} {rng.choice(WORDS)}',
+        'three words': lambda: ' '.join(rng.sample(WORDS, 3)),
+        'prefix': lambda: rng.choice(WORDS)[:3],
+        'word and user': lambda: f'{rng.choice(WORDS)} user{rng.randint(0, 49)}',
+    }
+    results = {}
+    for name, make_query in query_sets.items():
+        queries = [make_query() for _ in range(args.queries)]
+        iterator = iter(queries)
+        results[name] = summarize(
+            timeit(lambda: search_index.search(next(iterator), 0, 50), len(queries)))
+
+    print_table(f'search, {args.count} links, page of 50', results)
+    write_results(args.output, 'search', {'build_seconds': build_seconds, 'queries': results})
+    worst = max(row['p99_ms'] for row in results.values())
+    if worst > args.budget_ms:
+        print(f'p99 {worst:.1f} ms is above the budget of {args.budget_ms} ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Serialization benchmark for link rows.
+
+Compares, per batch of documents, the validated path (pydantic parse_obj
+of every row, then FastAPI validating the result again against
+response_model and encoding it) with the trusted rows path (models built
+without validation and rendered straight into a JSON response).
+No database is needed, rows are generated in memory.
+
+    python -m benchmarks.bench_serializers --documents 10000 --repeat 20
+"""
+import argparse
+import asyncio
+from unittest.mock import patch
+
+from bson.objectid import ObjectId
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.config import settings
+from models.schemas import LinkCursorPage
+from models.serializers import link_serializer
+from models.urls import get_url_hash
+from routes.links import link_response
+from .common import print_table, summarize, timeit, write_results
+from .generate_links import generate_links
+
+
+def make_rows(count: int) -> list:
+    """
+    Return count link rows shaped like the ones read from the database.
+    """
+    rows = []
+    for document in generate_links(count):
+        document['_id'] = ObjectId()
+        document['url_hash'] = get_url_hash(document['url'])
+        rows.append(document)
+    return rows
+
+
+def validated(rows: list) -> bytes:
+    # Parse every row, then let FastAPI validate and encode response_model
+    with patch.object(settings, 'TRUSTED_ROWS', False):
+        items = [link_serializer(row) for row in rows]
+    field = create_response_field('response', LinkCursorPage)
+    content = asyncio.run(serialize_response(field=field, response_content={'items': items, 'next': None}))
+    return JSONResponse(content).body
+
+
+def trusted(rows: list) -> bytes:
+    # Build models without validation and render them directly
+    with patch.object(settings, 'TRUSTED_ROWS', True):
+        items = [link_serializer(row) for row in rows]
+        return link_response(LinkCursorPage.construct(items=items, next=None), Response()).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--documents', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', default='bench_serializers.json')
+    args = parser.parse_args()
+
+    rows = make_rows(args.documents)
+    assert len(validated(rows)) > 0 and len(trusted(rows)) > 0
+    results = {
+        'validated': summarize(timeit(lambda: validated(rows), args.repeat)),
+        'trusted rows': summarize(timeit(lambda: trusted(rows), args.repeat)),
+    }
+
+    print_table(f'serialization, {args.documents} documents per call', results)
+    speedup = results['validated']['p50_ms'] / results['trusted rows']['p50_ms']
+    print(f'Trusted rows are {speedup:.1f}x faster at p50')
+    write_results(args.output, 'serializers', {'documents': args.documents, 'modes': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Micro-benchmarks of the service layer and serializers.
+
+Seeds link datasets of every given size and times the link services
+(get_links, get_link, add_link, check_that_link_exists and a first and a
+deep page of get_links_page next to the same page read with skip and
+limit), the user
+services (authenticate_user, create_access_token, JWT decode) and the
+serializers. Runs against the configured mongod, or with --memory against
+mongomock when it is installed. Results are saved as JSON, pass a
+previous results file as --compare to print p50 changes.
+
+    python -m benchmarks.bench_services --sizes 1000 100000 --output after.json --compare before.json
+"""
+import argparse
+import itertools
+from unittest.mock import patch
+
+import jwt
+from bson.objectid import ObjectId
+from pymongo import DESCENDING, MongoClient
+
+from app.config import settings
+from db.database import get_client as get_database_client
+from models import link_services, user_services
+from models.link_services import create_link_indexes, get_link_filter, parse_link_fields
+from models.schemas import Link
+from models.serializers import link_serializer, user_serializer
+from .common import (
+    BENCH_DATABASE, BENCH_EMAIL, BENCH_PASSWORD, load_results, print_table, seed_links, seed_user, summarize,
+    timeit, write_results
+)
+
+PAGE_SIZE = 50
+
+
+def get_client(memory: bool) -> MongoClient:
+    """
+    Return client of the configured database or an in-memory stand-in.
+    """
+    if not memory:
+        return get_database_client()
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit('Install mongomock to run benchmarks without mongod.')
+    return mongomock.MongoClient()
+
+
+def follow_cursor(collection, page: int) -> str:
+    """
+    Return cursor of given page, or of the last page of a smaller collection,
+    following next page cursors from the first page.
+    """
+    cursor = None
+    for _ in range(page - 1):
+        _, next_cursor = link_services.get_links_page(collection, PAGE_SIZE, cursor)
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+    return cursor
+
+
+def skip_limit_page(collection, page: int) -> list:
+    """
+    Return documents of given page read with skip and limit.
+    """
+    return list(collection.find().sort('_id', DESCENDING).skip((page - 1) * PAGE_SIZE).limit(PAGE_SIZE))
+
+
+def bench_links(collection, size: int, repeat: int, list_repeat: int, deep_page: int) -> dict:
+    """
+    Return timings of link services on a seeded collection of given size.
+    """
+    seed_links(collection, size)
+    create_link_indexes(collection)
+    link_ids = [str(obj['_id']) for obj in collection.find({}, {'_id': 1}).limit(repeat)]
+    rows = list(collection.find().limit(repeat))
+    existing = itertools.cycle(row['url'] for row in rows)
+    numbers = itertools.count()
+    fields = parse_link_fields('url,date_added')
+    link_filter = get_link_filter(collection)
+    if link_filter is not None:
+        link_filter.rebuild(collection)
+    # Small collections have fewer pages than asked for
+    deep_page = max(min(deep_page, -(-size // PAGE_SIZE)), 1)
+    deep_cursor = follow_cursor(collection, deep_page)
+
+    cases = {
+        'get_links': (lambda: link_services.get_links(collection), list_repeat),
+        'get_links fields': (lambda: link_services.get_links(collection, fields), list_repeat),
+        'get_links_page': (lambda: link_services.get_links_page(collection, PAGE_SIZE), repeat),
+        f'get_links_page page {deep_page}': (
+            lambda: link_services.get_links_page(collection, PAGE_SIZE, deep_cursor), repeat),
+        f'skip/limit page {deep_page}': (lambda: skip_limit_page(collection, deep_page), repeat),
+        'get_link': (lambda: link_services.get_link(link_ids[next(numbers) % len(link_ids)], collection), repeat),
+        'check_that_link_exists hit': (
+            lambda: link_services.check_that_link_exists(next(existing), collection), repeat),
+        'check_that_link_exists miss': (
+            lambda: link_services.check_that_link_exists(f'https://missing.example/{next(numbers)}', collection),
+            repeat),
+        'add_link': (
+            lambda: link_services.add_link(
+                Link(url=f'https://added.example/{next(numbers)}', added_by='bench'), collection),
+            repeat),
+        'link_serializer validated': (
+            lambda: [link_serializer(row) for row in rows], max(repeat // 10, 1)),
+        'link_serializer trusted': (
+            lambda: [link_serializer(row) for row in rows], max(repeat // 10, 1)),
+    }
+    results = {}
+    for name, (func, count) in cases.items():
+        # Measure the database path, not the read cache
+        with patch.object(settings, 'LINK_CACHE_ENABLED', False), \
+                patch.object(settings, 'TRUSTED_ROWS', name != 'link_serializer validated'):
+            func()
+            results[name] = summarize(timeit(func, count))
+    return results
+
+
+def bench_users(collection, repeat: int) -> dict:
+    """
+    Return timings of user services and JWT handling.
+    """
+    token = seed_user(collection).split()[1]
+    row = collection.find_one({'email': BENCH_EMAIL})
+    cases = {
+        'authenticate_user': (
+            lambda: user_services.authenticate_user(collection, BENCH_EMAIL, BENCH_PASSWORD), max(repeat // 10, 1)),
+        'create_access_token': (lambda: user_services.create_access_token({'sub': BENCH_EMAIL}), repeat),
+        'jwt decode': (lambda: jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]), repeat),
+        'user_serializer': (lambda: user_serializer(row), repeat),
+    }
+    return {name: summarize(timeit(func, count)) for name, (func, count) in cases.items()}
+
+
+def print_comparison(baseline: dict, results: dict) -> None:
+    """
+    Print p50 of results relative to baseline results.
+    """
+    print('\np50 compared to baseline')
+    for group, rows in results.items():
+        for name, row in rows.items():
+            before = baseline.get(group, {}).get(name)
+            if before and before['p50_ms']:
+                print(f'{group:>10} {name:<32}{before["p50_ms"]:>12.3f}{row["p50_ms"]:>12.3f}'
+                      f'{row["p50_ms"] / before["p50_ms"]:>10.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--list-repeat', type=int, default=5, help='repeat of full list reads')
+    parser.add_argument('--deep-page', type=int, default=1000, help='page read by cursor and by skip and limit')
+    parser.add_argument('--memory', action='store_true', help='use mongomock instead of mongod')
+    parser.add_argument('--output', default='bench_services.json')
+    parser.add_argument('--compare', help='results file of a previous run')
+    args = parser.parse_args()
+
+    database = get_client(args.memory)[BENCH_DATABASE]
+    results = {}
+    try:
+        results['users'] = bench_users(database.users, args.repeat)
+        print_table('user services', results['users'])
+        for size in args.sizes:
+            # Fresh collection name, in-process indexes are kept by name
+            collection = database[f'links_{size}_{ObjectId()}']
+            results[str(size)] = bench_links(collection, size, args.repeat, args.list_repeat, args.deep_page)
+            print_table(f'link services, {size} links', results[str(size)])
+            collection.drop()
+    finally:
+        database.client.drop_database(BENCH_DATABASE)
+
+    write_results(args.output, 'services', results)
+    if args.compare:
+        print_comparison(load_results(args.compare), results)
+
+
+if __name__ == '__main__':
+    main()
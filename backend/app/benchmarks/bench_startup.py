@@ -0,0 +1,148 @@
+"""
+Cold start benchmark of the API process.
+
+Starts a fresh interpreter with `-X importtime` for every run, imports
+app.main, runs the lifespan startup and sends the first request through
+TestClient. Reports time to import the app, time of the startup, time of
+the first request and total time from process spawn to the first
+response, plus the packages with the largest import times in app.main.
+
+Pass results of an earlier run as --baseline to fail (exit code 1) when a
+median is worse than the baseline by more than --margin.
+
+    python -m benchmarks.bench_startup --runs 10 --output startup_baseline.json
+    python -m benchmarks.bench_startup --runs 10 --baseline startup_baseline.json --margin 0.2
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import typing
+from collections import defaultdict
+
+from .common import load_results, print_table, write_results
+
+GATED_PHASES = ('import_ms', 'startup_ms', 'total_ms')
+COLUMNS = ['runs', 'import_ms', 'startup_ms', 'request_ms', 'total_ms']
+# Markers written to stderr around the import of app.main
+IMPORT_START = '-- import app.main'
+IMPORT_END = '-- imported app.main'
+# Runs in the child interpreter, argv is spawn time and database mode
+CHILD_SCRIPT = '''
+import json, sys, time
+IMPORT_START, IMPORT_END = %r, %r
+spawned = float(sys.argv[1])
+if sys.argv[2] == 'memory':
+    import mongomock, pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+print(IMPORT_START, file=sys.stderr, flush=True)
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+print(IMPORT_END, file=sys.stderr, flush=True)
+from fastapi.testclient import TestClient
+ready = time.perf_counter()
+with TestClient(app) as client:
+    started = time.perf_counter()
+    response = client.post('/user/token', json={'email': 'startup@example.com', 'password': 'startup'})
+    responded = time.perf_counter()
+    total = time.time() - spawned
+print(json.dumps({
+    'status': response.status_code,
+    'import_ms': (imported - start) * 1000,
+    'startup_ms': (started - ready) * 1000,
+    'request_ms': (responded - started) * 1000,
+    'total_ms': total * 1000,
+}))
+''' % (IMPORT_START, IMPORT_END)
+
+
+def parse_importtime(output: str) -> typing.Dict[str, float]:
+    """
+    Return self import time in milliseconds by top level package
+    of modules imported by app.main, from `-X importtime` output.
+    """
+    packages = defaultdict(float)
+    lines = output.splitlines()
+    if IMPORT_START in lines and IMPORT_END in lines:
+        lines = lines[lines.index(IMPORT_START) + 1:lines.index(IMPORT_END)]
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            # Header line
+            continue
+        packages[name.strip().split('.')[0]] += int(self_us) / 1000
+    return dict(packages)
+
+
+def run_once(memory: bool) -> typing.Tuple[dict, typing.Dict[str, float]]:
+    """
+    Start the app in a new interpreter and return its phase times
+    and import times by package.
+    """
+    spawned = time.time()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, str(spawned), 'memory' if memory else 'database'],
+        capture_output=True, text=True)
+    if process.returncode != 0:
+        raise SystemExit(f'Startup failed:\n{process.stderr[-2000:]}')
+    return json.loads(process.stdout.strip().splitlines()[-1]), parse_importtime(process.stderr)
+
+
+def find_regressions(baseline: dict, results: dict, margin: float) -> typing.List[str]:
+    """
+    Return descriptions of phases slower than baseline by more than margin.
+    """
+    regressions = []
+    for phase in GATED_PHASES:
+        before = baseline.get(phase)
+        if before and results[phase] > before * (1 + margin):
+            regressions.append(f'{phase} {results[phase]:.1f} ms, baseline {before:.1f} ms')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--memory', action='store_true', help='use mongomock instead of the configured database')
+    parser.add_argument('--top', type=int, default=15, help='packages with largest import time to print')
+    parser.add_argument('--output', default='bench_startup.json')
+    parser.add_argument('--baseline', help='results file of a previous run')
+    parser.add_argument('--margin', type=float, default=0.2, help='allowed slowdown against baseline')
+    args = parser.parse_args()
+
+    # First run fills bytecode caches, it is not measured
+    run_once(args.memory)
+    phases, imports = defaultdict(list), defaultdict(list)
+    for _ in range(args.runs):
+        times, packages = run_once(args.memory)
+        for phase, value in times.items():
+            phases[phase].append(value)
+        for package, value in packages.items():
+            imports[package].append(value)
+
+    results = {phase: statistics.median(values) for phase, values in phases.items() if phase != 'status'}
+    results['runs'] = args.runs
+    results['packages_ms'] = dict(sorted(
+        ((package, statistics.median(values)) for package, values in imports.items()),
+        key=lambda item: item[1], reverse=True)[:args.top])
+
+    print_table(f'cold start, median of {args.runs} runs', {'app.main': results}, COLUMNS)
+    print_table('app.main import time by package (self, median)', {
+        package: {'import_ms': value} for package, value in results['packages_ms'].items()}, ['import_ms'])
+    write_results(args.output, 'startup', results)
+    if args.baseline:
+        regressions = find_regressions(load_results(args.baseline), results, args.margin)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions above {args.margin:.0%} of baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Helpers shared by the benchmark scripts.
+Run benchmarks from the backend/app directory, e.g.
+`python -m benchmarks.bench_concurrency`.
+"""
+import json
+import math
+import statistics
+import time
+import typing
+from datetime import datetime
+
+from pymongo.collection import Collection
+
+from models.schemas import DBUser
+from models.user_services import create_user, create_access_token, get_user_with_password
+from .generate_links import generate_links
+
+BENCH_DATABASE = 'benchmarks'
+BENCH_EMAIL = 'bench@example.com'
+BENCH_PASSWORD = 'bench-password'
+
+
+def percentile(values: typing.Sequence[float], percent: float) -> float:
+    """
+    Return given percentile of values using nearest-rank method.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies: typing.Sequence[float]) -> dict:
+    """
+    Return latency summary in milliseconds.
+    """
+    return {
+        'count': len(latencies),
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'p99.9_ms': percentile(latencies, 99.9) * 1000,
+        'max_ms': max(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def timeit(func: typing.Callable, repeat: int) -> typing.List[float]:
+    """
+    Call given function repeat times and return list of durations.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def print_table(title: str, rows: typing.Dict[str, dict], columns: typing.Sequence[str] = None) -> None:
+    """
+    Print results as a simple table.
+    """
+    print(f'\n{title}')
+    columns = columns or ['count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+    print(f'{"name":<32}' + ''.join(f'{column:>12}' for column in columns))
+    for name, row in rows.items():
+        values = ''.join(
+            f'{row.get(column, 0):>12.3f}' if isinstance(row.get(column), float)
+            else f'{row.get(column, ""):>12}' for column in columns)
+        print(f'{name:<32}{values}')
+
+
+def write_results(path: str, name: str, results: dict) -> None:
+    """
+    Save benchmark results as JSON so that runs can be compared.
+    """
+    with open(path, 'w') as file:
+        json.dump({
+            'benchmark': name,
+            'date': datetime.utcnow().isoformat(),
+            'results': results,
+        }, file, indent=2)
+    print(f'\nResults saved to {path}')
+
+
+def load_results(path: str) -> dict:
+    """
+    Return results saved by write_results.
+    """
+    with open(path) as file:
+        return json.load(file)['results']
+
+
+def seed_links(collection: Collection, count: int, batch_size: int = 10000) -> None:
+    """
+    Fill given collection with count generated link documents.
+    """
+    collection.drop()
+    batch = []
+    for document in generate_links(count):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def seed_user(collection: Collection) -> str:
+    """
+    Create benchmark user in given collection and return its auth header.
+    """
+    collection.drop()
+    create_user(
+        DBUser(username='bench', email=BENCH_EMAIL, password=BENCH_PASSWORD),
+        collection)
+    user = get_user_with_password(BENCH_EMAIL, collection)
+    return f'Bearer {create_access_token({"sub": BENCH_EMAIL}, user)}'
@@ -0,0 +1,81 @@
+"""
+Generate a benchmark dataset of realistic looking links.
+
+Write it as NDJSON, ready for POST /links/bulk, or insert it straight into
+a collection of the benchmarks database:
+
+    python -m benchmarks.generate_links --count 1000000 --output links.ndjson
+    python -m benchmarks.generate_links --count 1000000 --collection links
+"""
+import argparse
+import json
+import random
+import typing
+from datetime import datetime, timedelta
+
+from models.urls import get_url_hash
+
+WORDS = (
+    'python rust golang java kotlin swift react vue angular django flask fastapi '
+    'docker kubernetes linux windows macos android ios cloud aws azure database '
+    'mongodb postgres redis kafka search index cache queue stream async thread '
+    'performance benchmark latency memory profile debug test deploy release api '
+    'guide tutorial howto tips tricks news blog article video podcast book course '
+    'design pattern architecture security crypto network http browser javascript '
+    'typescript css html editor terminal shell git github gitlab review learning '
+    'machine data science model training vision audio game engine graphics shader '
+    'travel food recipe coffee music photo camera garden health running cycling'
+).split()
+TLDS = ('com', 'org', 'net', 'io', 'dev', 'co.uk', 'de', 'pl')
+
+
+def generate_links(count: int, seed: int = 0) -> typing.Iterator[dict]:
+    """
+    Yield count link documents shaped like the ones stored by add_link.
+    """
+    rng = random.Random(seed)
+    hosts = [
+        f'{rng.choice(("", "www.", "blog.", "docs."))}{rng.choice(WORDS)}{rng.choice(WORDS)}.{rng.choice(TLDS)}'
+        for _ in range(max(count // 20, 1))]
+    users = [f'user{i}' for i in range(50)]
+    start = datetime(2023, 1, 1)
+    for i in range(count):
+        segments = ['-'.join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(rng.randint(1, 4))]
+        url = f'https://{rng.choice(hosts)}/{"/".join(segments)}/{i}'
+        yield {
+            'url': url,
+            'added_by': rng.choice(users),
+            'date_added': start + timedelta(seconds=i),
+            'url_hash': get_url_hash(url),
+        }
+
+
+def main():
+    from db.database import get_client
+    from .common import BENCH_DATABASE
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='NDJSON file to write')
+    parser.add_argument('--collection', help='collection of the benchmarks database to fill')
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            for document in generate_links(args.count, args.seed):
+                file.write(json.dumps({'url': document['url']}) + '\n')
+    if args.collection:
+        collection = get_client()[BENCH_DATABASE][args.collection]
+        batch = []
+        for document in generate_links(args.count, args.seed):
+            batch.append(document)
+            if len(batch) >= 10000:
+                collection.insert_many(batch)
+                batch = []
+        if batch:
+            collection.insert_many(batch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+End-to-end HTTP load generator.
+
+Runs concurrent clients against the whole FastAPI stack with a weighted
+mix of scenarios (login, link list, exists check, add link and a single
+link) and reports throughput and latency percentiles per route. The app
+is driven in-process on seeded benchmark collections, or over HTTP with
+--url against a running server and an existing user.
+
+Pass results of an earlier run as --baseline to fail (exit code 1) when a
+percentile is worse than the baseline by more than --margin, or when more
+requests fail than in the baseline.
+
+    python -m benchmarks.loadgen --concurrency 50 --duration 30 --output baseline.json
+    python -m benchmarks.loadgen --concurrency 50 --duration 30 --baseline baseline.json --margin 0.2
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --email admin@example.com --password secret
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import time
+import typing
+from collections import defaultdict
+
+import httpx
+
+from .common import BENCH_DATABASE, BENCH_EMAIL, BENCH_PASSWORD, load_results, print_table, summarize, write_results
+
+# Scenario name to method and url of the request
+SCENARIOS = {
+    'login': ('POST', '/user/token'),
+    'list': ('GET', '/links/'),
+    'exists': ('GET', '/links/exists'),
+    'add': ('POST', '/links/'),
+    'get': ('GET', '/links/{item_id}'),
+}
+DEFAULT_MIX = 'login=1,list=4,exists=4,add=1,get=4'
+GATED_PERCENTILES = ('p50_ms', 'p95_ms', 'p99_ms')
+COLUMNS = ['count', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'p99.9_ms']
+
+
+def parse_mix(mix: str) -> typing.Dict[str, int]:
+    """
+    Return scenario weights of given `name=weight,...` value.
+    """
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f'Unknown scenario {name!r}, choose from {", ".join(SCENARIOS)}.')
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+class LoadGenerator:
+    """
+    Closed loop load: every client sends its next request when the
+    previous one is answered.
+    """
+    def __init__(self, http: httpx.AsyncClient, credentials: dict, weights: typing.Dict[str, int]):
+        self.http = http
+        self.credentials = credentials
+        self.names = list(weights)
+        self.weights = list(weights.values())
+        self.headers: dict = {}
+        self.link_ids: typing.List[str] = []
+        self.numbers = itertools.count()
+        self.run_id = random.getrandbits(32)
+        self.latencies: typing.Dict[str, typing.List[float]] = defaultdict(list)
+        self.errors: typing.Dict[str, int] = defaultdict(int)
+
+    async def login(self) -> httpx.Response:
+        response = await self.http.post('/user/token', json=self.credentials)
+        if response.status_code == 201:
+            self.headers = {'Authorization': f'Bearer {response.json()["access_token"]}'}
+        return response
+
+    async def prepare(self) -> None:
+        """
+        Log in and collect ids of existing links.
+        """
+        response = await self.login()
+        response.raise_for_status()
+        response = await self.http.get('/links/cursor', params={'size': 100}, headers=self.headers)
+        response.raise_for_status()
+        self.link_ids = [item['_id'] for item in response.json()['items']]
+
+    async def request(self, name: str) -> httpx.Response:
+        number = next(self.numbers)
+        if name == 'login':
+            return await self.login()
+        if name == 'list':
+            return await self.http.get('/links/', headers=self.headers)
+        if name == 'exists':
+            url = f'https://loadgen.example/{self.run_id}/{random.randrange(number + 1)}'
+            return await self.http.get('/links/exists', params={'url': url}, headers=self.headers)
+        if name == 'add':
+            url = f'https://loadgen.example/{self.run_id}/{number}'
+            return await self.http.post('/links/', json={'url': url}, headers=self.headers)
+        item_id = random.choice(self.link_ids) if self.link_ids else '0' * 24
+        return await self.http.get(f'/links/{item_id}', headers=self.headers)
+
+    async def client(self, deadline: float, record: bool) -> None:
+        while time.perf_counter() < deadline:
+            name = random.choices(self.names, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await self.request(name)
+                failed = response.status_code >= 400 and not (name == 'exists' and response.status_code == 400)
+            except httpx.HTTPError:
+                failed = True
+            if record:
+                self.latencies[name].append(time.perf_counter() - start)
+                self.errors[name] += failed
+
+    async def run(self, concurrency: int, duration: float, warmup: float) -> dict:
+        """
+        Run load for given duration after warmup and return results per scenario.
+        """
+        await self.prepare()
+        if warmup:
+            deadline = time.perf_counter() + warmup
+            await asyncio.gather(*(self.client(deadline, False) for _ in range(concurrency)))
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(self.client(deadline, True) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        results = {}
+        for name in self.names:
+            results[name] = summarize(self.latencies[name])
+            results[name].update({'errors': self.errors[name], 'rps': len(self.latencies[name]) / elapsed})
+        total = sum(self.latencies.values(), [])
+        results['total'] = summarize(total)
+        results['total'].update({'errors': sum(self.errors.values()), 'rps': len(total) / elapsed})
+        return results
+
+
+def error_rate(row: dict) -> float:
+    """
+    Return part of requests of a result row that failed.
+    """
+    return row.get('errors', 0) / row['count'] if row.get('count') else 0.0
+
+
+def find_regressions(baseline: dict, results: dict, margin: float) -> typing.List[str]:
+    """
+    Return descriptions of percentiles worse than baseline by more than margin
+    and of error rates above the baseline. Failing requests are often fast,
+    so a run with new errors is never counted as an improvement.
+    """
+    regressions = []
+    for name, row in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        for column in GATED_PERCENTILES:
+            if before[column] and row[column] > before[column] * (1 + margin):
+                regressions.append(f'{name} {column} {row[column]:.2f} ms, baseline {before[column]:.2f} ms')
+        # Any errors fail the gate when the baseline had none
+        rate, rate_before = error_rate(row), error_rate(before)
+        if rate > rate_before * (1 + margin):
+            regressions.append(
+                f'{name} errors {row.get("errors", 0)} ({rate:.2%}), '
+                f'baseline {before.get("errors", 0)} ({rate_before:.2%})')
+    return regressions
+
+
+async def run_in_process(args: argparse.Namespace, weights: dict) -> dict:
+    """
+    Seed benchmark collections and drive the app without a server.
+    """
+    from app.main import app
+    from db.database import get_client
+    from routes.links import get_collection
+    from routes.users import get_user_collection
+    from .common import seed_links, seed_user
+
+    client = get_client()
+    database = client[BENCH_DATABASE]
+    links, users = database.links, database.users
+    seed_links(links, args.links)
+    seed_user(users)
+    app.dependency_overrides[get_collection] = lambda: links
+    app.dependency_overrides[get_user_collection] = lambda: users
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://loadgen') as http:
+            generator = LoadGenerator(http, {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD}, weights)
+            return await generator.run(args.concurrency, args.duration, args.warmup)
+    finally:
+        app.dependency_overrides.clear()
+        client.drop_database(BENCH_DATABASE)
+
+
+async def run_over_http(args: argparse.Namespace, weights: dict) -> dict:
+    """
+    Drive a running server.
+    """
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as http:
+        generator = LoadGenerator(http, {'email': args.email, 'password': args.password}, weights)
+        return await generator.run(args.concurrency, args.duration, args.warmup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', help='server to load, the app is run in-process if not given')
+    parser.add_argument('--email', default=BENCH_EMAIL)
+    parser.add_argument('--password', default=BENCH_PASSWORD)
+    parser.add_argument('--links', type=int, default=10000, help='links seeded in-process')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='scenario weights')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--output', default='loadgen.json')
+    parser.add_argument('--baseline', help='results file of a previous run')
+    parser.add_argument('--margin', type=float, default=0.2, help='allowed slowdown against baseline')
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    runner = run_over_http if args.url else run_in_process
+    results = asyncio.run(runner(args, weights))
+
+    print_table(f'{args.concurrency} concurrent clients, {args.duration:.0f}s', results, COLUMNS)
+    write_results(args.output, 'loadgen', results)
+    if args.baseline:
+        regressions = find_regressions(load_results(args.baseline), results, args.margin)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions above {args.margin:.0%} of baseline')
+
+
+if __name__ == '__main__':
+    main()
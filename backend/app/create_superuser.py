@@ -4,7 +4,7 @@ from getpass import getpass
 from pymongo.collection import Collection
 from pydantic import EmailStr
 
-from db.database import user_collection
+from db.database import get_user_collection
 from models.user_services import create_user
 from models.schemas import DBUser
 
@@ -13,11 +13,13 @@ def create_superuser(
     username: str,
     pwd: str,
     email: EmailStr,
-    collection: Collection = user_collection
+    collection: Collection = None
 ) -> None:
     """
     Create an admin user adn add it to the database.
     """
+    if collection is None:
+        collection = get_user_collection()
     data = {
         'disabled': False,
         'date_added': datetime.utcnow(),
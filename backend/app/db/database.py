@@ -1,9 +1,88 @@
+import threading
+import typing
+
 from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
+
 from app.config import settings
+from app.metrics import command_metrics, pool_metrics
+from app.slow_queries import slow_query_log
+
+# Client is created on first use or by the application lifespan
+_client: typing.Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client_options() -> dict:
+    """
+    Return MongoClient pool, timeout and concern options from settings.
+    Options that are not configured are left to the driver defaults.
+    """
+    options = {
+        'maxPoolSize': int(settings.MONGO_MAX_POOL_SIZE),
+        'minPoolSize': int(settings.MONGO_MIN_POOL_SIZE),
+        'waitQueueTimeoutMS': int(settings.MONGO_WAIT_QUEUE_TIMEOUT_MS),
+        'serverSelectionTimeoutMS': int(settings.MONGO_SERVER_SELECTION_TIMEOUT_MS),
+    }
+    if settings.MONGO_COMPRESSORS:
+        options['compressors'] = settings.MONGO_COMPRESSORS
+    if settings.MONGO_WRITE_CONCERN:
+        write_concern = str(settings.MONGO_WRITE_CONCERN)
+        # Number of nodes or a tag set name like 'majority'
+        options['w'] = int(write_concern) if write_concern.isdigit() else write_concern
+    if settings.MONGO_READ_CONCERN:
+        options['readConcernLevel'] = settings.MONGO_READ_CONCERN
+    return options
+
+
+def get_client() -> MongoClient:
+    """
+    Return MongoClient, create it on first call.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                client = MongoClient(
+                    settings.DATABSE_URL,
+                    event_listeners=[command_metrics, pool_metrics, slow_query_log],
+                    **get_client_options()
+                )
+                slow_query_log.attach(client)
+                _client = client
+    return _client
+
+
+def connect() -> MongoClient:
+    """
+    Return MongoClient with an open connection to the server.
+    Fails if no server is selected in the server selection timeout,
+    the driver then fills the pool up to minPoolSize in the background.
+    """
+    client = get_client()
+    client.admin.command('ping')
+    return client
+
+
+def close_client() -> None:
+    """
+    Close MongoClient and its pooled connections.
+    """
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+def get_database() -> Database:
+    return get_client().links
+
+
+def get_link_collection() -> Collection:
+    return get_database().urls
 
-# Config database
-client = MongoClient(settings.DATABSE_URL)
 
-db = client.links
-link_collection = db.urls
-user_collection = db.user
+def get_user_collection() -> Collection:
+    return get_database().user
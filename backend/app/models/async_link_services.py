@@ -0,0 +1,95 @@
+"""
+Async versions of link services.
+Blocking pymongo calls are run in a worker thread so they never stall
+the event loop.
+"""
+import typing
+
+from pymongo.collection import Collection
+from starlette.concurrency import run_in_threadpool
+
+from . import link_services
+from .importers import InvalidEntry
+from .schemas import Link
+from .urls import get_url_hash
+
+
+async def get_link(
+    link_id: str, collection: Collection, fields: typing.Tuple[str, ...] = None
+) -> Link:
+    """
+    Return link object by given link id value.
+    """
+    # Cached links are returned without leaving the event loop
+    link = link_services.get_cached_link(link_id, collection, fields)
+    if link is not None:
+        return link
+    return await run_in_threadpool(link_services.get_link, link_id, collection, fields)
+
+
+async def get_links(collection: Collection, fields: typing.Tuple[str, ...] = None) -> typing.List[Link]:
+    """
+    Return list of Link objects, newest first.
+    """
+    return await run_in_threadpool(link_services.get_links, collection, fields)
+
+
+async def get_links_version(collection: Collection) -> str:
+    """
+    Return version of the links collection.
+    """
+    return await run_in_threadpool(link_services.get_links_version, collection)
+
+
+async def get_links_page(
+    collection: Collection, size: int, cursor: str = None
+) -> typing.Tuple[typing.List[Link], typing.Optional[str]]:
+    """
+    Return page of Link objects and cursor of the next page.
+    """
+    return await run_in_threadpool(
+        link_services.get_links_page, collection, size, cursor)
+
+
+async def check_that_link_exists(url: str, collection: Collection) -> bool:
+    """
+    Check that link with given url exists.
+    """
+    # Answer negative bloom filter lookups without leaving the event loop,
+    # positives are checked in the database without asking the filter again
+    link_filter = link_services.get_link_filter(collection)
+    if link_filter is not None and link_filter.is_fresh:
+        url_hash = get_url_hash(url)
+        if not link_filter.might_contain(url_hash):
+            return False
+        return await run_in_threadpool(link_services.find_link_by_hash, url_hash, collection)
+    return await run_in_threadpool(
+        link_services.check_that_link_exists, url, collection)
+
+
+async def add_link(data: Link, collection: Collection) -> Link:
+    """
+    Add given Link object to the database and return it.
+    """
+    return await run_in_threadpool(link_services.add_link, data, collection)
+
+
+async def add_links_bulk(
+    entries: typing.List[dict | InvalidEntry], added_by: str,
+    collection: Collection, start: int = 0
+) -> typing.List[dict]:
+    """
+    Validate and insert given entries, return status of every entry.
+    """
+    return await run_in_threadpool(
+        link_services.add_links_bulk, entries, added_by, collection, start)
+
+
+async def search_links(
+    query: str, collection: Collection, page: int, size: int
+) -> typing.Tuple[typing.List[Link], int]:
+    """
+    Return page of links matching given query and number of all matches.
+    """
+    return await run_in_threadpool(
+        link_services.search_links, query, collection, page, size)
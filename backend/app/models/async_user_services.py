@@ -0,0 +1,139 @@
+"""
+Async versions of user services.
+Blocking pymongo calls are run in a worker thread so they never stall
+the event loop. Password hashing runs in the dedicated hash pool.
+"""
+from pymongo.collection import Collection
+from starlette.concurrency import run_in_threadpool
+
+from . import user_services
+from .hashing import hash_pool
+from .schemas import UserModel, DBUser
+
+
+async def get_user(user_id: str, collection: Collection) -> UserModel:
+    """
+    Get user from database.
+    """
+    return await run_in_threadpool(user_services.get_user, user_id, collection)
+
+
+async def get_user_with_password(email: str, collection: Collection) -> DBUser:
+    """
+    Get user with hashed password from databse.
+    """
+    return await run_in_threadpool(
+        user_services.get_user_with_password, email, collection)
+
+
+async def get_cached_user_with_password(email: str, collection: Collection) -> DBUser:
+    """
+    Get user with hashed password from the user cache or database.
+    """
+    user = user_services.user_cache.get(
+        user_services.get_user_cache_key(email, collection))
+    if user is not None:
+        return user
+    return await run_in_threadpool(
+        user_services.get_cached_user_with_password, email, collection)
+
+
+async def get_token_version(user_id: str, collection: Collection) -> int:
+    """
+    Return current token version of given user.
+    """
+    versions = user_services.get_token_versions(collection)
+    if versions.is_fresh:
+        return versions.get(user_id)
+    return await run_in_threadpool(user_services.get_token_version, user_id, collection)
+
+
+async def is_token_revoked(token: str, payload: dict, collection: Collection) -> bool:
+    """
+    Return True if given token of a user stored in given collection was revoked.
+    """
+    revocation_set = user_services.get_revocation_set(collection)
+    if revocation_set.is_fresh:
+        return user_services.get_token_id(token, payload) in revocation_set
+    return await run_in_threadpool(user_services.is_token_revoked, token, payload, collection)
+
+
+async def revoke_token(token: str, payload: dict, collection: Collection) -> None:
+    """
+    Reject given verified token until it expires.
+    """
+    await run_in_threadpool(user_services.revoke_token, token, payload, collection)
+
+
+async def authenticate_user(collection: Collection, email: str, password: str) -> bool | DBUser:
+    """
+    Aunthenticate user with given email and password.
+    Return boolean or DBUser value.
+    """
+    # Get user
+    try:
+        user = await get_user_with_password(email, collection)
+    except ValueError:
+        return False
+    # Verify password
+    if not await hash_pool.run(user_services.verify_password, password, user.password):
+        return False
+    return user
+
+
+async def check_that_user_exists(email: str, collection: Collection) -> bool:
+    """
+    Check that user with given email exists.
+    """
+    return await run_in_threadpool(
+        user_services.check_that_user_exists, email, collection)
+
+
+async def create_user(data: DBUser, collection: Collection) -> UserModel:
+    """
+    Add user to database.
+    """
+    # Check that user exists before spending time on hashing
+    if await check_that_user_exists(data.email, collection):
+        raise ValueError('User with this email already exists.')
+    # Hash user password
+    data.password = await hash_pool.run(user_services.get_hashed_password, data.password)
+    return await run_in_threadpool(
+        user_services.create_user, data, collection, True)
+
+
+async def update_user_password(
+    user_id: str, collection: Collection,
+    new_password: str, old_password: str
+) -> UserModel:
+    """
+    Update user password.
+    """
+    # Get user from database
+    user = await run_in_threadpool(
+        user_services.get_raw_user_data, collection, _id=user_id)
+
+    # Check that user exists
+    if not user:
+        raise ValueError('User does not exists.')
+
+    # Check that given old password is correct
+    if not await hash_pool.run(
+            user_services.verify_password, old_password, user.get('password')):
+        raise ValueError('Old password is incorrect.')
+
+    # Hash user password and save it
+    hashed_password = await hash_pool.run(user_services.get_hashed_password, new_password)
+    return await run_in_threadpool(
+        user_services.set_user_password, user_id, collection, hashed_password)
+
+
+async def update_user_status(
+    user_id: str, collection: Collection,
+    disabled: bool = None, is_admin: bool = None
+) -> UserModel:
+    """
+    Update user disabled and admin flags.
+    """
+    return await run_in_threadpool(
+        user_services.update_user_status, user_id, collection, disabled, is_admin)
@@ -0,0 +1,115 @@
+import math
+import typing
+
+from pymongo.collection import Collection
+
+from .indexing import IncrementalIndex
+
+
+class BloomFilter:
+    """
+    Bloom filter of 16 byte hashes.
+    Keys are already uniformly distributed hashes, so bit positions are
+    derived from them directly with double hashing.
+    """
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self.bits_set = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: bytes) -> typing.Iterator[int]:
+        first = int.from_bytes(key[:8], 'little')
+        second = int.from_bytes(key[8:16], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, key: bytes) -> None:
+        """
+        Add given key to the filter.
+        """
+        for position in self._positions(key):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self._bits[byte] & mask:
+                self._bits[byte] |= mask
+                self.bits_set += 1
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key))
+
+    @property
+    def fill_ratio(self) -> float:
+        """
+        Return part of bits that are set.
+        """
+        return self.bits_set / self.size
+
+
+class LinkFilter(IncrementalIndex):
+    """
+    Bloom filter of url hashes stored in a links collection.
+    A negative answer means the url is not stored, so the database does not
+    have to be asked. Links inserted by other workers are missing until the
+    next refresh, hashes set on existing links, e.g. by backfill_url_hash,
+    until the next rebuild.
+    """
+    projection = {'url_hash': 1}
+    structures = ('_filter',)
+
+    def __init__(self, error_rate: float, refresh_interval: float, min_capacity: int = 100000,
+                 rebuild_interval: typing.Optional[float] = None):
+        super().__init__(refresh_interval, rebuild_interval)
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self.negatives = 0
+        self.positives = 0
+        self._filter: BloomFilter = None
+
+    def _reset(self, collection: Collection) -> None:
+        capacity = max(collection.estimated_document_count() * 2, self.min_capacity)
+        self._filter = BloomFilter(capacity, self.error_rate)
+
+    def _add_document(self, document: dict) -> None:
+        # Links added before url normalization have no hash until backfilled
+        if 'url_hash' in document:
+            self._filter.add(document['url_hash'])
+
+    def _needs_rebuild(self) -> bool:
+        # Too many items would raise false positive rate
+        return super()._needs_rebuild() or self._filter.count > self._filter.capacity
+
+    def might_contain(self, url_hash: bytes) -> bool:
+        """
+        Return False if link with given url hash is surely not stored.
+        """
+        found = url_hash in self._filter
+        if found:
+            self.positives += 1
+        else:
+            self.negatives += 1
+        return found
+
+    def stats(self) -> dict:
+        """
+        Return filter statistics.
+        """
+        stats = super().stats()
+        stats.update({
+            'negatives': self.negatives,
+            'positives': self.positives,
+        })
+        if self._filter is not None:
+            stats.update({
+                'items': self._filter.count,
+                'capacity': self._filter.capacity,
+                'size_bits': self._filter.size,
+                'hash_count': self._filter.hash_count,
+                'fill_ratio': self._filter.fill_ratio,
+                'estimated_error_rate': self._filter.fill_ratio ** self._filter.hash_count,
+            })
+        return stats
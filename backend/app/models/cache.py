@@ -0,0 +1,187 @@
+import heapq
+import itertools
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache whose entries expire after a time to live.
+    A cache with maxsize 0 stores nothing.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        """
+        Return cached value or default if key is missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    # Mark as recently used
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: typing.Hashable, value: typing.Any, ttl: float = None) -> None:
+        """
+        Store value, evicting the least recently used entry when full.
+        """
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: typing.Hashable) -> None:
+        """
+        Remove given key from the cache.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        Return cache statistics.
+        """
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ExpiringCache(TTLCache):
+    """
+    TTLCache that removes entries as soon as they expire instead of on the
+    next lookup of their key. Expiry times are kept in a heap, so every set
+    drops expired entries in O(log n).
+    A cache with maxsize None is unbounded, entries leave it only when they
+    expire.
+    """
+    def __init__(self, maxsize: typing.Optional[int], ttl: float):
+        super().__init__(maxsize, ttl)
+        self.expired = 0
+        # Heap of expiry time, insertion number and key, it may hold stale
+        # items of replaced keys, the number keeps keys out of comparisons
+        self._expiry: list = []
+        self._counter = itertools.count()
+
+    def _expire(self, now: float) -> None:
+        while self._expiry and self._expiry[0][0] <= now:
+            _, _, key = heapq.heappop(self._expiry)
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._data[key]
+                self.expired += 1
+
+    def expire(self) -> None:
+        """
+        Remove expired entries.
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+
+    def set(self, key: typing.Hashable, value: typing.Any, ttl: float = None) -> None:
+        """
+        Store value for ttl seconds, evicting the least recently used entry
+        when full and expired entries.
+        """
+        if self.maxsize is not None and self.maxsize <= 0:
+            return
+        now = time.monotonic()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._expire(now)
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            heapq.heappush(self._expiry, (expires_at, next(self._counter), key))
+            while self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            # Drop stale heap items of evicted and replaced keys
+            if len(self._expiry) > 2 * len(self._data) + 64:
+                self._expiry = [(entry[0], next(self._counter), key) for key, entry in self._data.items()]
+                heapq.heapify(self._expiry)
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock:
+            self._data.clear()
+            self._expiry.clear()
+
+    def stats(self) -> dict:
+        """
+        Return cache statistics.
+        """
+        return {**super().stats(), 'expired': self.expired}
+
+
+class LinkCache:
+    """
+    Read cache of one links collection: Link objects by id and fields, and
+    rendered first pages of the link list by their ETag.
+    Links are never updated and missing links are not cached, so inserts
+    only make pages stale. The ETag holds the collection version, so pages
+    of an older version are never served after inserts of any worker, they
+    live for a few seconds and inserts of this process drop them at once.
+    """
+    def __init__(self, maxsize: int, ttl: float, page_maxsize: int, page_ttl: float):
+        # Link id and fields to Link object
+        self.links = TTLCache(maxsize, ttl)
+        # ETag of version and query string to response body
+        self.pages = TTLCache(page_maxsize, page_ttl)
+
+    def invalidate(self) -> None:
+        """
+        Drop cached pages after links were added.
+        """
+        self.pages.clear()
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache.
+        """
+        self.links.clear()
+        self.pages.clear()
+
+    def stats(self) -> dict:
+        """
+        Return statistics of both cache layers.
+        """
+        return {
+            'links': self.links.stats(),
+            'pages': self.pages.stats(),
+        }
@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+import typing
+from datetime import datetime
+
+from .schemas import Link
+
+# Exported fields, the same as in Link responses
+EXPORT_FIELDS = [field.alias for field in Link.__fields__.values()]
+
+
+def _export_value(value: typing.Any) -> typing.Any:
+    # Convert database values into the same form as API responses
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def export_row(document: dict) -> dict:
+    """
+    Return exported fields of given link document.
+    """
+    return {field: _export_value(document.get(field)) for field in EXPORT_FIELDS}
+
+
+def export_ndjson(batches: typing.Iterable[typing.List[dict]]) -> typing.Iterator[bytes]:
+    """
+    Yield newline delimited JSON of given document batches.
+    """
+    for batch in batches:
+        yield b''.join(
+            json.dumps(export_row(document)).encode() + b'\n' for document in batch)
+
+
+def export_csv(batches: typing.Iterable[typing.List[dict]]) -> typing.Iterator[bytes]:
+    """
+    Yield CSV with header row of given document batches.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(export_row(document) for document in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header of an empty export
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+EXPORTERS = {
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+    'csv': (export_csv, 'text/csv'),
+}
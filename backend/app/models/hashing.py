@@ -0,0 +1,87 @@
+import asyncio
+import typing
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from app.config import settings
+
+
+class HashPoolFull(Exception):
+    """
+    Raised when too many password hashing jobs are already waiting.
+    """
+
+
+class HashPool:
+    """
+    Dedicated executor for password hashing and verification.
+    Hashing is pure CPU work, so it runs outside the event loop and outside
+    the threadpool used for database calls, with a cap on queued jobs so
+    that a burst of logins cannot delay other endpoints.
+    """
+    def __init__(self, kind: str, workers: int, max_pending: int):
+        if kind not in ('thread', 'process'):
+            raise ValueError('Hash executor must be "thread" or "process".')
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor: Executor = None
+
+    @property
+    def executor(self) -> Executor:
+        """
+        Return executor, creating it on first use.
+        """
+        if self._executor is None:
+            if self.kind == 'process':
+                # Imports multiprocessing, only process pools need it
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='hash')
+        return self._executor
+
+    async def run(self, func: typing.Callable, *args) -> typing.Any:
+        """
+        Run given function in the pool and return its result.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashPoolFull('Too many password hashing jobs in progress.')
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, func, *args)
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        """
+        Return pool statistics.
+        """
+        return {
+            'executor': self.kind,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'queue_depth': max(self.pending - self.workers, 0),
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        """
+        Stop pool workers.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hash_pool = HashPool(
+    settings.HASH_EXECUTOR, settings.HASH_WORKERS, settings.HASH_MAX_PENDING)
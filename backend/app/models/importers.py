@@ -0,0 +1,100 @@
+import codecs
+import json
+import typing
+from html.parser import HTMLParser
+
+
+class InvalidEntry(typing.NamedTuple):
+    """
+    Entry of an import that could not be parsed.
+    """
+    detail: str
+
+
+class NDJSONParser:
+    """
+    Incremental parser of newline delimited JSON.
+    Feed it chunks of bytes and it returns entries of complete lines.
+    """
+    def __init__(self, max_line_length: int = 65536):
+        self.max_line_length = max_line_length
+        self._buffer = b''
+        self._skipping = False
+
+    def _parse_line(self, line: bytes) -> typing.Optional[dict | InvalidEntry]:
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return InvalidEntry('Invalid JSON.')
+
+    def feed(self, chunk: bytes) -> typing.List[dict | InvalidEntry]:
+        """
+        Parse given chunk and return entries of completed lines.
+        """
+        entries = []
+        lines = (self._buffer + chunk).split(b'\n')
+        self._buffer = lines.pop()
+        for line in lines:
+            if self._skipping:
+                # Rest of a line that was too long
+                self._skipping = False
+                continue
+            entry = self._parse_line(line)
+            if entry is not None:
+                entries.append(entry)
+        # Do not buffer a single line without limit
+        if len(self._buffer) > self.max_line_length:
+            if not self._skipping:
+                entries.append(InvalidEntry('Line too long.'))
+            self._buffer = b''
+            self._skipping = True
+        return entries
+
+    def close(self) -> typing.List[dict | InvalidEntry]:
+        """
+        Return entry of the last line without trailing newline.
+        """
+        entry = None if self._skipping else self._parse_line(self._buffer)
+        self._buffer = b''
+        return [entry] if entry is not None else []
+
+
+class BookmarkParser(HTMLParser):
+    """
+    Incremental parser of Netscape bookmark HTML exported by browsers.
+    Every <A HREF="..."> tag becomes an entry.
+    """
+    def __init__(self):
+        super().__init__()
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._entries = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self._entries.append({'url': href})
+            else:
+                self._entries.append(InvalidEntry('Bookmark without url.'))
+
+    def _take_entries(self) -> typing.List[dict | InvalidEntry]:
+        entries, self._entries = self._entries, []
+        return entries
+
+    def feed(self, chunk: bytes) -> typing.List[dict | InvalidEntry]:
+        """
+        Parse given chunk and return entries of completed tags.
+        """
+        super().feed(self._decoder.decode(chunk))
+        return self._take_entries()
+
+    def close(self) -> typing.List[dict | InvalidEntry]:
+        """
+        Parse the rest of the input and return its entries.
+        """
+        super().feed(self._decoder.decode(b'', final=True))
+        super().close()
+        return self._take_entries()
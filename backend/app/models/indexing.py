@@ -0,0 +1,174 @@
+import copy
+import threading
+import time
+import typing
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo.collection import Collection
+
+
+class IncrementalIndex:
+    """
+    Base of in-process indexes built from a links collection.
+    The index is built by a full scan. Links added by this process are added
+    immediately, links added by other workers are picked up by refresh,
+    which runs when the index is older than refresh_interval seconds.
+    Rebuilds scan into new structures and swap them in, so that lookups and
+    adds wait for the lock only for the swap, not for the scan. With a
+    rebuild_interval the index is also rebuilt in the background that often,
+    to read changes of existing documents that refreshes do not see.
+    """
+    # Rescan recent inserts to catch ids generated by other workers a bit
+    # earlier than the ones already seen
+    LOOKBACK = timedelta(seconds=60)
+    # Fields read from the collection
+    projection: dict = {}
+    # Attributes holding the index structures, swapped in by rebuild
+    structures: typing.Tuple[str, ...] = ()
+
+    def __init__(self, refresh_interval: float, rebuild_interval: typing.Optional[float] = None):
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.rebuilds = 0
+        self.refreshes = 0
+        self.last_rebuild_seconds = 0.0
+        self._ready = False
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        self._rebuilding = False
+        self._scanned_at: datetime = None
+        self._recent_ids: typing.Set[ObjectId] = set()
+        self._lock = threading.RLock()
+        # Held for the whole rebuild, one scan of the collection at a time
+        self._build_lock = threading.RLock()
+
+    def _reset(self, collection: Collection) -> None:
+        """
+        Create empty index structures for given collection.
+        """
+        raise NotImplementedError
+
+    def _add_document(self, document: dict) -> None:
+        """
+        Add given document to the index structures.
+        """
+        raise NotImplementedError
+
+    def _needs_rebuild(self) -> bool:
+        """
+        Return True if index has to be built from scratch on refresh.
+        """
+        if not self._ready:
+            return True
+        return self.rebuild_interval is not None and time.monotonic() - self._rebuilt_at >= self.rebuild_interval
+
+    @property
+    def is_fresh(self) -> bool:
+        """
+        Return True if index was refreshed within refresh interval.
+        """
+        return self._ready and time.monotonic() - self._refreshed_at < self.refresh_interval
+
+    def _scan(self, collection: Collection, query: dict, since: ObjectId) -> None:
+        recent_ids = set()
+        for document in collection.find(query, self.projection).sort('_id', 1):
+            if document['_id'] >= since:
+                recent_ids.add(document['_id'])
+                if document['_id'] in self._recent_ids:
+                    continue
+            self._add_document(document)
+        self._recent_ids = recent_ids
+
+    def _build(self, collection: Collection, scanned_at: datetime) -> 'IncrementalIndex':
+        """
+        Return a copy of the index built from all documents of given
+        collection. The copy has its own structures and lock.
+        """
+        built = copy.copy(self)
+        built._lock = threading.RLock()
+        built._reset(collection)
+        built._recent_ids = set()
+        built._scan(collection, {}, ObjectId.from_datetime(scanned_at - self.LOOKBACK))
+        return built
+
+    def rebuild(self, collection: Collection) -> None:
+        """
+        Build the index from all documents of given collection.
+        """
+        with self._build_lock:
+            start = time.perf_counter()
+            started = time.monotonic()
+            scanned_at = datetime.utcnow()
+            built = self._build(collection, scanned_at)
+            with self._lock:
+                for name in self.structures + ('_recent_ids',):
+                    setattr(self, name, getattr(built, name))
+                self._scanned_at = scanned_at
+                # Links inserted during the scan are found by the refresh
+                # due one refresh interval after the scan started
+                self._refreshed_at = started
+                self._rebuilt_at = started
+                self._ready = True
+                self.rebuilds += 1
+                self.last_rebuild_seconds = time.perf_counter() - start
+
+    def refresh(self, collection: Collection) -> None:
+        """
+        Add documents inserted since the last scan.
+        """
+        if not self._ready:
+            # Wait for a running first build instead of starting another one
+            with self._build_lock:
+                if not self._ready:
+                    self.rebuild(collection)
+                    return
+        elif self._needs_rebuild():
+            # A ready index keeps serving and refreshing while it is rebuilt
+            self._start_rebuild(collection)
+        with self._lock:
+            scanned_at = datetime.utcnow()
+            since = ObjectId.from_datetime(self._scanned_at - self.LOOKBACK)
+            self._scan(collection, {'_id': {'$gte': since}}, since)
+            self._scanned_at = scanned_at
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+
+    def _start_rebuild(self, collection: Collection) -> None:
+        """
+        Rebuild the index in a background thread unless a rebuild is running.
+        """
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, args=(collection,), daemon=True).start()
+
+    def _rebuild_in_background(self, collection: Collection) -> None:
+        try:
+            self.rebuild(collection)
+        finally:
+            self._rebuilding = False
+
+    def add(self, document: dict) -> None:
+        """
+        Add document of a link stored by this process.
+        """
+        # Before the first build is done the document is found by its scan
+        # or by the refresh after it, so adds do not wait for the build
+        if not self._ready:
+            return
+        with self._lock:
+            if document['_id'] not in self._recent_ids:
+                self._recent_ids.add(document['_id'])
+                self._add_document(document)
+
+    def stats(self) -> dict:
+        """
+        Return index statistics.
+        """
+        return {
+            'rebuilds': self.rebuilds,
+            'refreshes': self.refreshes,
+            'last_rebuild_seconds': self.last_rebuild_seconds,
+        }
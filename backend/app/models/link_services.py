@@ -1,64 +1,396 @@
+import base64
+import binascii
+import functools
 import typing
 from datetime import datetime
+from pymongo import DESCENDING, TEXT
 from pymongo.collection import Collection
-from pydantic import error_wrappers
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pydantic import BaseModel, Field, create_model, error_wrappers
 from bson import errors
 from bson.objectid import ObjectId
-from .schemas import Link
+from app.config import settings
+from .bloom import LinkFilter
+from .cache import LinkCache
+from .importers import InvalidEntry
+from .schemas import Link, LinkIn
+from .search import LinkSearchIndex
 from .serializers import link_serializer
+from .urls import get_url_hash
 
+# Mongo duplicate key error code
+DUPLICATE_KEY_ERROR = 11000
 
-def get_link(link_id: str, collection: Collection) -> Link:
+# Bloom filters of stored urls by collection name
+link_filters: typing.Dict[str, LinkFilter] = {}
+# Search indexes by collection name
+search_indexes: typing.Dict[str, LinkSearchIndex] = {}
+# Read caches by collection name
+link_caches: typing.Dict[str, LinkCache] = {}
+# Names of link fields in responses and documents
+LINK_FIELDS = tuple(field.alias for field in Link.__fields__.values())
+
+
+def create_link_indexes(collection: Collection) -> None:
+    """
+    Create indexes used by link queries.
+    """
+    # Unique canonical url hash makes duplicate check and insert a single
+    # atomic write, documents without hash are ignored until backfilled
+    collection.create_index('url_hash', unique=True, sparse=True)
+    # Text index for search, urls are not a natural language
+    collection.create_index(
+        [('url', TEXT), ('added_by', TEXT)], name='link_text', default_language='none')
+
+
+def get_link_filter(collection: Collection) -> typing.Optional[LinkFilter]:
+    """
+    Return bloom filter of urls stored in given collection, None if disabled.
+    """
+    if not settings.LINK_FILTER_ENABLED:
+        return None
+    link_filter = link_filters.get(collection.full_name)
+    if link_filter is None:
+        link_filter = link_filters.setdefault(collection.full_name, LinkFilter(
+            settings.LINK_FILTER_ERROR_RATE, float(settings.LINK_FILTER_REFRESH_SECONDS),
+            rebuild_interval=float(settings.LINK_FILTER_REBUILD_SECONDS)))
+    return link_filter
+
+
+def get_search_index(collection: Collection) -> typing.Optional[LinkSearchIndex]:
+    """
+    Return in-process search index of given collection, None if searching
+    with the database text index.
+    """
+    if settings.SEARCH_BACKEND != 'memory':
+        return None
+    search_index = search_indexes.get(collection.full_name)
+    if search_index is None:
+        search_index = search_indexes.setdefault(
+            collection.full_name, LinkSearchIndex(settings.SEARCH_REFRESH_SECONDS))
+    return search_index
+
+
+def get_link_cache(collection: Collection) -> typing.Optional[LinkCache]:
+    """
+    Return read cache of given collection, None if disabled.
+    """
+    if not settings.LINK_CACHE_ENABLED:
+        return None
+    link_cache = link_caches.get(collection.full_name)
+    if link_cache is None:
+        link_cache = link_caches.setdefault(collection.full_name, LinkCache(
+            settings.LINK_CACHE_SIZE, settings.LINK_CACHE_TTL,
+            settings.LINK_PAGE_CACHE_SIZE, settings.LINK_PAGE_CACHE_TTL))
+    return link_cache
+
+
+def get_cached_link(
+    link_id: str, collection: Collection, fields: typing.Tuple[str, ...] = None
+) -> typing.Optional[Link]:
+    """
+    Return cached link object or None.
+    """
+    link_cache = get_link_cache(collection)
+    if link_cache is None:
+        return None
+    return link_cache.links.get((link_id, fields))
+
+
+def get_cached_links_page(collection: Collection, etag: str) -> typing.Optional[bytes]:
+    """
+    Return body of cached link list page with given ETag or None.
+    """
+    link_cache = get_link_cache(collection)
+    if link_cache is None:
+        return None
+    return link_cache.pages.get(etag)
+
+
+def cache_links_page(collection: Collection, etag: str, body: bytes) -> None:
+    """
+    Store body of rendered link list page by its ETag.
+    """
+    link_cache = get_link_cache(collection)
+    if link_cache is not None:
+        link_cache.pages.set(etag, body)
+
+
+def parse_link_fields(fields: typing.Optional[str]) -> typing.Optional[typing.Tuple[str, ...]]:
+    """
+    Return link fields of given comma separated list, None for all fields.
+    Link id is always included.
+    """
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested.difference(LINK_FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown link fields: {", ".join(sorted(unknown))}.')
+    requested.add('_id')
+    return tuple(field for field in LINK_FIELDS if field in requested)
+
+
+def get_link_projection(fields: typing.Optional[typing.Tuple[str, ...]]) -> dict:
+    """
+    Return projection of given link fields, all Link fields if None.
+    """
+    return {field: 1 for field in fields or LINK_FIELDS}
+
+
+@functools.lru_cache(maxsize=None)
+def get_link_model(fields: typing.Optional[typing.Tuple[str, ...]]) -> typing.Type[BaseModel]:
+    """
+    Return Link model reduced to given fields, Link if None.
+    """
+    if fields is None:
+        return Link
+    definitions = {}
+    for name, field in Link.__fields__.items():
+        if field.alias in fields:
+            default = ... if field.required else field.default
+            definitions[name] = (field.outer_type_, Field(default, alias=field.alias))
+    model_name = 'Link_' + '_'.join(field.strip('_') for field in fields)
+    return create_model(model_name, __config__=Link.__config__, **definitions)
+
+
+def get_link(
+    link_id: str, collection: Collection, fields: typing.Tuple[str, ...] = None
+) -> Link:
     """
     Return link object or None by given link id value.
     """
+    link = get_cached_link(link_id, collection, fields)
+    if link is not None:
+        return link
     # Convert given str id into ObjectId object
     try:
         link_object_id = ObjectId(link_id)
     except errors.InvalidId as e:
         raise e
     # Get link object
-    link_obj = collection.find_one({'_id': link_object_id})
+    link_obj = collection.find_one({'_id': link_object_id}, get_link_projection(fields))
     # Parse data if link object exits
     try:
-        return link_serializer(link_obj)
+        link = link_serializer(link_obj, get_link_model(fields))
     except error_wrappers.ValidationError:
         raise ValueError('Link does not exists.')
+    link_cache = get_link_cache(collection)
+    if link_cache is not None:
+        link_cache.links.set((link_id, fields), link)
+    return link
+
+
+def get_links(collection: Collection, fields: typing.Tuple[str, ...] = None) -> typing.List[Link]:
+    """
+    Return list of Link objects, newest first.
+    Only given fields are read and returned if fields are not None.
+    """
+    # Let the database sort on the _id index instead of reversing in Python
+    links = collection.find({}, get_link_projection(fields)).sort('_id', DESCENDING)
+    model = get_link_model(fields)
+    return [link_serializer(link, model) for link in links]
+
+
+def get_links_version(collection: Collection) -> str:
+    """
+    Return version of the links collection, the same in every worker.
+    Links are never updated, so the newest id and the number of links
+    change whenever the content does.
+    """
+    # Covered by the _id index, no document is read
+    newest = collection.find_one({}, {'_id': 1}, sort=[('_id', DESCENDING)])
+    newest_id = newest['_id'] if newest else ''
+    return f'{newest_id}-{collection.estimated_document_count()}'
+
+
+def iter_link_batches(
+    collection: Collection, batch_size: int
+) -> typing.Iterator[typing.List[dict]]:
+    """
+    Yield lists of raw link documents, newest first.
+    Only one batch is held in memory at a time.
+    """
+    with collection.find({}, get_link_projection(None)).sort('_id', DESCENDING).batch_size(batch_size) as cursor:
+        batch = []
+        for document in cursor:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def encode_cursor(link_id: ObjectId) -> str:
+    """
+    Return opaque pagination cursor for given link id.
+    """
+    return base64.urlsafe_b64encode(link_id.binary).decode()
 
 
-def get_links(collection: Collection) -> typing.List[Link]:
+def decode_cursor(cursor: str) -> ObjectId:
     """
-    Return list of Link objects.
+    Return link id stored in given pagination cursor.
     """
-    links = collection.find()
-    if links:
-        # Return reversed list of links
-        reversed_list = list(map(lambda x: link_serializer(x), links))
-        reversed_list.reverse()
-        return reversed_list
-    return []
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, errors.InvalidId):
+        raise ValueError('Invalid cursor.')
+
+
+def get_links_page(
+    collection: Collection, size: int, cursor: str = None
+) -> typing.Tuple[typing.List[Link], typing.Optional[str]]:
+    """
+    Return page of Link objects, newest first, and cursor of the next page.
+    Sorting and limiting are done by the database on the _id index,
+    so the cost does not depend on how deep the page is.
+    """
+    query = {}
+    if cursor:
+        query = {'_id': {'$lt': decode_cursor(cursor)}}
+    # Fetch one extra document to know whether a next page exists
+    documents = list(
+        collection.find(query).sort('_id', DESCENDING).limit(size + 1))
+    links = [link_serializer(obj) for obj in documents[:size]]
+    next_cursor = None
+    if len(documents) > size:
+        next_cursor = encode_cursor(documents[size - 1]['_id'])
+    return links, next_cursor
 
 
 def check_that_link_exists(url: str, collection: Collection) -> bool:
     """
-    Check that link with given url exists.
+    Check that link with the same canonical url exists.
+    """
+    url_hash = get_url_hash(url)
+    # Most checked urls are not stored, the filter answers those without a query
+    link_filter = get_link_filter(collection)
+    if link_filter is not None:
+        if not link_filter.is_fresh:
+            link_filter.refresh(collection)
+        if not link_filter.might_contain(url_hash):
+            return False
+    return find_link_by_hash(url_hash, collection)
+
+
+def find_link_by_hash(url_hash: bytes, collection: Collection) -> bool:
+    """
+    Check that link with given url hash is stored, without asking the filter.
     """
-    obj = collection.find_one({'url': url})
+    obj = collection.find_one({'url_hash': url_hash}, {'_id': 1})
     if obj:
         return True
     return False
 
 
+def add_to_link_indexes(document: dict, collection: Collection) -> None:
+    """
+    Add stored link document to in-process indexes of given collection
+    and drop cached pages.
+    """
+    for index in (get_link_filter(collection), get_search_index(collection)):
+        if index is not None:
+            index.add(document)
+    link_cache = get_link_cache(collection)
+    if link_cache is not None:
+        link_cache.invalidate()
+
+
+def get_link_payload(data: LinkIn) -> dict:
+    """
+    Return document of given link to insert into the database.
+    """
+    # Update data with date_added truncated to the precision stored by mongo
+    now = datetime.utcnow()
+    payload = data.dict()
+    payload.update({'date_added': now.replace(microsecond=now.microsecond // 1000 * 1000)})
+    # Hash of canonical url used to find duplicates
+    payload.update({'url_hash': get_url_hash(data.url)})
+    return payload
+
+
 def add_link(data: Link, collection: Collection) -> Link:
     """
     Add given Link object to the database and return it.
     """
-    # Check that link already exists
-    if check_that_link_exists(data.url, collection):
+    payload = get_link_payload(data)
+    # Insert data, the unique url index rejects duplicates
+    try:
+        collection.insert_one(payload)
+    except DuplicateKeyError:
         raise ValueError('Link with given url already exists.')
-    # Update data with date_added
-    payload = data.dict()
-    payload.update({'date_added': datetime.utcnow()})
-    # Insert data
-    obj = collection.insert_one(payload)
-    return get_link(str(obj.inserted_id), collection)
+    add_to_link_indexes(payload, collection)
+    # insert_one sets _id on the payload, so there is no need to read it back
+    return link_serializer(payload)
+
+
+def add_links_bulk(
+    entries: typing.List[dict | InvalidEntry], added_by: str,
+    collection: Collection, start: int = 0
+) -> typing.List[dict]:
+    """
+    Validate and insert given entries with one unordered batch insert.
+    Return status of every entry, numbered from start.
+    """
+    results = []
+    payloads = []
+    for index, entry in enumerate(entries, start):
+        if isinstance(entry, InvalidEntry):
+            results.append({'index': index, 'status': 'invalid', 'detail': entry.detail})
+            continue
+        # Validate entry the same way as a single link
+        try:
+            data = LinkIn.parse_obj(entry)
+        except error_wrappers.ValidationError as e:
+            results.append({
+                'index': index,
+                'url': entry.get('url') if isinstance(entry, dict) else None,
+                'status': 'invalid',
+                'detail': str(e.errors()[0].get('msg')),
+            })
+            continue
+        data.added_by = added_by
+        results.append({'index': index, 'url': data.url, 'status': 'inserted'})
+        payloads.append((len(results) - 1, get_link_payload(data)))
+
+    if payloads:
+        try:
+            collection.insert_many([payload for _, payload in payloads], ordered=False)
+        except BulkWriteError as e:
+            # Mark entries rejected by the database
+            for error in e.details.get('writeErrors', []):
+                result = results[payloads[error['index']][0]]
+                if error.get('code') == DUPLICATE_KEY_ERROR:
+                    result.update({'status': 'duplicate', 'detail': 'Link with given url already exists.'})
+                else:
+                    result.update({'status': 'invalid', 'detail': error.get('errmsg')})
+        for index, payload in payloads:
+            if results[index]['status'] == 'inserted':
+                add_to_link_indexes(payload, collection)
+    return results
+
+
+def search_links(
+    query: str, collection: Collection, page: int, size: int
+) -> typing.Tuple[typing.List[Link], int]:
+    """
+    Return page of links matching given query, best matches first,
+    and number of all matching links.
+    """
+    search_index = get_search_index(collection)
+    if search_index is None:
+        # Search with the database text index
+        text_query = {'$text': {'$search': query}}
+        documents = collection.find(text_query, {'score': {'$meta': 'textScore'}}).sort(
+            [('score', {'$meta': 'textScore'}), ('_id', DESCENDING)]
+        ).skip((page - 1) * size).limit(size)
+        return [link_serializer(obj) for obj in documents], collection.count_documents(text_query)
+
+    if not search_index.is_fresh:
+        search_index.refresh(collection)
+    ids, total = search_index.search(query, (page - 1) * size, size)
+    # Read found links keeping their rank
+    documents = {obj['_id']: obj for obj in collection.find({'_id': {'$in': ids}})}
+    return [link_serializer(documents[link_id]) for link_id in ids if link_id in documents], total
@@ -0,0 +1,93 @@
+import threading
+import time
+import typing
+from datetime import datetime, timedelta
+
+from pymongo.collection import Collection
+
+from .cache import ExpiringCache
+
+
+def create_revocation_indexes(collection: Collection) -> None:
+    """
+    Create indexes of revoked tokens collection. Documents are removed by
+    the server once their tokens expire.
+    """
+    collection.create_index('expires_at', expireAfterSeconds=0)
+    collection.create_index('revoked_at')
+
+
+class RevocationSet:
+    """
+    In-process set of ids of revoked tokens, backed by a collection with
+    TTL expiry so that every worker rejects them.
+    Ids leave memory when their tokens expire. Revocations of this process
+    apply at once, revocations of other workers are read by refresh, which
+    loads documents revoked since the previous refresh and runs when the
+    set is older than refresh_interval seconds.
+    """
+    # Reread recent revocations to tolerate clock differences between workers
+    LOOKBACK = timedelta(seconds=60)
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.refreshes = 0
+        # Token id to True until the token expires
+        self._revoked = ExpiringCache(None, 0)
+        self._refreshed_at = 0.0
+        self._scanned_at: datetime = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_fresh(self) -> bool:
+        """
+        Return True if set was refreshed within refresh interval.
+        """
+        return self._scanned_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval
+
+    def _add(self, token_id: str, expires_at: typing.Optional[datetime]) -> None:
+        ttl = (expires_at - datetime.utcnow()).total_seconds() if expires_at is not None else float('inf')
+        if ttl > 0:
+            self._revoked.set(token_id, True, ttl=ttl)
+
+    def refresh(self, collection: Collection) -> None:
+        """
+        Read tokens revoked since the last refresh from given collection.
+        """
+        with self._lock:
+            scanned_at = datetime.utcnow()
+            query = {}
+            if self._scanned_at is not None:
+                query = {'revoked_at': {'$gte': self._scanned_at - self.LOOKBACK}}
+            for document in collection.find(query, {'expires_at': 1}):
+                self._add(document['_id'], document.get('expires_at'))
+            self._scanned_at = scanned_at
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+
+    def revoke(self, token_id: str, expires_at: typing.Optional[datetime], collection: Collection) -> None:
+        """
+        Store revoked token id until given expiry time.
+        """
+        collection.update_one(
+            {'_id': token_id},
+            {'$setOnInsert': {'expires_at': expires_at, 'revoked_at': datetime.utcnow()}},
+            upsert=True)
+        self._add(token_id, expires_at)
+
+    def __contains__(self, token_id: str) -> bool:
+        return self._revoked.get(token_id) is not None
+
+    def clear(self) -> None:
+        """
+        Forget revoked ids, the next refresh reads all of them.
+        """
+        with self._lock:
+            self._revoked.clear()
+            self._scanned_at = None
+
+    def stats(self) -> dict:
+        """
+        Return set statistics.
+        """
+        return {**self._revoked.stats(), 'refreshes': self.refreshes}
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Literal, Optional
 from pydantic import BaseModel, Field, EmailStr, HttpUrl
 
 
@@ -42,6 +42,52 @@ class Link(LinkIn):
         }
 
 
+class LinkCursorPage(BaseModel):
+    items: List[Link]
+    next: Optional[str] = None
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "items": [Link.Config.schema_extra["example"]],
+                "next": "ZGfJ2ruVHFUIP62y"
+            }
+        }
+
+
+class LinkSearchPage(BaseModel):
+    items: List[Link]
+    total: int
+    page: int
+    size: int
+
+
+class BulkImportItem(BaseModel):
+    index: int
+    status: Literal['inserted', 'duplicate', 'invalid']
+    url: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class BulkImportResult(BaseModel):
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    items: List[BulkImportItem] = []
+
+
+class SlowQuery(BaseModel):
+    date: datetime
+    database: str
+    collection: str
+    command: str
+    outcome: str
+    duration_ms: float
+    filter: Any = None
+    sort: Any = None
+    plan: Optional[dict] = None
+
+
 class UserModel(BaseModel):
     id: Optional[ObjectIdStr] = Field(None, alias='_id')
     email: EmailStr = None
@@ -56,6 +102,8 @@ class UserModel(BaseModel):
 
 class DBUser(UserModel):
     password: str
+    # Bumped to invalidate access tokens issued before
+    token_version: int = 0
 
     class Config:
         schema_extra = {
@@ -69,9 +117,26 @@ class DBUser(UserModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str
 
 
+class RefreshIn(BaseModel):
+    refresh_token: str
+
+
+class TokenClaims(BaseModel):
+    """
+    Identity and role flags of the user an access token was issued to.
+    """
+    id: str = Field(alias='uid')
+    email: str = Field(alias='sub')
+    username: str
+    is_admin: bool = False
+    disabled: bool = False
+    token_version: int = 0
+
+
 class TokenIn(BaseModel):
     email: EmailStr
     password: str
@@ -0,0 +1,231 @@
+import bisect
+import heapq
+import itertools
+import math
+import re
+import typing
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from bson.objectid import ObjectId
+from pymongo.collection import Collection
+
+from .indexing import IncrementalIndex
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+# Tokens present in nearly every url
+IGNORED_TOKENS = {'http', 'https', 'www'}
+
+
+def tokenize(text: str) -> typing.List[str]:
+    """
+    Return lowercase alphanumeric words of given text.
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in IGNORED_TOKENS]
+
+
+def tokenize_link(document: dict) -> typing.Set[str]:
+    """
+    Return search tokens of link host, path segments and author.
+    """
+    parts = urlsplit(document.get('url') or '')
+    tokens = set(tokenize(parts.hostname or ''))
+    tokens.update(tokenize(parts.path))
+    tokens.update(tokenize(document.get('added_by') or ''))
+    return tokens
+
+
+class LinkSearchIndex(IncrementalIndex):
+    """
+    In-process inverted index of link tokens.
+    Every query word has to match a token exactly or as its prefix. Results
+    are ranked by the sum of inverse document frequencies of matched words,
+    prefix matches count half, ties are ordered newest first.
+    Postings are stored as compact arrays and turned into bitmaps (python
+    ints, bit n is document number n) when queried, so that intersections
+    and counts run in C. Bitmaps of recently queried tokens are cached.
+    """
+    projection = {'url': 1, 'added_by': 1}
+    structures = ('_postings', '_vocabulary', '_vocabulary_sorted', '_ids', '_bitmaps')
+    # Limit of tokens a single query word can expand to
+    MAX_EXPANSIONS = 64
+    # Ranking compares every combination of exact and prefix matches
+    MAX_QUERY_WORDS = 6
+    PREFIX_WEIGHT = 0.5
+    BITMAP_CACHE_SIZE = 512
+
+    def __init__(self, refresh_interval: float):
+        super().__init__(refresh_interval)
+        self._reset(None)
+
+    def _reset(self, collection: Collection) -> None:
+        # Token to array of document numbers in ascending order
+        self._postings: typing.Dict[str, array] = {}
+        # Tokens for prefix lookups, sorted before searching
+        self._vocabulary: typing.List[str] = []
+        self._vocabulary_sorted = True
+        # Document ids, 12 bytes per document number
+        self._ids = bytearray()
+        # Token, or '*' and prefix, to version and bitmap of matching documents
+        self._bitmaps: OrderedDict = OrderedDict()
+
+    def _add_document(self, document: dict) -> None:
+        number = len(self._ids) // 12
+        self._ids += document['_id'].binary
+        for token in tokenize_link(document):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = array('I')
+                self._vocabulary.append(token)
+                self._vocabulary_sorted = False
+            postings.append(number)
+
+    def _build(self, collection: Collection, scanned_at: datetime) -> 'LinkSearchIndex':
+        # Warm the new structures before they are swapped in
+        built = super()._build(collection, scanned_at)
+        built.warm()
+        return built
+
+    def warm(self) -> None:
+        """
+        Sort vocabulary and make bitmaps of the most frequent tokens.
+        """
+        with self._lock:
+            self._sort_vocabulary()
+            frequent = heapq.nlargest(
+                self.BITMAP_CACHE_SIZE // 2, self._postings, key=lambda token: len(self._postings[token]))
+            for token in reversed(frequent):
+                self._bitmap(token)
+                self._prefix_bitmap(token)
+
+    @property
+    def count(self) -> int:
+        """
+        Return number of indexed documents.
+        """
+        return len(self._ids) // 12
+
+    def _to_bitmap(self, numbers: typing.Iterable[int]) -> int:
+        bits = bytearray(self.count // 8 + 1)
+        for number in numbers:
+            bits[number >> 3] |= 1 << (number & 7)
+        return int.from_bytes(bits, 'little')
+
+    def _sort_vocabulary(self) -> None:
+        if not self._vocabulary_sorted:
+            self._vocabulary.sort()
+            self._vocabulary_sorted = True
+
+    def _cache_bitmap(self, key: str, version: int, bitmap: int) -> int:
+        self._bitmaps[key] = (version, bitmap)
+        self._bitmaps.move_to_end(key)
+        while len(self._bitmaps) > self.BITMAP_CACHE_SIZE:
+            self._bitmaps.popitem(last=False)
+        return bitmap
+
+    def _bitmap(self, token: str) -> int:
+        # Bitmap of documents containing given token
+        postings = self._postings.get(token)
+        if postings is None:
+            return 0
+        cached = self._bitmaps.get(token)
+        if cached is not None and cached[0] == len(postings):
+            self._bitmaps.move_to_end(token)
+            return cached[1]
+        if cached is not None:
+            # Add documents indexed since the bitmap was made
+            bitmap = cached[1] | self._to_bitmap(postings[cached[0]:])
+        else:
+            bitmap = self._to_bitmap(postings)
+        return self._cache_bitmap(token, len(postings), bitmap)
+
+    def _prefix_bitmap(self, word: str) -> int:
+        # Bitmap of documents containing tokens longer than given word and
+        # starting with it, kept until another document is indexed
+        key = '*' + word
+        cached = self._bitmaps.get(key)
+        if cached is not None and cached[0] == self.count:
+            self._bitmaps.move_to_end(key)
+            return cached[1]
+        prefixed = []
+        position = bisect.bisect_left(self._vocabulary, word)
+        while (position < len(self._vocabulary) and len(prefixed) < self.MAX_EXPANSIONS
+                and self._vocabulary[position].startswith(word)):
+            if self._vocabulary[position] != word:
+                prefixed.append(self._postings[self._vocabulary[position]])
+            position += 1
+        bitmap = self._to_bitmap(itertools.chain.from_iterable(prefixed)) if prefixed else 0
+        return self._cache_bitmap(key, self.count, bitmap)
+
+    def _weight(self, bitmap: int) -> float:
+        # Inverse document frequency
+        return math.log(1 + self.count / bitmap.bit_count())
+
+    def _match_word(self, word: str) -> typing.List[typing.Tuple[int, float]]:
+        # Bitmaps of documents matching given query word exactly and by
+        # prefix only, with weights of both kinds of match
+        exact = self._bitmap(word)
+        prefix = self._prefix_bitmap(word) & ~exact
+        matches = []
+        if exact:
+            matches.append((exact, self._weight(exact)))
+        if prefix:
+            matches.append((prefix, self._weight(prefix) * self.PREFIX_WEIGHT))
+        return matches
+
+    def search(self, query: str, offset: int, limit: int) -> typing.Tuple[typing.List[ObjectId], int]:
+        """
+        Return ids of ranked links matching given query and number of all matches.
+        """
+        words = list(dict.fromkeys(tokenize(query)))[:self.MAX_QUERY_WORDS]
+        if not words:
+            return [], 0
+        with self._lock:
+            self._sort_vocabulary()
+            word_matches = [self._match_word(word) for word in words]
+            if not all(word_matches):
+                return [], 0
+
+            # Documents matching every word
+            matched = -1
+            for matches in word_matches:
+                word_bitmap = 0
+                for bitmap, _ in matches:
+                    word_bitmap |= bitmap
+                matched &= word_bitmap
+            if not matched:
+                return [], 0
+
+            # Take newest documents of the best scoring group of matches first
+            groups = sorted(
+                itertools.product(*word_matches),
+                key=lambda group: sum(weight for _, weight in group), reverse=True)
+            needed = offset + limit
+            ranked = []
+            for group in groups:
+                documents = matched
+                for bitmap, _ in group:
+                    documents &= bitmap
+                while documents and len(ranked) < needed:
+                    number = documents.bit_length() - 1
+                    ranked.append(number)
+                    documents ^= 1 << number
+                if len(ranked) >= needed:
+                    break
+
+            ids = [ObjectId(bytes(self._ids[number * 12:number * 12 + 12])) for number in ranked[offset:]]
+            return ids, matched.bit_count()
+
+    def stats(self) -> dict:
+        """
+        Return index statistics.
+        """
+        stats = super().stats()
+        stats.update({
+            'documents': self.count,
+            'tokens': len(self._vocabulary),
+            'cached_bitmaps': len(self._bitmaps),
+        })
+        return stats
@@ -1,19 +1,45 @@
-from pydantic import error_wrappers
+from pydantic import BaseModel, error_wrappers
 
+from app.config import settings
 from .schemas import Link, UserModel, DBUser
 
 
-def link_serializer(obj: dict) -> Link:
+def construct_model(model: type[BaseModel], obj: dict) -> BaseModel:
     """
-    Parse link data from database into Link model schema.
+    Build model from trusted database row without validation.
+    Only fields of the model are taken, ObjectId is converted into str.
     """
-    return Link.parse_obj(obj)
+    values = {}
+    for name, field in model.__fields__.items():
+        if field.alias in obj:
+            values[name] = obj[field.alias]
+        elif name in obj:
+            values[name] = obj[name]
+    if 'id' in values and values['id'] is not None:
+        values['id'] = str(values['id'])
+    return model.construct(**values)
+
+
+def link_serializer(obj: dict, model: type[BaseModel] = Link) -> Link:
+    """
+    Parse link data from database into Link model schema, or given
+    model with a subset of its fields.
+    """
+    if obj is None:
+        raise ValueError('Link does not exists.')
+    if settings.TRUSTED_ROWS:
+        return construct_model(model, obj)
+    return model.parse_obj(obj)
 
 
 def user_serializer(obj: dict) -> UserModel:
     """
     Parse user data from database into UserModel schema.
     """
+    if obj is None:
+        raise ValueError('User does not exists')
+    if settings.TRUSTED_ROWS:
+        return construct_model(UserModel, obj)
     try:
         return UserModel.parse_obj(obj)
     except error_wrappers.ValidationError:
@@ -24,6 +50,10 @@ def dbuser_serializer(obj: dict) -> DBUser:
     """
     Parse user data from database into DBUser schema.
     """
+    if obj is None:
+        raise ValueError('User does not exists')
+    if settings.TRUSTED_ROWS:
+        return construct_model(DBUser, obj)
     try:
         return DBUser.parse_obj(obj)
     except error_wrappers.ValidationError:
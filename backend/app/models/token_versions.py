@@ -0,0 +1,78 @@
+import threading
+import time
+import typing
+from datetime import datetime, timedelta
+
+from pymongo.collection import Collection
+
+
+class TokenVersions:
+    """
+    In-process map of user id to token version, used to reject access
+    tokens issued before a password change or status update without reading
+    the user on every request.
+    Only users whose version was bumped are stored, others have version 0.
+    Bumps of this process apply at once, bumps of other workers are read
+    by refresh, which loads users bumped since the previous refresh and
+    runs when the map is older than refresh_interval seconds.
+    """
+    # Reread recent bumps to tolerate clock differences between workers
+    LOOKBACK = timedelta(seconds=60)
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.refreshes = 0
+        self._versions: typing.Dict[str, int] = {}
+        self._refreshed_at = 0.0
+        self._scanned_at: datetime = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_fresh(self) -> bool:
+        """
+        Return True if versions were refreshed within refresh interval.
+        """
+        return self._scanned_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval
+
+    def refresh(self, collection: Collection) -> None:
+        """
+        Read versions bumped since the last refresh from given users collection.
+        """
+        with self._lock:
+            scanned_at = datetime.utcnow()
+            if self._scanned_at is None:
+                query = {'token_version': {'$gt': 0}}
+            else:
+                query = {'token_version_updated': {'$gte': self._scanned_at - self.LOOKBACK}}
+            for document in collection.find(query, {'token_version': 1}):
+                self._update(str(document['_id']), document.get('token_version', 0))
+            self._scanned_at = scanned_at
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+
+    def _update(self, user_id: str, version: int) -> None:
+        # Versions only grow, a refresh never undoes a newer local bump
+        if version > self._versions.get(user_id, 0):
+            self._versions[user_id] = version
+
+    def set(self, user_id: str, version: int) -> None:
+        """
+        Store version of a user bumped by this process.
+        """
+        with self._lock:
+            self._update(user_id, version)
+
+    def get(self, user_id: str) -> int:
+        """
+        Return current token version of given user.
+        """
+        return self._versions.get(user_id, 0)
+
+    def stats(self) -> dict:
+        """
+        Return map statistics.
+        """
+        return {
+            'size': len(self._versions),
+            'refreshes': self.refreshes,
+        }
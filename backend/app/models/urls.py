@@ -0,0 +1,56 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMETERS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_hsenc', '_hsmi',
+}
+TRACKING_PREFIXES = ('utm_',)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _is_tracking_parameter(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMETERS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Return canonical form of given url, so that urls pointing at the same
+    page compare equal. Scheme and host are lowercased, default ports and
+    trailing slashes are removed, tracking query parameters are stripped
+    and the remaining ones are sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    # Rebuild network location without default port
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f'[{host}]'
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{netloc}:{parts.port}'
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo = f'{userinfo}:{parts.password}'
+        netloc = f'{userinfo}@{netloc}'
+
+    # Remove trailing slash, the root path is always "/"
+    path = parts.path.rstrip('/') or '/'
+
+    query = urlencode(sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_parameter(name)
+    ))
+    return urlunsplit((scheme, netloc, path, query, parts.fragment))
+
+
+def get_url_hash(url: str) -> bytes:
+    """
+    Return 16 byte hash of canonical form of given url.
+    """
+    return hashlib.blake2b(canonicalize_url(url).encode(), digest_size=16).digest()
@@ -1,20 +1,49 @@
+import hashlib
+import secrets
+import time
+import typing
 from datetime import datetime, timedelta
 
+from pymongo import ReturnDocument
 from pymongo.collection import Collection
-from passlib.hash import pbkdf2_sha256
 from bson.objectid import ObjectId
 from bson import errors
-import jwt
 
-from .schemas import UserModel, DBUser
-from .serializers import user_serializer, dbuser_serializer
+from .cache import ExpiringCache, TTLCache
+from .schemas import UserModel, DBUser, TokenClaims
+from .serializers import construct_model, user_serializer, dbuser_serializer
+from .revocations import RevocationSet, create_revocation_indexes
+from .token_versions import TokenVersions
 from app.config import settings
 
+# Authenticated users by (collection, email)
+user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+# Claims of verified access tokens by token digest, kept until they expire
+token_cache = ExpiringCache(settings.TOKEN_CACHE_SIZE, 0)
+# Token versions of users by collection name
+token_versions: typing.Dict[str, TokenVersions] = {}
+# Revoked token ids by revoked tokens collection name
+revocation_sets: typing.Dict[str, RevocationSet] = {}
+# Claims copied from refresh tokens into access tokens
+TOKEN_CLAIMS = ('sub', 'uid', 'username', 'is_admin', 'disabled', 'token_version')
+REFRESH_TOKEN_TYPE = 'refresh'
+
+
+def create_user_indexes(collection: Collection) -> None:
+    """
+    Create indexes used by user queries.
+    """
+    collection.create_index('email')
+    collection.create_index('token_version_updated', sparse=True)
+    create_revocation_indexes(get_revocation_collection(collection))
+
 
 def get_hashed_password(password: str) -> str:
     """
     Return hashed given password.
     """
+    # passlib and jwt are imported on first use to keep startup fast
+    from passlib.hash import pbkdf2_sha256
     return pbkdf2_sha256.hash(password)
 
 
@@ -22,6 +51,7 @@ def verify_password(password: str, hashed_password: str) -> bool:
     """
     Return True or False depens on password matching.
     """
+    from passlib.hash import pbkdf2_sha256
     return pbkdf2_sha256.verify(password, hashed_password)
 
 
@@ -61,6 +91,32 @@ def get_user_with_password(email: str, collection: Collection) -> DBUser:
     return dbuser_serializer(user_obj)
 
 
+def get_user_cache_key(email: str, collection: Collection) -> tuple:
+    """
+    Return user cache key.
+    """
+    return (collection.full_name, email)
+
+
+def invalidate_cached_user(email: str, collection: Collection) -> None:
+    """
+    Remove user with given email from the user cache.
+    """
+    user_cache.invalidate(get_user_cache_key(email, collection))
+
+
+def get_cached_user_with_password(email: str, collection: Collection) -> DBUser:
+    """
+    Get user with hashed password from the user cache or database.
+    """
+    key = get_user_cache_key(email, collection)
+    user = user_cache.get(key)
+    if user is None:
+        user = get_user_with_password(email, collection)
+        user_cache.set(key, user)
+    return user
+
+
 def authenticate_user(collection: Collection, email: str, password: str) -> bool | DBUser:
     """
     Aunthenticate user with given username and password.
@@ -77,19 +133,210 @@ def authenticate_user(collection: Collection, email: str, password: str) -> bool
         return False
 
 
-def create_access_token(data: dict):
+def get_user_claims(user: DBUser) -> dict:
+    """
+    Return access token claims of given user.
+    """
+    return {
+        'sub': user.email,
+        'uid': str(user.id),
+        'username': user.username,
+        'is_admin': user.is_admin,
+        'disabled': user.disabled,
+        'token_version': user.token_version,
+    }
+
+
+def encode_token(data: dict, expire_minutes: float) -> str:
+    """
+    Return signed token with given claims, a unique id and expiry time.
+    """
+    to_encode = {**data, 'jti': secrets.token_urlsafe(12)}
+    to_encode['exp'] = datetime.utcnow() + timedelta(minutes=expire_minutes)
+    import jwt
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def create_access_token(data: dict, user: DBUser = None):
     """
     Create encoded access token.
+    Pass user to add its id, role flags and token version to the token.
     """
     # Copy given data
     to_encode = data.copy()
-    # Set expire time
-    expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    # Update dict
-    to_encode.update({'exp': expire})
-    # Create token
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    if user is not None:
+        to_encode.update(get_user_claims(user))
+    return encode_token(to_encode, settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+def create_refresh_token(user: DBUser) -> str:
+    """
+    Create encoded refresh token of given user. Refresh tokens carry the
+    same claims as access tokens and are only accepted by decode_refresh_token.
+    """
+    return encode_token(
+        {**get_user_claims(user), 'type': REFRESH_TOKEN_TYPE}, settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+
+
+def create_access_token_from_refresh(payload: dict) -> str:
+    """
+    Create access token with claims of given refresh token payload.
+    """
+    return encode_token({key: payload[key] for key in TOKEN_CLAIMS}, settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+def get_token_digest(token: str) -> bytes:
+    """
+    Return cache key of given token, raw tokens are not kept in memory.
+    """
+    return hashlib.sha256(token.encode()).digest()
+
+
+def get_token_id(token: str, payload: dict) -> str:
+    """
+    Return id used to revoke given token, tokens issued without one are
+    identified by their digest.
+    """
+    return payload.get('jti') or get_token_digest(token).hex()
+
+
+def verify_token(token: str) -> typing.Optional[dict]:
+    """
+    Return payload of given token, None if its signature is invalid or it expired.
+    """
+    import jwt
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except (jwt.exceptions.DecodeError, jwt.exceptions.ExpiredSignatureError):
+        return None
+
+
+def decode_access_token(token: str) -> typing.Optional[dict]:
+    """
+    Return payload of given access token, None if it is invalid or expired.
+    Payloads of verified tokens are cached until the tokens expire, the
+    returned payload must not be modified. Revocation is checked by
+    is_token_revoked.
+    """
+    digest = get_token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+    payload = verify_token(token)
+    if payload is None or payload.get('type') == REFRESH_TOKEN_TYPE:
+        return None
+    # Tokens without expiry are verified every time
+    if 'exp' in payload:
+        token_cache.set(digest, payload, ttl=payload['exp'] - time.time())
+    return payload
+
+
+def decode_refresh_token(token: str) -> typing.Optional[dict]:
+    """
+    Return payload of given refresh token, None if it is invalid or expired.
+    """
+    payload = verify_token(token)
+    if payload is None or payload.get('type') != REFRESH_TOKEN_TYPE:
+        return None
+    return payload
+
+
+def get_revocation_collection(collection: Collection) -> Collection:
+    """
+    Return collection of revoked tokens of users stored in given collection.
+    """
+    return collection.database[f'{collection.name}_revoked_tokens']
+
+
+def get_revocation_set(collection: Collection) -> RevocationSet:
+    """
+    Return revoked tokens of users stored in given collection.
+    """
+    revocations = get_revocation_collection(collection)
+    revocation_set = revocation_sets.get(revocations.full_name)
+    if revocation_set is None:
+        revocation_set = revocation_sets.setdefault(
+            revocations.full_name, RevocationSet(settings.REVOCATION_REFRESH_SECONDS))
+    return revocation_set
+
+
+def is_token_revoked(token: str, payload: dict, collection: Collection) -> bool:
+    """
+    Return True if given token of a user stored in given collection was revoked.
+    """
+    revocation_set = get_revocation_set(collection)
+    if not revocation_set.is_fresh:
+        revocation_set.refresh(get_revocation_collection(collection))
+    return get_token_id(token, payload) in revocation_set
+
+
+def revoke_token(token: str, payload: dict, collection: Collection) -> None:
+    """
+    Reject given verified token of a user stored in given collection
+    until it expires, in all workers.
+    """
+    expires_at = datetime.utcfromtimestamp(payload['exp']) if 'exp' in payload else None
+    get_revocation_set(collection).revoke(
+        get_token_id(token, payload), expires_at, get_revocation_collection(collection))
+    token_cache.invalidate(get_token_digest(token))
+
+
+def revoke_access_token(token: str, collection: Collection) -> None:
+    """
+    Reject given access token until it expires.
+    """
+    payload = decode_access_token(token)
+    if payload is not None:
+        revoke_token(token, payload, collection)
+
+
+def get_token_claims(payload: dict) -> TokenClaims:
+    """
+    Return claims of verified access token payload.
+    """
+    return construct_model(TokenClaims, payload)
+
+
+def get_token_versions(collection: Collection) -> TokenVersions:
+    """
+    Return token versions of users stored in given collection.
+    """
+    versions = token_versions.get(collection.full_name)
+    if versions is None:
+        versions = token_versions.setdefault(
+            collection.full_name, TokenVersions(settings.TOKEN_VERSION_REFRESH_SECONDS))
+    return versions
+
+
+def get_token_version(user_id: str, collection: Collection) -> int:
+    """
+    Return current token version of given user.
+    """
+    versions = get_token_versions(collection)
+    if not versions.is_fresh:
+        versions.refresh(collection)
+    return versions.get(user_id)
+
+
+def bump_token_version(user_id: str, collection: Collection, changes: dict = None) -> typing.Optional[dict]:
+    """
+    Apply given changes to the user and bump its token version, access
+    tokens issued before are rejected. Return updated user email and
+    version, None if user does not exist.
+    """
+    obj = collection.find_one_and_update(
+        {'_id': ObjectId(user_id)},
+        {
+            '$set': {**(changes or {}), 'token_version_updated': datetime.utcnow()},
+            '$inc': {'token_version': 1},
+        },
+        projection={'email': 1, 'token_version': 1},
+        return_document=ReturnDocument.AFTER)
+    if obj is None:
+        return None
+    get_token_versions(collection).set(str(obj['_id']), obj['token_version'])
+    invalidate_cached_user(obj.get('email'), collection)
+    return obj
 
 
 def check_that_user_exists(email: str, collection: Collection) -> bool:
@@ -102,9 +349,12 @@ def check_that_user_exists(email: str, collection: Collection) -> bool:
     return False
 
 
-def create_user(data: DBUser, collection: Collection) -> UserModel:
+def create_user(
+    data: DBUser, collection: Collection, password_hashed: bool = False
+) -> UserModel:
     """
     Add user to database.
+    Pass password_hashed=True if data.password is already hashed.
     """
     # Check that user with given email exists
     exists = check_that_user_exists(data.email, collection)
@@ -112,14 +362,16 @@ def create_user(data: DBUser, collection: Collection) -> UserModel:
         raise ValueError('User with this email already exists.')
 
     # Hash user password
-    user_pwd = get_hashed_password(data.password)
-    data.password = user_pwd
+    if not password_hashed:
+        data.password = get_hashed_password(data.password)
 
     # Update date_added field
     data.date_added = datetime.utcnow()
+    data.token_version = 0
 
     # Add user to the database
     obj = collection.insert_one(data.dict())
+    invalidate_cached_user(data.email, collection)
 
     # Return UserModel schema
     return get_user(obj.inserted_id, collection)
@@ -143,15 +395,45 @@ def update_user_password(
     if not verify_password(old_password, user.get('password')):
         raise ValueError('Old password is incorrect.')
 
-    # Hash user password
-    user_pwd = get_hashed_password(new_password)
+    # Hash user password and save it
+    return set_user_password(user_id, collection, get_hashed_password(new_password))
 
-    # Update user password
-    obj = collection.update_one(
-        {'_id': ObjectId(user_id)}, {'$set': {'password': user_pwd}})
 
-    if obj.modified_count == 0:
+def set_user_password(user_id: str, collection: Collection, hashed_password: str) -> UserModel:
+    """
+    Save given hashed password for user.
+    """
+    # Update user password, tokens issued with the old one are rejected
+    if bump_token_version(user_id, collection, {'password': hashed_password}) is None:
         raise ValueError('User does not exists.')
 
     # Parse data into UserModel
     return get_user(user_id, collection)
+
+
+def update_user_status(
+    user_id: str, collection: Collection,
+    disabled: bool = None, is_admin: bool = None
+) -> UserModel:
+    """
+    Update user disabled and admin flags.
+    """
+    changes = {}
+    if disabled is not None:
+        changes['disabled'] = disabled
+    if is_admin is not None:
+        changes['is_admin'] = is_admin
+
+    # Get user from database
+    user = get_raw_user_data(collection, _id=user_id)
+
+    # Check that user exists
+    if not user:
+        raise ValueError('User does not exists.')
+
+    if changes:
+        # Role flags are stored in access tokens, tokens issued before are rejected
+        bump_token_version(user.get('_id'), collection, changes)
+
+    # Parse data into UserModel
+    return get_user(user_id, collection)
@@ -0,0 +1,37 @@
+from typing import Annotated, List
+
+from fastapi import APIRouter, Depends, Query, Response, status
+
+from app.responses import FastJSONResponse
+from app.slow_queries import slow_query_log
+from models.schemas import SlowQuery, TokenClaims
+from .users import get_admin_claims
+
+router = APIRouter(
+    prefix='/admin',
+    tags=['Admin'],
+    default_response_class=FastJSONResponse
+)
+
+
+@router.get("/slow-queries", response_model=List[SlowQuery], status_code=status.HTTP_200_OK)
+async def slow_queries(
+    admin: Annotated[TokenClaims, Depends(get_admin_claims)],
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100
+) -> list:
+    """
+    Get recent Mongo commands slower than the configured threshold, newest first.
+    Filters are shown without values, `plan` is set when explain capture is enabled.
+    """
+    return slow_query_log.entries(limit)
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries(
+    admin: Annotated[TokenClaims, Depends(get_admin_claims)]
+) -> Response:
+    """
+    Remove recorded slow commands.
+    """
+    slow_query_log.clear()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,25 +1,42 @@
-from typing import Annotated
+from typing import Annotated, Literal, Optional, Tuple
 
-from fastapi import APIRouter, status, HTTPException, Depends
+from fastapi import APIRouter, status, HTTPException, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pymongo.collection import Collection
 from bson import errors
-from pydantic import HttpUrl
+from pydantic import BaseModel, HttpUrl
 from fastapi_pagination.links import Page
-from fastapi_pagination import paginate
+from fastapi_pagination import paginate, set_page
 
-from models.schemas import Link, LinkIn, UserModel
+from app.config import settings
+from app.responses import FastJSONResponse, etag_matches, make_etag
+from models.exporters import EXPORTERS
+from models.importers import BookmarkParser, NDJSONParser
 from models.link_services import (
+    cache_links_page,
+    get_cached_links_page,
+    get_link_model,
+    iter_link_batches,
+    parse_link_fields
+)
+from models.schemas import BulkImportResult, Link, LinkIn, LinkCursorPage, LinkSearchPage, TokenClaims
+from models.async_link_services import (
     get_links,
+    get_links_page,
+    get_links_version,
     get_link,
     add_link,
-    check_that_link_exists
+    add_links_bulk,
+    check_that_link_exists,
+    search_links
 )
-from db.database import link_collection
-from .users import get_current_active_user
+from db import database
+from .users import get_admin_claims, get_current_claims
 
 router = APIRouter(
     prefix='/links',
-    tags=['Links']
+    tags=['Links'],
+    default_response_class=FastJSONResponse
 )
 
 
@@ -27,31 +44,155 @@ async def get_collection():
     """
     Return db collection.
     """
-    yield link_collection
+    yield database.get_link_collection()
+
+
+async def get_link_fields(
+    fields: Annotated[str, Query(description='Comma separated link fields to return, e.g. `url,date_added`')] = None
+) -> Optional[Tuple[str, ...]]:
+    """
+    Return requested link fields, None for all fields.
+    """
+    try:
+        return parse_link_fields(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+def link_response(content: BaseModel, response: Response, reduced: bool = False) -> BaseModel | Response:
+    """
+    Return JSON response of models built from trusted database rows,
+    skipping FastAPI validation against response_model. Reduced models of
+    sparse fieldsets do not match response_model and are always rendered
+    directly. Headers set on given response are kept.
+    Return content unchanged if rows are validated.
+    """
+    if not settings.TRUSTED_ROWS and not reduced:
+        return content
+    return FastJSONResponse(content, headers=dict(response.headers))
+
+
+def not_modified_response(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Set ETag header and return 304 response if the client has given version.
+    """
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+    return None
 
 
 @router.get("/", response_model=Page[Link], status_code=status.HTTP_200_OK)
 async def links(
+    request: Request,
+    response: Response,
     db: Annotated[Collection, Depends(get_collection)],
-    user: Annotated[UserModel, Depends(get_current_active_user)]
-) -> Page[Link] | list:
+    user: Annotated[TokenClaims, Depends(get_current_claims)],
+    fields: Annotated[Optional[Tuple[str, ...]], Depends(get_link_fields)]
+) -> Page[Link] | Response:
     """
     Get list of all available link objects form database.
+    Pass `fields` to get only some of link fields, `_id` is always returned.
+    Send the returned `ETag` in `If-None-Match` to get 304 if nothing changed.
+    * All date data are returned in UTC time
+    """
+    # Version of the collection is read without reading links
+    etag = make_etag(await get_links_version(db), request.url.query)
+    not_modified = not_modified_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    # First page, loaded by everyone, is kept rendered while its version is current
+    first_page = request.query_params.get('page', '1') == '1'
+    body = get_cached_links_page(db, etag) if first_page else None
+    if body is not None:
+        return Response(body, media_type='application/json', headers={'ETag': etag})
+    items = await get_links(collection=db, fields=fields)
+    with set_page(Page[get_link_model(fields)]):
+        result = link_response(paginate(items), response, reduced=fields is not None)
+    if first_page and isinstance(result, Response):
+        cache_links_page(db, etag, result.body)
+    return result
+
+
+@router.get("/cursor", response_model=LinkCursorPage, status_code=status.HTTP_200_OK)
+async def links_cursor(
+    response: Response,
+    db: Annotated[Collection, Depends(get_collection)],
+    user: Annotated[TokenClaims, Depends(get_current_claims)],
+    size: Annotated[int, Query(ge=1, le=100)] = 50,
+    cursor: str = None
+) -> LinkCursorPage | Response:
+    """
+    Get page of link objects, newest first, using keyset pagination.
+    Pass the returned `next` value as `cursor` to get the following page.
+    * All date data are returned in UTC time
+    """
+    try:
+        items, next_cursor = await get_links_page(db, size, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return link_response(LinkCursorPage.construct(items=items, next=next_cursor), response)
+
+
+@router.get("/search", response_model=LinkSearchPage, status_code=status.HTTP_200_OK)
+async def search(
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    response: Response,
+    db: Annotated[Collection, Depends(get_collection)],
+    user: Annotated[TokenClaims, Depends(get_current_claims)],
+    page: Annotated[int, Query(ge=1)] = 1,
+    size: Annotated[int, Query(ge=1, le=100)] = 50
+) -> LinkSearchPage | Response:
+    """
+    Search links by words of their host, path and author, best matches first.
+    A word also matches longer words it is a prefix of.
+    * All date data are returned in UTC time
+    """
+    items, total = await search_links(q, db, page, size)
+    return link_response(LinkSearchPage.construct(items=items, total=total, page=page, size=size), response)
+
+
+@router.get("/export", response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+async def export_links(
+    db: Annotated[Collection, Depends(get_collection)],
+    user: Annotated[TokenClaims, Depends(get_current_claims)],
+    export_format: Annotated[Literal['ndjson', 'csv'], Query(alias='format')] = 'ndjson'
+) -> StreamingResponse:
+    """
+    Export all link objects, newest first, as NDJSON or CSV.
+    The export is streamed from the database cursor in batches.
     * All date data are returned in UTC time
     """
-    return paginate(get_links(collection=db))
+    exporter, media_type = EXPORTERS[export_format]
+    # Sync generator, starlette iterates it in a worker thread
+    content = exporter(iter_link_batches(db, settings.EXPORT_BATCH_SIZE))
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="links.{export_format}"'}
+    )
 
 
 @router.get("/exists", response_model=None, status_code=status.HTTP_200_OK)
 async def check_link_exist(
     url: HttpUrl,
     db: Annotated[Collection, Depends(get_collection)],
-    user: Annotated[UserModel, Depends(get_current_active_user)]
+    user: Annotated[TokenClaims, Depends(get_current_claims)]
 ) -> dict:
     """
     Return boolean value that according to the link existence.
+    Answers come from an in-process filter of stored urls: a link added by
+    another worker within `LINK_FILTER_REFRESH_SECONDS`, or given a url hash
+    by backfill_url_hash within `LINK_FILTER_REBUILD_SECONDS`, may be
+    reported as missing. Adding such a link still fails as a duplicate.
     """
-    exists = check_that_link_exists(url, collection=db)
+    exists = await check_that_link_exists(url, collection=db)
     if not exists:
         return {'detail': 'Link does not exists.'}
     raise HTTPException(
@@ -63,27 +204,37 @@ async def check_link_exist(
 @router.get("/{item_id}", response_model=Link, status_code=status.HTTP_200_OK)
 async def link(
     item_id: str,
+    request: Request,
+    response: Response,
     db: Annotated[Collection, Depends(get_collection)],
-    user: Annotated[UserModel, Depends(get_current_active_user)]
+    user: Annotated[TokenClaims, Depends(get_current_claims)],
+    fields: Annotated[Optional[Tuple[str, ...]], Depends(get_link_fields)]
 ):
     """
     Get a specific link based on given id.
+    Pass `fields` to get only some of link fields, `_id` is always returned.
+    Send the returned `ETag` in `If-None-Match` to get 304 if nothing changed.
     * All date data are returned in UTC time
     """
+    # Links are never updated, id and fields identify the response
+    not_modified = not_modified_response(request, response, make_etag(item_id, fields))
+    if not_modified is not None:
+        return not_modified
     try:
-        return get_link(item_id, collection=db)
+        item = await get_link(item_id, collection=db, fields=fields)
     except (ValueError, errors.InvalidId) as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
+    return link_response(item, response, reduced=fields is not None)
 
 
 @router.post("/", response_model=Link, status_code=status.HTTP_201_CREATED)
 async def add_new_link(
     data: LinkIn,
     db: Annotated[Collection, Depends(get_collection)],
-    user: Annotated[UserModel, Depends(get_current_active_user)]
+    user: Annotated[TokenClaims, Depends(get_current_claims)]
 ):
     """
     Add new link object to the database.
@@ -93,9 +244,51 @@ async def add_new_link(
     try:
         # Update data with current user
         data.added_by = user.username
-        return add_link(data, collection=db)
+        return await add_link(data, collection=db)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+
+
+@router.post("/bulk", response_model=BulkImportResult, status_code=status.HTTP_200_OK)
+async def add_new_links_bulk(
+    request: Request,
+    db: Annotated[Collection, Depends(get_collection)],
+    admin: Annotated[TokenClaims, Depends(get_admin_claims)]
+) -> dict:
+    """
+    Import many links at once. Admin only.
+    The request body is streamed and inserted in batches, it can be either
+    newline delimited JSON objects with `url` field (`application/x-ndjson`)
+    or a browser bookmarks HTML export (`text/html`).
+    Return status of every imported entry.
+    * Links are added by the current user, like single added links
+    """
+    if 'html' in request.headers.get('content-type', ''):
+        parser = BookmarkParser()
+    else:
+        parser = NDJSONParser()
+    items = []
+    entries = []
+
+    async for chunk in request.stream():
+        for entry in parser.feed(chunk):
+            entries.append(entry)
+            # Insert collected entries in batches
+            if len(entries) >= settings.BULK_BATCH_SIZE:
+                items.extend(await add_links_bulk(entries, admin.username, db, len(items)))
+                entries = []
+    entries.extend(parser.close())
+    if entries:
+        items.extend(await add_links_bulk(entries, admin.username, db, len(items)))
+
+    # Count statuses
+    statuses = [item['status'] for item in items]
+    return {
+        'inserted': statuses.count('inserted'),
+        'duplicates': statuses.count('duplicate'),
+        'invalid': statuses.count('invalid'),
+        'items': items,
+    }
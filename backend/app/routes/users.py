@@ -1,35 +1,80 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from pymongo.collection import Collection
-import jwt
 
-from db.database import user_collection
+from db import database
 from app.config import settings
+from app.responses import FastJSONResponse
+from models.hashing import HashPoolFull
 from models.user_services import (
-    get_user_with_password,
-    authenticate_user,
     create_access_token,
+    create_access_token_from_refresh,
+    create_refresh_token,
+    decode_access_token,
+    decode_refresh_token,
+    get_token_claims,
+    get_user_claims
+)
+from models.async_user_services import (
+    get_cached_user_with_password,
+    get_token_version,
+    is_token_revoked,
+    revoke_token,
+    authenticate_user,
     create_user,
     update_user_password
 )
-from models.schemas import Token, DBUser, UserModel, PasswordUpdate, TokenIn
+from models.schemas import Token, TokenClaims, DBUser, UserModel, PasswordUpdate, RefreshIn, TokenIn
 
 router = APIRouter(
     prefix='/user',
-    tags=['User']
+    tags=['User'],
+    default_response_class=FastJSONResponse
 )
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Password hashing pool is busy
+hash_pool_full_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Server is busy, try again later.",
+    headers={'Retry-After': '1'}
+)
+# Credentials exception
+credential_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentails or token expired.",
+    headers={'WWW-Authenticate': 'Bearer'}
+)
+inactive_user_exception = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="User is not active."
+)
+admin_required_exception = HTTPException(
+    status_code=status.HTTP_403_FORBIDDEN,
+    detail='Must be an admin user.'
+)
+
 
 # Dependencies
 async def get_user_collection():
     """
     Return user db collection.
     """
-    yield user_collection
+    yield database.get_user_collection()
+
+
+async def get_access_token_payload(token: str, db: Collection) -> dict:
+    """
+    Return payload of given access token, raise credentials exception
+    if it is invalid, expired or revoked.
+    """
+    payload = decode_access_token(token)
+    if payload is None or await is_token_revoked(token, payload, db):
+        raise credential_exception
+    return payload
 
 
 async def get_current_active_user(
@@ -39,35 +84,47 @@ async def get_current_active_user(
     """
     Get current active user dependency.
     """
-    # Credentials exception
-    credential_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentails or token expired.",
-        headers={'WWW-Authenticate': 'Bearer'}
-    )
     # Decode given token and get username
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get('sub')
-        if username is None:
-            raise credential_exception
-    except (jwt.exceptions.DecodeError, jwt.exceptions.ExpiredSignatureError):
+    payload = await get_access_token_payload(token, db)
+    username: str = payload.get('sub')
+    if username is None:
         raise credential_exception
     # Get user with decoded username
     try:
-        user = get_user_with_password(username, db)
+        user = await get_cached_user_with_password(username, db)
     except ValueError:
         raise credential_exception
+    # Check that token was issued after the last password or status change
+    if payload.get('token_version', 0) < user.token_version:
+        raise credential_exception
     # Check that user is active
     if user.disabled:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User is not active."
-        )
+        raise inactive_user_exception
     return user
 
 
+async def get_current_claims(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[Collection, Depends(get_user_collection)]
+) -> TokenClaims:
+    """
+    Get claims of current active user dependency.
+    Authorizes with the token claims, the user is not read.
+    """
+    payload = await get_access_token_payload(token, db)
+    if 'uid' not in payload:
+        # Token issued before claims were added
+        user = await get_current_active_user(token, db)
+        return get_token_claims(get_user_claims(user))
+    claims = get_token_claims(payload)
+    # Check that token was issued after the last password or status change
+    if claims.token_version < await get_token_version(claims.id, db):
+        raise credential_exception
+    if claims.disabled:
+        raise inactive_user_exception
+    return claims
+
+
 async def get_admin_user(
     current_user: Annotated[DBUser, Depends(get_current_active_user)]
 ):
@@ -77,9 +134,18 @@ async def get_admin_user(
     # Check if user is admin
     if current_user.is_admin:
         return current_user
-    raise HTTPException(
-        status_code=status.HTTP_403_FORBIDDEN,
-        detail='Must be an admin user.')
+    raise admin_required_exception
+
+
+async def get_admin_claims(
+    claims: Annotated[TokenClaims, Depends(get_current_claims)]
+) -> TokenClaims:
+    """
+    Get claims of current active user that is admin dependency.
+    """
+    if claims.is_admin:
+        return claims
+    raise admin_required_exception
 
 
 # Endpoints
@@ -92,7 +158,10 @@ async def get_token(
     Get JWT token.
     """
     # Get user
-    user = authenticate_user(db, data.email, data.password)
+    try:
+        user = await authenticate_user(db, data.email, data.password)
+    except HashPoolFull:
+        raise hash_pool_full_exception
     # Check that user exists
     if not user:
         raise HTTPException(
@@ -101,22 +170,73 @@ async def get_token(
             headers={'WWW-Authenticate': 'Bearer'}
         )
     # Create access token
-    access_token = create_access_token({'sub': user.email})
-    return {'access_token': access_token, 'token_type': settings.TOKEN_TYPE}
+    access_token = create_access_token({'sub': user.email}, user)
+    return {
+        'access_token': access_token,
+        'refresh_token': create_refresh_token(user),
+        'token_type': settings.TOKEN_TYPE
+    }
+
+
+@router.post('/refresh', response_model=Token, status_code=status.HTTP_201_CREATED)
+async def refresh_access_token(
+    data: RefreshIn,
+    db: Annotated[Collection, Depends(get_user_collection)]
+) -> dict:
+    """
+    Get new JWT token with a refresh token, without sending the password.
+    The refresh token is returned again, it is valid until it expires,
+    the user logs out or changes password.
+    """
+    payload = decode_refresh_token(data.refresh_token)
+    if payload is None or await is_token_revoked(data.refresh_token, payload, db):
+        raise credential_exception
+    claims = get_token_claims(payload)
+    # Check that token was issued after the last password or status change
+    if claims.token_version < await get_token_version(claims.id, db):
+        raise credential_exception
+    if claims.disabled:
+        raise inactive_user_exception
+    return {
+        'access_token': create_access_token_from_refresh(payload),
+        'refresh_token': data.refresh_token,
+        'token_type': settings.TOKEN_TYPE
+    }
+
+
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[Collection, Depends(get_user_collection)],
+    data: Optional[RefreshIn] = None
+) -> Response:
+    """
+    Revoke given JWT token and refresh token.
+    """
+    payload = await get_access_token_payload(token, db)
+    await revoke_token(token, payload, db)
+    if data is not None:
+        refresh_payload = decode_refresh_token(data.refresh_token)
+        # Only refresh tokens of the same user are revoked
+        if refresh_payload is not None and refresh_payload.get('sub') == payload.get('sub'):
+            await revoke_token(data.refresh_token, refresh_payload, db)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.post('/', response_model=UserModel, status_code=status.HTTP_201_CREATED)
 async def create_new_user(
     data: DBUser,
     db: Annotated[Collection, Depends(get_user_collection)],
-    admin: Annotated[DBUser, Depends(get_admin_user)]
+    admin: Annotated[TokenClaims, Depends(get_admin_claims)]
 ) -> UserModel:
     """
     Create new user.
     """
     # Return user
     try:
-        return create_user(data, db)
+        return await create_user(data, db)
+    except HashPoolFull:
+        raise hash_pool_full_exception
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -144,8 +264,11 @@ async def update_password(
     # Update given password and return user
     try:
         # Return user data without id
-        return update_user_password(
-            user.id, db, data.new_password, data.old_password).dict(exclude={'id'})
+        updated_user = await update_user_password(
+            user.id, db, data.new_password, data.old_password)
+        return updated_user.dict(exclude={'id'})
+    except HashPoolFull:
+        raise hash_pool_full_exception
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
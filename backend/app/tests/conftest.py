@@ -1,12 +1,43 @@
 import pytest
 from fastapi.testclient import TestClient
 
-from db.database import client
+from db.database import get_client
 from app.main import app
 from routes.links import get_collection
 from routes.users import get_user_collection
 from models.schemas import DBUser
-from models.user_services import create_user
+from models.link_services import create_link_indexes, link_caches, link_filters, search_indexes
+from models.user_services import (
+    create_user,
+    create_user_indexes,
+    get_revocation_collection,
+    revocation_sets,
+    token_cache,
+    token_versions,
+    user_cache
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Start every test with empty in-process caches.
+    """
+    user_cache.clear()
+    token_cache.clear()
+    revocation_sets.clear()
+    token_versions.clear()
+    link_filters.clear()
+    search_indexes.clear()
+    link_caches.clear()
+    yield
+    user_cache.clear()
+    token_cache.clear()
+    revocation_sets.clear()
+    token_versions.clear()
+    link_filters.clear()
+    search_indexes.clear()
+    link_caches.clear()
 
 
 @pytest.fixture()
@@ -14,7 +45,8 @@ def test_urls_database():
     """
     Connect to the test databse.
     """
-    test_db = client.test_urls_db
+    test_db = get_client().test_urls_db
+    create_link_indexes(test_db.test_urls)
 
     yield test_db.test_urls
     # Clean up
@@ -26,11 +58,13 @@ def test_user_database():
     """
     Connect to the test databse.
     """
-    test_db = client.test_user_database
+    test_db = get_client().test_user_database
+    create_user_indexes(test_db.test_user_database)
 
     yield test_db.test_user_database
     # Clean up
     test_db.test_user_database.drop()
+    get_revocation_collection(test_db.test_user_database).drop()
 
 
 @pytest.fixture()
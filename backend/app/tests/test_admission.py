@@ -0,0 +1,105 @@
+import asyncio
+
+from app.admission import AdmissionLimit, admission_control, classify
+
+LINKS_URL = "/links/"
+METRICS_URL = "/metrics"
+
+
+def test_classify():
+    """
+    Test requests are grouped by route class.
+    """
+    assert classify('POST', '/user/token') == 'auth'
+    assert classify('PUT', '/user/update-password') == 'auth'
+    assert classify('GET', '/user/me') == 'read'
+    assert classify('GET', '/links/abc') == 'read'
+    assert classify('POST', '/links/') == 'write'
+    assert classify('POST', '/links/bulk') == 'bulk'
+    assert classify('GET', '/links/export') == 'bulk'
+    assert classify('GET', '/metrics') is None
+    assert classify('OPTIONS', '/links/') is None
+
+
+def test_limit_queues_in_order():
+    """
+    Test requests over the limit wait and are admitted in arrival order.
+    """
+    async def run():
+        limit = AdmissionLimit('test', 1, 2)
+        order = []
+
+        async def request(name):
+            assert await limit.acquire(1)
+            order.append(name)
+            await asyncio.sleep(0.01)
+            limit.release()
+
+        await asyncio.gather(request('a'), request('b'), request('c'))
+        return limit, order
+
+    limit, order = asyncio.run(run())
+    assert order == ['a', 'b', 'c']
+    assert limit.stats() == {
+        'limit': 1, 'queue_size': 2, 'active': 0, 'queue_depth': 0,
+        'admitted': 3, 'shed_full': 0, 'shed_timeout': 0,
+    }
+
+
+def test_limit_sheds_when_queue_full():
+    """
+    Test requests are shed at once when the queue is full
+    and after the timeout when the slot is not freed.
+    """
+    async def run():
+        limit = AdmissionLimit('test', 1, 1)
+        assert await limit.acquire(1)
+        waiting = asyncio.ensure_future(limit.acquire(0.05))
+        await asyncio.sleep(0)
+        assert limit.queue_depth == 1
+        assert not await limit.acquire(1)
+        assert not await waiting
+        limit.release()
+        return limit
+
+    limit = asyncio.run(run())
+    stats = limit.stats()
+    assert (stats['active'], stats['queue_depth']) == (0, 0)
+    assert (stats['shed_full'], stats['shed_timeout']) == (1, 1)
+
+
+def test_limit_cancelled_waiter():
+    """
+    Test a cancelled waiter leaves the queue without taking the slot.
+    """
+    async def run():
+        limit = AdmissionLimit('test', 1, 1)
+        assert await limit.acquire(1)
+        waiting = asyncio.ensure_future(limit.acquire(1))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        limit.release()
+        return limit
+
+    limit = asyncio.run(run())
+    assert (limit.active, limit.queue_depth) == (0, 0)
+
+
+def test_shed_request(test_client, create_test_token, monkeypatch):
+    """
+    Test shed requests get 503 with Retry-After and are counted,
+    exempt routes still answer.
+    """
+    headers = {'Authorization': create_test_token.get('token')}
+    monkeypatch.setitem(admission_control.limits, 'read', AdmissionLimit('read', 0, 0))
+
+    response = test_client.get(LINKS_URL, headers=headers)
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == str(admission_control.retry_after)
+    assert response.json() == {'detail': 'Server is busy, try again later.'}
+
+    response = test_client.get(METRICS_URL)
+    assert response.status_code == 200
+    assert 'app_admission_shed_full{route_class="read"} 1' in response.text
+    assert 'app_admission_queue_depth{route_class="write"} 0' in response.text
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from models import async_link_services, async_user_services, link_services
+from models.schemas import DBUser, Link
+
+
+def test_add_and_get_link(test_urls_database):
+    """
+    Test add and get link with async services.
+    """
+    collection = test_urls_database
+    data = Link(url='https://example.com', added_by='test_user')
+
+    link_obj = asyncio.run(async_link_services.add_link(data, collection))
+    assert link_obj.url == data.url
+
+    assert asyncio.run(async_link_services.get_link(link_obj.id, collection)) == link_obj
+    assert asyncio.run(async_link_services.get_links(collection)) == [link_obj]
+    assert asyncio.run(
+        async_link_services.check_that_link_exists(data.url, collection)) is True
+
+
+def test_check_that_link_exists_asks_filter_once(test_urls_database):
+    """
+    Test async link check counts every filter lookup once.
+    """
+    collection = test_urls_database
+    asyncio.run(async_link_services.add_link(Link(url='https://example.com', added_by='test_user'), collection))
+    link_filter = link_services.get_link_filter(collection)
+    link_filter.rebuild(collection)
+    before = link_filter.stats()
+
+    assert asyncio.run(async_link_services.check_that_link_exists('https://example.com', collection)) is True
+    assert asyncio.run(async_link_services.check_that_link_exists('https://example.com/other', collection)) is False
+    stats = link_filter.stats()
+    assert stats['positives'] - before['positives'] == 1
+    assert stats['negatives'] - before['negatives'] == 1
+
+
+def test_add_link_already_exists(test_urls_database):
+    """
+    Test async add link raises the same error as sync version.
+    """
+    collection = test_urls_database
+    data = Link(url='https://example.com', added_by='test_user')
+    asyncio.run(async_link_services.add_link(data, collection))
+
+    with pytest.raises(ValueError):
+        asyncio.run(async_link_services.add_link(data, collection))
+
+
+def test_create_and_authenticate_user(test_user_database):
+    """
+    Test create and authenticate user with async services.
+    """
+    collection = test_user_database
+    data = DBUser(username='user', password='password', email='example@email.com')
+
+    user = asyncio.run(async_user_services.create_user(data, collection))
+    assert user.email == data.email
+
+    obj = asyncio.run(
+        async_user_services.authenticate_user(collection, data.email, 'password'))
+    assert obj.username == data.username
+    assert asyncio.run(
+        async_user_services.authenticate_user(collection, data.email, 'wrong')) is False
@@ -0,0 +1,25 @@
+from backfill_url_hash import backfill_url_hash
+from models.urls import get_url_hash
+
+
+def test_backfill_url_hash(test_urls_database):
+    """
+    Test store url hash on links added before url normalization.
+    """
+    collection = test_urls_database
+    collection.create_index('url', unique=True)
+    first = collection.insert_one({'url': 'https://example.com/', 'added_by': 'test_user'})
+    collection.insert_one({'url': 'https://other.com', 'added_by': 'test_user'})
+    duplicate = collection.insert_one({'url': 'https://Example.com/?utm_source=x', 'added_by': 'test_user'})
+
+    result = backfill_url_hash(collection)
+
+    assert result['updated'] == 2
+    assert result['duplicates'] == [duplicate.inserted_id]
+    obj = collection.find_one({'_id': first.inserted_id})
+    assert obj['url_hash'] == get_url_hash('https://example.com')
+    assert 'url_hash' not in collection.find_one({'_id': duplicate.inserted_id})
+    assert 'url_1' not in collection.index_information()
+
+    # Nothing left to do on the second run
+    assert backfill_url_hash(collection)['updated'] == 0
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from unittest.mock import patch
+
+from models.bloom import BloomFilter, LinkFilter
+from models.urls import get_url_hash
+
+
+def test_bloom_filter():
+    """
+    Test bloom filter has no false negatives and bounded false positives.
+    """
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [os.urandom(16) for _ in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    false_positives = sum(os.urandom(16) in bloom for _ in range(10000))
+    assert false_positives < 300
+    assert 0 < bloom.fill_ratio < 1
+    assert bloom.count == 1000
+
+
+def test_link_filter_rebuild_and_refresh(test_urls_database):
+    """
+    Test link filter reads stored url hashes from the collection.
+    """
+    collection = test_urls_database
+    collection.insert_one({'url': 'https://example1.com', 'url_hash': get_url_hash('https://example1.com')})
+    link_filter = LinkFilter(error_rate=0.01, refresh_interval=60)
+    assert link_filter.is_fresh is False
+
+    link_filter.rebuild(collection)
+    assert link_filter.is_fresh is True
+    assert link_filter.might_contain(get_url_hash('https://example1.com')) is True
+    assert link_filter.might_contain(get_url_hash('https://example2.com')) is False
+
+    # Link added by another worker is found after refresh
+    collection.insert_one({'url': 'https://example2.com', 'url_hash': get_url_hash('https://example2.com')})
+    link_filter.refresh(collection)
+    assert link_filter.might_contain(get_url_hash('https://example2.com')) is True
+
+    stats = link_filter.stats()
+    assert stats['rebuilds'] == 1
+    assert stats['refreshes'] == 1
+    assert stats['negatives'] == 1
+    assert stats['positives'] == 2
+    assert stats['fill_ratio'] > 0
+
+
+def test_link_filter_expires(test_urls_database):
+    """
+    Test link filter needs refresh after refresh interval.
+    """
+    link_filter = LinkFilter(error_rate=0.01, refresh_interval=5)
+    with patch('models.indexing.time.monotonic', return_value=100):
+        link_filter.rebuild(test_urls_database)
+    with patch('models.indexing.time.monotonic', return_value=104):
+        assert link_filter.is_fresh is True
+    with patch('models.indexing.time.monotonic', return_value=106):
+        assert link_filter.is_fresh is False
+
+
+def test_link_filter_rebuild_swaps_structures(test_urls_database):
+    """
+    Test rebuild scans without holding the index lock and
+    adds before the first build are left to the scan.
+    """
+    collection = test_urls_database
+    collection.insert_one({'url': 'https://example1.com', 'url_hash': get_url_hash('https://example1.com')})
+    link_filter = LinkFilter(error_rate=0.01, refresh_interval=60)
+    link_filter.add({'_id': 1, 'url_hash': get_url_hash('https://example2.com')})
+    assert link_filter._recent_ids == set()
+
+    lock_free = []
+    add_document = LinkFilter._add_document
+
+    def checking_add_document(index, document):
+        # Lock of the served index can be taken by another thread during the scan
+        def try_lock():
+            acquired = link_filter._lock.acquire(timeout=1)
+            lock_free.append(acquired)
+            if acquired:
+                link_filter._lock.release()
+
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        add_document(index, document)
+
+    with patch.object(LinkFilter, '_add_document', checking_add_document):
+        link_filter.rebuild(collection)
+    assert lock_free == [True]
+    assert link_filter.might_contain(get_url_hash('https://example1.com')) is True
+
+
+def test_link_filter_rebuilds_in_background(test_urls_database):
+    """
+    Test hashes set on existing links are read by the periodic rebuild,
+    refreshes before it keep the filter serving.
+    """
+    collection = test_urls_database
+    collection.insert_one({'url': 'https://example1.com'})
+    link_filter = LinkFilter(error_rate=0.01, refresh_interval=1, rebuild_interval=60)
+    with patch('models.indexing.time.monotonic', return_value=100):
+        link_filter.rebuild(collection)
+    # Backfilled by another process
+    collection.update_one({}, {'$set': {'url_hash': get_url_hash('https://example1.com')}})
+
+    with patch('models.indexing.time.monotonic', return_value=130):
+        link_filter.refresh(collection)
+        assert link_filter.stats()['rebuilds'] == 1
+        assert link_filter.might_contain(get_url_hash('https://example1.com')) is False
+
+    with patch('models.indexing.time.monotonic', return_value=170):
+        link_filter.refresh(collection)
+        for _ in range(100):
+            if link_filter.stats()['rebuilds'] == 2:
+                break
+            time.sleep(0.01)
+    assert link_filter.stats()['rebuilds'] == 2
+    assert link_filter.might_contain(get_url_hash('https://example1.com')) is True
@@ -0,0 +1,118 @@
+from unittest.mock import patch
+
+from models.cache import ExpiringCache, LinkCache, TTLCache
+
+
+def test_cache_get_and_set():
+    """
+    Test store and read cached values.
+    """
+    cache = TTLCache(maxsize=2, ttl=60)
+    assert cache.get('key') is None
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    Test cache is bounded by maxsize.
+    """
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # Use a so that b becomes the least recently used entry
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_entry_expires():
+    """
+    Test cached values expire after ttl.
+    """
+    cache = TTLCache(maxsize=2, ttl=10)
+    with patch('models.cache.time.monotonic', return_value=100):
+        cache.set('key', 'value')
+        cache.set('short', 'value', ttl=1)
+    with patch('models.cache.time.monotonic', return_value=105):
+        assert cache.get('key') == 'value'
+        assert cache.get('short') is None
+    with patch('models.cache.time.monotonic', return_value=111):
+        assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_cache_invalidate():
+    """
+    Test remove values from the cache.
+    """
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.invalidate('a')
+    assert cache.get('a') is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_disabled_cache():
+    """
+    Test cache with maxsize 0 stores nothing.
+    """
+    cache = TTLCache(maxsize=0, ttl=60)
+    cache.set('key', 'value')
+    assert cache.get('key') is None
+
+
+def test_expiring_cache_removes_expired_entries():
+    """
+    Test expired entries are removed without being looked up.
+    """
+    cache = ExpiringCache(maxsize=10, ttl=60)
+    with patch('models.cache.time.monotonic', return_value=100):
+        cache.set('short', 'value', ttl=1)
+        cache.set('long', 'value', ttl=100)
+    with patch('models.cache.time.monotonic', return_value=105):
+        cache.set('other', 'value')
+        assert len(cache) == 2
+        assert cache.get('long') == 'value'
+    with patch('models.cache.time.monotonic', return_value=300):
+        cache.expire()
+    assert len(cache) == 0
+    assert cache.stats()['expired'] == 3
+
+
+def test_expiring_cache_unbounded():
+    """
+    Test cache with maxsize None evicts nothing.
+    """
+    cache = ExpiringCache(maxsize=None, ttl=60)
+    for key in range(1000):
+        cache.set(key, True)
+    assert len(cache) == 1000
+    assert cache.stats()['evictions'] == 0
+
+
+def test_link_cache_invalidate():
+    """
+    Test inserts drop cached pages only.
+    """
+    cache = LinkCache(maxsize=2, ttl=60, page_maxsize=2, page_ttl=1)
+    cache.links.set(('id', None), 'link')
+    cache.pages.set('etag', b'{}')
+    cache.invalidate()
+
+    assert cache.pages.get('etag') is None
+    assert cache.links.get(('id', None)) == 'link'
+    stats = cache.stats()
+    assert stats['links']['hits'] == 1
+    assert stats['pages']['misses'] == 1
+    cache.clear()
+    assert len(cache.links) == 0
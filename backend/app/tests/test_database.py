@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from db import database
+
+
+def test_get_client_options():
+    """
+    Test pool, timeout and concern settings are passed to the client.
+    """
+    with patch.object(settings, 'MONGO_MAX_POOL_SIZE', 50), \
+            patch.object(settings, 'MONGO_MIN_POOL_SIZE', 5), \
+            patch.object(settings, 'MONGO_COMPRESSORS', 'zlib'), \
+            patch.object(settings, 'MONGO_WRITE_CONCERN', '1'), \
+            patch.object(settings, 'MONGO_READ_CONCERN', 'majority'):
+        options = database.get_client_options()
+
+    assert options['maxPoolSize'] == 50
+    assert options['minPoolSize'] == 5
+    assert options['waitQueueTimeoutMS'] == int(settings.MONGO_WAIT_QUEUE_TIMEOUT_MS)
+    assert options['serverSelectionTimeoutMS'] == int(settings.MONGO_SERVER_SELECTION_TIMEOUT_MS)
+    assert options['compressors'] == 'zlib'
+    assert options['w'] == 1
+    assert options['readConcernLevel'] == 'majority'
+
+
+def test_get_client_options_defaults():
+    """
+    Test concerns and compressors are left to the driver when not configured.
+    """
+    with patch.object(settings, 'MONGO_COMPRESSORS', ''), \
+            patch.object(settings, 'MONGO_WRITE_CONCERN', 'majority'), \
+            patch.object(settings, 'MONGO_READ_CONCERN', ''):
+        options = database.get_client_options()
+
+    assert options['w'] == 'majority'
+    assert 'compressors' not in options
+    assert 'readConcernLevel' not in options
+
+
+def test_lifespan_manages_client():
+    """
+    Test client is connected on startup and closed on shutdown.
+    """
+    database.close_client()
+    with TestClient(app) as client:
+        assert database._client is not None
+        assert client.get('/').status_code == 200
+    assert database._client is None
+
+
+def test_import_app_is_lazy():
+    """
+    Test importing the app creates no client and skips auth and hashing libraries.
+    """
+    script = (
+        'import sys, threading, app.main, db.database; '
+        'assert db.database._client is None; '
+        'print(threading.active_count(), *sorted({"jwt", "passlib", "multiprocessing"} & set(sys.modules)))'
+    )
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run([sys.executable, '-c', script], cwd=app_dir, capture_output=True, text=True)
+
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.split() == ['1']
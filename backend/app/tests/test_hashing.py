@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+import pytest
+
+from models.hashing import HashPool, HashPoolFull
+from models.user_services import get_hashed_password, verify_password
+
+
+def test_hash_pool_run():
+    """
+    Test run password hashing in the pool.
+    """
+    pool = HashPool('thread', workers=1, max_pending=2)
+    hashed_password = asyncio.run(pool.run(get_hashed_password, 'password'))
+
+    assert asyncio.run(pool.run(verify_password, 'password', hashed_password)) is True
+    assert pool.stats()['completed'] == 2
+    assert pool.stats()['pending'] == 0
+    pool.shutdown()
+
+
+def test_hash_pool_full():
+    """
+    Test pool rejects jobs above max_pending.
+    """
+    pool = HashPool('thread', workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def run_jobs():
+        job = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0)
+        assert pool.stats()['pending'] == 1
+        with pytest.raises(HashPoolFull):
+            await pool.run(release.wait)
+        release.set()
+        await job
+
+    asyncio.run(run_jobs())
+    assert pool.stats()['rejected'] == 1
+    assert pool.stats()['completed'] == 1
+    pool.shutdown()
+
+
+def test_hash_pool_invalid_executor():
+    """
+    Test pool accepts only thread and process executors.
+    """
+    with pytest.raises(ValueError):
+        HashPool('fiber', workers=1, max_pending=1)
@@ -0,0 +1,39 @@
+from models.importers import BookmarkParser, InvalidEntry, NDJSONParser
+
+
+def test_ndjson_parser():
+    """
+    Test parse newline delimited JSON split into chunks.
+    """
+    parser = NDJSONParser()
+    entries = parser.feed(b'{"url": "https://example1.com"}\n{"url": "https://ex')
+    assert entries == [{'url': 'https://example1.com'}]
+
+    entries = parser.feed(b'ample2.com"}\n\nnot json\n{"url": "https://example3.com"}')
+    assert entries == [{'url': 'https://example2.com'}, InvalidEntry('Invalid JSON.')]
+    assert parser.close() == [{'url': 'https://example3.com'}]
+
+
+def test_ndjson_parser_line_too_long():
+    """
+    Test parser does not buffer too long lines.
+    """
+    parser = NDJSONParser(max_line_length=10)
+    assert parser.feed(b'{"url": "https://') == [InvalidEntry('Line too long.')]
+    assert parser.feed(b'example.com"}\n{"url": 1}\n') == [{'url': 1}]
+    assert parser.close() == []
+
+
+def test_bookmark_parser():
+    """
+    Test parse browser bookmarks export split into chunks.
+    """
+    parser = BookmarkParser()
+    entries = parser.feed(
+        b'<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<DL><p>\n'
+        b'<DT><A HREF="https://example1.com" ADD_DATE="1">One</A>\n<DT><A HR')
+    assert entries == [{'url': 'https://example1.com'}]
+
+    entries = parser.feed(b'EF="https://example2.com">Two</A>\n<DT><A>None</A>\n</DL>')
+    assert entries == [{'url': 'https://example2.com'}, InvalidEntry('Bookmark without url.')]
+    assert parser.close() == []
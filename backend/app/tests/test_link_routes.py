@@ -1,7 +1,19 @@
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
 from fastapi import status
 
+from app.config import settings
+
 LINKS_URL = "/links/"
 CHECK_EXISTS_URL = "/links/exists/"
+CURSOR_URL = "/links/cursor"
+BULK_URL = "/links/bulk"
+EXPORT_URL = "/links/export"
+SEARCH_URL = "/links/search"
 
 
 def test_add_link(test_client, create_test_token):
@@ -345,3 +357,416 @@ def test_get_link_that_not_exists(test_client, create_test_token):
     response = test_client.get(
         url, headers={'Authorization': data.get('token')})
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_get_links_cursor_not_authorized(test_client):
+    """
+    Test getting links page by cursor being not authorized.
+    """
+    response = test_client.get(CURSOR_URL)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_get_links_cursor(test_client, create_test_token):
+    """
+    Test get links from database using cursor pagination.
+    """
+    token_data = create_test_token
+
+    # Add some data
+    for i in range(60):
+        test_client.post(
+            LINKS_URL,
+            headers={'Authorization': token_data.get('token')},
+            json={'url': f'https://example{i}.com'}
+        )
+
+    response = test_client.get(
+        CURSOR_URL, headers={'Authorization': token_data.get('token')})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+
+    assert len(data['items']) == 50
+    assert data['items'][0]['url'] == 'https://example59.com'
+    assert data['next'] is not None
+
+    response = test_client.get(
+        CURSOR_URL,
+        params={'cursor': data['next']},
+        headers={'Authorization': token_data.get('token')}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+
+    assert len(data['items']) == 10
+    assert data['items'][-1]['url'] == 'https://example0.com'
+    assert data['next'] is None
+
+
+def test_get_links_cursor_invalid(test_client, create_test_token):
+    """
+    Test get links with invalid cursor.
+    """
+    data = create_test_token
+
+    response = test_client.get(
+        CURSOR_URL,
+        params={'cursor': 'invalid_cursor'},
+        headers={'Authorization': data.get('token')}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_add_link_concurrent_duplicates(test_client, create_test_token, test_urls_database):
+    """
+    Test that parallel requests adding the same url create only one link.
+    """
+    data = create_test_token
+    payload = {"url": "https://example.com"}
+
+    def post_link(_):
+        return test_client.post(
+            LINKS_URL,
+            headers={'Authorization': data.get("token")},
+            json=payload
+        ).status_code
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        statuses = list(executor.map(post_link, range(10)))
+
+    assert statuses.count(status.HTTP_201_CREATED) == 1
+    assert statuses.count(status.HTTP_400_BAD_REQUEST) == 9
+    assert test_urls_database.count_documents({'url': payload['url']}) == 1
+
+
+def test_add_links_bulk_not_admin(test_client, create_test_token):
+    """
+    Test bulk import is allowed only for admin users.
+    """
+    data = create_test_token
+    response = test_client.post(
+        BULK_URL,
+        headers={'Authorization': data.get('token')},
+        content=b'{"url": "https://example.com"}\n'
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_add_links_bulk_ndjson(test_client, create_test_token_admin, test_urls_database):
+    """
+    Test import links from newline delimited JSON.
+    """
+    data = create_test_token_admin
+    body = b''.join(
+        f'{{"url": "https://example{i}.com"}}\n'.encode() for i in range(5))
+    body += b'{"url": "https://example0.com"}\nnot json\n'
+    response = test_client.post(
+        BULK_URL,
+        headers={'Authorization': data.get('token'), 'Content-Type': 'application/x-ndjson'},
+        content=body
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response_data = response.json()
+    assert response_data['inserted'] == 5
+    assert response_data['duplicates'] == 1
+    assert response_data['invalid'] == 1
+    assert len(response_data['items']) == 7
+    assert response_data['items'][5]['status'] == 'duplicate'
+
+    obj = test_urls_database.find_one({'url': 'https://example3.com'})
+    assert obj['added_by'] == data.get('user').username
+
+
+def test_add_links_bulk_bookmarks(test_client, create_test_token_admin):
+    """
+    Test import links from browser bookmarks export.
+    """
+    data = create_test_token_admin
+    body = (
+        b'<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<DL><p>\n'
+        b'<DT><A HREF="https://example1.com">One</A>\n'
+        b'<DT><A HREF="https://example2.com">Two</A>\n</DL>'
+    )
+    response = test_client.post(
+        BULK_URL,
+        headers={'Authorization': data.get('token'), 'Content-Type': 'text/html'},
+        content=body
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['inserted'] == 2
+
+    response = test_client.get(LINKS_URL, headers={'Authorization': data.get('token')})
+    assert [item['url'] for item in response.json()['items']] == [
+        'https://example2.com', 'https://example1.com']
+
+
+def test_export_links_not_authorized(test_client):
+    """
+    Test export links being not authorized.
+    """
+    response = test_client.get(EXPORT_URL)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_export_links_ndjson(test_client, create_test_token):
+    """
+    Test export links as newline delimited JSON.
+    """
+    data = create_test_token
+    links = [
+        test_client.post(
+            LINKS_URL,
+            headers={'Authorization': data.get('token')},
+            json={'url': f'https://example{i}.com'}
+        ).json()
+        for i in range(3)
+    ]
+
+    response = test_client.get(
+        EXPORT_URL, headers={'Authorization': data.get('token')})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == list(reversed(links))
+
+
+def test_export_links_csv(test_client, create_test_token):
+    """
+    Test export links as CSV.
+    """
+    data = create_test_token
+    for i in range(3):
+        test_client.post(
+            LINKS_URL,
+            headers={'Authorization': data.get('token')},
+            json={'url': f'https://example{i}.com'}
+        )
+
+    response = test_client.get(
+        EXPORT_URL, params={'format': 'csv'}, headers={'Authorization': data.get('token')})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'].startswith('text/csv')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row['url'] for row in rows] == [f'https://example{i}.com' for i in (2, 1, 0)]
+    assert rows[0]['added_by'] == data.get('user').username
+
+
+def test_export_links_empty_csv(test_client, create_test_token):
+    """
+    Test export empty database as CSV.
+    """
+    data = create_test_token
+    response = test_client.get(
+        EXPORT_URL, params={'format': 'csv'}, headers={'Authorization': data.get('token')})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.text.strip() == 'url,added_by,_id,date_added'
+
+
+def test_export_links_invalid_format(test_client, create_test_token):
+    """
+    Test export links with unknown format.
+    """
+    data = create_test_token
+    response = test_client.get(
+        EXPORT_URL, params={'format': 'xml'}, headers={'Authorization': data.get('token')})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_check_url_exists_canonical(test_client, create_test_token):
+    """
+    Test checking url exists compares canonical urls.
+    """
+    data = create_test_token
+    test_client.post(
+        LINKS_URL,
+        headers={'Authorization': data.get("token")},
+        json={"url": "https://example.com/page/"})
+
+    response = test_client.get(
+        CHECK_EXISTS_URL,
+        params={'url': 'https://EXAMPLE.com/page?utm_source=newsletter'},
+        headers={'Authorization': data.get("token")})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_search_links_not_authorized(test_client):
+    """
+    Test search links being not authorized.
+    """
+    response = test_client.get(SEARCH_URL, params={'q': 'example'})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_search_links(test_client, create_test_token):
+    """
+    Test search links.
+    """
+    data = create_test_token
+    for url in ('https://example.com/python', 'https://example.com/rust', 'https://python.org'):
+        test_client.post(
+            LINKS_URL, headers={'Authorization': data.get('token')}, json={'url': url})
+
+    response = test_client.get(
+        SEARCH_URL,
+        params={'q': 'python', 'size': 1},
+        headers={'Authorization': data.get('token')})
+    assert response.status_code == status.HTTP_200_OK
+    response_data = response.json()
+    assert response_data['total'] == 2
+    assert response_data['page'] == 1
+    assert response_data['size'] == 1
+    assert response_data['items'][0]['url'] == 'https://python.org'
+
+    response = test_client.get(
+        SEARCH_URL, params={'q': ''}, headers={'Authorization': data.get('token')})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_trusted_rows_responses(test_client, create_test_token):
+    """
+    Test link responses are the same with and without validation of rows.
+    """
+    token_data = create_test_token
+    headers = {'Authorization': token_data.get('token')}
+    for i in range(3):
+        res = test_client.post(LINKS_URL, headers=headers, json={'url': f'https://example{i}.com/docs'})
+    urls = [
+        LINKS_URL,
+        CURSOR_URL + '?size=2',
+        SEARCH_URL + '?q=docs',
+        LINKS_URL + res.json()['_id'],
+    ]
+
+    for url in urls:
+        with patch.object(settings, 'TRUSTED_ROWS', False):
+            validated = test_client.get(url, headers=headers)
+        with patch.object(settings, 'TRUSTED_ROWS', True):
+            trusted = test_client.get(url, headers=headers)
+        assert trusted.status_code == validated.status_code == status.HTTP_200_OK
+        assert trusted.json() == validated.json()
+
+
+def test_get_links_with_fields(test_client, create_test_token):
+    """
+    Test sparse fieldsets of link list and single link.
+    """
+    token_data = create_test_token
+    headers = {'Authorization': token_data.get('token')}
+    res = test_client.post(LINKS_URL, headers=headers, json={'url': 'https://example.com'})
+    link_id = res.json()['_id']
+
+    response = test_client.get(LINKS_URL, headers=headers, params={'fields': 'url,date_added'})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data['total'] == 1
+    assert data['items'] == [{'_id': link_id, 'url': 'https://example.com', 'date_added': res.json()['date_added']}]
+
+    response = test_client.get(LINKS_URL + link_id, headers=headers, params={'fields': 'added_by'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {'_id': link_id, 'added_by': res.json()['added_by']}
+
+
+def test_get_links_with_unknown_fields(test_client, create_test_token):
+    """
+    Test unknown fields are rejected.
+    """
+    token_data = create_test_token
+    headers = {'Authorization': token_data.get('token')}
+
+    response = test_client.get(LINKS_URL, headers=headers, params={'fields': 'url,url_hash'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'url_hash' in response.json()['detail']
+    response = test_client.get(LINKS_URL + '6467c9dabb951c55083fadb2', headers=headers, params={'fields': 'secret'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_links_etag(test_client, create_test_token):
+    """
+    Test conditional GET of link list.
+    """
+    token_data = create_test_token
+    headers = {'Authorization': token_data.get('token')}
+    test_client.post(LINKS_URL, headers=headers, json={'url': 'https://example.com'})
+
+    response = test_client.get(LINKS_URL, headers=headers)
+    etag = response.headers['etag']
+    assert response.status_code == status.HTTP_200_OK
+
+    # Nothing is read or serialized for a known version
+    with patch('routes.links.get_links') as get_links:
+        response = test_client.get(LINKS_URL, headers={**headers, 'If-None-Match': etag})
+        get_links.assert_not_called()
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers['etag'] == etag
+    assert response.content == b''
+
+    # Other query parameters and new links change the version
+    response = test_client.get(LINKS_URL, headers={**headers, 'If-None-Match': etag}, params={'fields': 'url'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['etag'] != etag
+    test_client.post(LINKS_URL, headers=headers, json={'url': 'https://example.com/other'})
+    response = test_client.get(LINKS_URL, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['etag'] != etag
+    assert response.json()['total'] == 2
+
+
+def test_get_link_etag(test_client, create_test_token):
+    """
+    Test conditional GET of a single link.
+    """
+    token_data = create_test_token
+    headers = {'Authorization': token_data.get('token')}
+    res = test_client.post(LINKS_URL, headers=headers, json={'url': 'https://example.com'})
+    url = LINKS_URL + res.json()['_id']
+
+    for trusted in (True, False):
+        with patch.object(settings, 'TRUSTED_ROWS', trusted):
+            response = test_client.get(url, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        etag = response.headers['etag']
+
+    response = test_client.get(url, headers={**headers, 'If-None-Match': f'W/{etag}, "other"'})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    response = test_client.get(url, headers={**headers, 'If-None-Match': etag}, params={'fields': 'url'})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_get_links_first_page_cached(test_client, create_test_token):
+    """
+    Test first page of links is served from cache until a link is added.
+    Only the collection version is read for cached pages.
+    """
+    token_data = create_test_token
+    headers = {'Authorization': token_data.get('token')}
+    test_client.post(LINKS_URL, headers=headers, json={'url': 'https://example.com'})
+    first = test_client.get(LINKS_URL, headers=headers)
+
+    with patch('routes.links.get_links') as get_links:
+        response = test_client.get(LINKS_URL, headers=headers)
+        assert response.json() == first.json()
+        assert response.headers['etag'] == first.headers['etag']
+        response = test_client.get(LINKS_URL, headers={**headers, 'If-None-Match': first.headers['etag']})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        get_links.assert_not_called()
+
+    test_client.post(LINKS_URL, headers=headers, json={'url': 'https://example.com/other'})
+    response = test_client.get(LINKS_URL, headers=headers)
+    assert response.json()['total'] == 2
+
+
+def test_get_links_first_page_cached_other_worker(test_client, test_urls_database, create_test_token):
+    """
+    Test cached first page is not served after another worker added a link.
+    """
+    token_data = create_test_token
+    headers = {'Authorization': token_data.get('token')}
+    test_client.post(LINKS_URL, headers=headers, json={'url': 'https://example.com'})
+    first = test_client.get(LINKS_URL, headers=headers)
+
+    # Inserted without dropping cached pages of this process
+    test_urls_database.insert_one({'url': 'https://example.com/other', 'added_by': 'someone1'})
+    response = test_client.get(LINKS_URL, headers={**headers, 'If-None-Match': first.headers['etag']})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['total'] == 2
+    assert response.headers['etag'] != first.headers['etag']
@@ -1,10 +1,30 @@
+from unittest.mock import patch
+
 import pytest
 from bson.objectid import ObjectId
 from bson import errors
 from pydantic import error_wrappers
 
-from models.link_services import get_link, get_links, add_link
+from models.link_services import (
+    get_link,
+    get_links,
+    get_links_page,
+    add_link,
+    add_links_bulk,
+    check_that_link_exists,
+    decode_cursor,
+    encode_cursor,
+    get_link_cache,
+    get_link_filter,
+    get_link_model,
+    get_links_version,
+    iter_link_batches,
+    parse_link_fields,
+)
+from app.config import settings
+from models.importers import InvalidEntry
 from models.schemas import Link
+from models.serializers import link_serializer
 
 
 def test_get_link(test_urls_database):
@@ -114,3 +134,223 @@ def test_add_link_already_exists(test_urls_database):
 
     with pytest.raises(ValueError):
         add_link(data, collection)
+
+
+def test_get_links_page(test_urls_database):
+    """
+    Test return pages of Link objects using cursor.
+    """
+    collection = test_urls_database
+    # Add some links to the database
+    for i in range(5):
+        collection.insert_one(
+            Link(url=f'https://example{i}.com', added_by='test_user').dict())
+
+    links, cursor = get_links_page(collection, 2)
+    assert [link.url for link in links] == ['https://example4.com', 'https://example3.com']
+    assert cursor is not None
+
+    links, cursor = get_links_page(collection, 2, cursor)
+    assert [link.url for link in links] == ['https://example2.com', 'https://example1.com']
+    assert cursor is not None
+
+    links, cursor = get_links_page(collection, 2, cursor)
+    assert [link.url for link in links] == ['https://example0.com']
+    assert cursor is None
+
+
+def test_get_links_page_if_empty(test_urls_database):
+    """
+    Test return empty page of Link objects.
+    """
+    links, cursor = get_links_page(test_urls_database, 10)
+    assert links == []
+    assert cursor is None
+
+
+def test_cursor_encoding():
+    """
+    Test encode and decode pagination cursor.
+    """
+    link_id = ObjectId()
+    assert decode_cursor(encode_cursor(link_id)) == link_id
+
+    with pytest.raises(ValueError):
+        decode_cursor('invalid_cursor')
+
+
+def test_add_link_returns_stored_document(test_urls_database):
+    """
+    Test that returned link matches the stored document.
+    """
+    collection = test_urls_database
+    data = Link(url='https://example.com', added_by='test_user')
+    link_obj = add_link(data, collection)
+
+    assert get_link(link_obj.id, collection) == link_obj
+
+
+def test_add_links_bulk(test_urls_database):
+    """
+    Test add many links with one batch insert.
+    """
+    collection = test_urls_database
+    add_link(Link(url='https://example0.com', added_by='test_user'), collection)
+
+    entries = [
+        {'url': 'https://example0.com'},
+        {'url': 'https://example1.com', 'added_by': 'someone else'},
+        {'url': 'not a link'},
+        InvalidEntry('Invalid JSON.'),
+        {'url': 'https://example1.com'},
+    ]
+    results = add_links_bulk(entries, 'test_user', collection, start=10)
+
+    assert [result['index'] for result in results] == [10, 11, 12, 13, 14]
+    assert [result['status'] for result in results] == [
+        'duplicate', 'inserted', 'invalid', 'invalid', 'duplicate']
+    assert collection.count_documents({}) == 2
+
+    obj = collection.find_one({'url': 'https://example1.com'})
+    assert obj['added_by'] == 'test_user'
+    assert obj['date_added'] is not None
+
+
+def test_iter_link_batches(test_urls_database):
+    """
+    Test yield link documents in batches, newest first.
+    """
+    collection = test_urls_database
+    for i in range(5):
+        collection.insert_one(
+            Link(url=f'https://example{i}.com', added_by='test_user').dict())
+
+    batches = list(iter_link_batches(collection, 2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0]['url'] == 'https://example4.com'
+    assert set(batches[0][0]) == {'_id', 'url', 'added_by', 'date_added'}
+
+
+def test_add_link_with_same_canonical_url(test_urls_database):
+    """
+    Test links are compared by their canonical url.
+    """
+    collection = test_urls_database
+    add_link(Link(url='https://Example.com/', added_by='test_user'), collection)
+
+    assert check_that_link_exists('https://example.com?utm_source=x', collection) is True
+    assert check_that_link_exists('https://example.com/other', collection) is False
+    with pytest.raises(ValueError):
+        add_link(Link(url='https://example.com:443', added_by='test_user'), collection)
+
+
+def test_check_that_link_exists_uses_filter(test_urls_database):
+    """
+    Test urls missing from the bloom filter are not queried.
+    """
+    collection = test_urls_database
+    add_link(Link(url='https://example.com', added_by='test_user'), collection)
+
+    with patch.object(collection, 'find_one', wraps=collection.find_one) as find_one:
+        assert check_that_link_exists('https://example.com/other', collection) is False
+        find_one.assert_not_called()
+        assert check_that_link_exists('https://example.com', collection) is True
+        find_one.assert_called_once()
+    assert get_link_filter(collection).stats()['negatives'] == 1
+
+
+def test_link_serializer_trusted_rows():
+    """
+    Test trusted rows build the same model as validated ones.
+    """
+    row = {
+        '_id': ObjectId(),
+        'url': 'https://example.com',
+        'added_by': 'test_user',
+        'url_hash': b'hash',
+    }
+    with patch.object(settings, 'TRUSTED_ROWS', False):
+        validated = link_serializer(row)
+    with patch.object(settings, 'TRUSTED_ROWS', True):
+        trusted = link_serializer(row)
+
+    assert trusted.dict(by_alias=True) == validated.dict(by_alias=True)
+    assert trusted.id == str(row['_id'])
+    with pytest.raises(ValueError):
+        link_serializer(None)
+
+
+def test_parse_link_fields():
+    """
+    Test parsing of requested link fields.
+    """
+    assert parse_link_fields(None) is None
+    assert parse_link_fields('') is None
+    assert parse_link_fields('date_added, url') == ('url', '_id', 'date_added')
+    assert parse_link_fields('_id') == ('_id',)
+    with pytest.raises(ValueError):
+        parse_link_fields('url,password')
+
+
+@pytest.mark.parametrize('trusted', [True, False])
+def test_get_links_with_fields(test_urls_database, trusted):
+    """
+    Test only requested fields are read and returned.
+    """
+    collection = test_urls_database
+    link = add_link(Link(url='https://example.com', added_by='test_user'), collection)
+    fields = parse_link_fields('url')
+
+    with patch.object(settings, 'TRUSTED_ROWS', trusted):
+        links = get_links(collection, fields)
+        item = get_link(link.id, collection, fields)
+
+    assert type(links[0]) is get_link_model(fields)
+    assert links[0].dict(by_alias=True) == {'_id': link.id, 'url': 'https://example.com'}
+    assert item.dict(by_alias=True) == links[0].dict(by_alias=True)
+    assert get_link_model(fields) is get_link_model(('url', '_id'))
+    assert get_link_model(None) is Link
+
+
+def test_get_links_version(test_urls_database):
+    """
+    Test collection version changes with stored links.
+    """
+    collection = test_urls_database
+    empty = get_links_version(collection)
+    add_link(Link(url='https://example.com', added_by='test_user'), collection)
+    version = get_links_version(collection)
+
+    assert version != empty
+    assert get_links_version(collection) == version
+
+
+def test_get_link_cached(test_urls_database):
+    """
+    Test links are read from the database once.
+    """
+    collection = test_urls_database
+    link = add_link(Link(url='https://example.com', added_by='test_user'), collection)
+
+    with patch.object(collection, 'find_one', wraps=collection.find_one) as find_one:
+        assert get_link(link.id, collection) == link
+        assert get_link(link.id, collection) == link
+        find_one.assert_called_once()
+        with pytest.raises(ValueError):
+            get_link(str(ObjectId()), collection)
+    assert get_link_cache(collection).stats()['links']['hits'] == 1
+
+
+def test_get_link_cache_disabled(test_urls_database):
+    """
+    Test links are always read from the database with disabled cache.
+    """
+    collection = test_urls_database
+    link = add_link(Link(url='https://example.com', added_by='test_user'), collection)
+
+    with patch.object(settings, 'LINK_CACHE_ENABLED', False):
+        with patch.object(collection, 'find_one', wraps=collection.find_one) as find_one:
+            get_link(link.id, collection)
+            get_link(link.id, collection)
+        assert find_one.call_count == 2
+        assert get_link_cache(collection) is None
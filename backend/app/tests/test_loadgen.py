@@ -0,0 +1,29 @@
+from benchmarks.loadgen import find_regressions
+
+
+def make_row(p50, errors=0, count=1000):
+    return {'count': count, 'errors': errors, 'p50_ms': p50, 'p95_ms': p50 * 2, 'p99_ms': p50 * 3}
+
+
+def test_find_regressions_latency():
+    """
+    Test percentiles worse than baseline by more than margin are reported.
+    """
+    baseline = {'list': make_row(10)}
+
+    assert find_regressions(baseline, {'list': make_row(11)}, 0.2) == []
+    assert len(find_regressions(baseline, {'list': make_row(13)}, 0.2)) == 3
+
+
+def test_find_regressions_errors():
+    """
+    Test fast failing requests do not pass the gate.
+    """
+    baseline = {'list': make_row(10)}
+
+    regressions = find_regressions(baseline, {'list': make_row(2, errors=1)}, 0.2)
+    assert regressions == ['list errors 1 (0.10%), baseline 0 (0.00%)']
+
+    baseline = {'list': make_row(10, errors=10)}
+    assert find_regressions(baseline, {'list': make_row(10, errors=11)}, 0.2) == []
+    assert len(find_regressions(baseline, {'list': make_row(5, errors=100)}, 0.2)) == 1
@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+
+from pymongo import monitoring
+
+from app.metrics import (
+    CommandMetrics,
+    Gauge,
+    Histogram,
+    PoolMetrics,
+    mongo_command_duration,
+    mongo_pool_checked_out,
+    mongo_pool_checkout_wait,
+    mongo_pool_connections
+)
+
+LINKS_URL = "/links/"
+METRICS_URL = "/metrics"
+
+
+def test_histogram_render():
+    """
+    Test histogram buckets are cumulative and labels escaped.
+    """
+    histogram = Histogram('test_seconds', 'Test.', ['route'], buckets=[0.1, 1])
+    histogram.observe(0.05, route='/a"b')
+    histogram.observe(0.5, route='/a"b')
+    histogram.observe(5, route='/a"b')
+    text = histogram.render()
+
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{route="/a\\"b",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{route="/a\\"b",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{route="/a\\"b",le="+Inf"} 3' in text
+    assert 'test_seconds_count{route="/a\\"b"} 3' in text
+    assert 'test_seconds_sum{route="/a\\"b"} 5.55' in text
+
+
+def test_gauge_render():
+    """
+    Test gauge values.
+    """
+    gauge = Gauge('test_in_flight', 'Test.', ['method'])
+    gauge.inc(method='GET')
+    gauge.inc(method='GET')
+    gauge.dec(method='GET')
+    assert 'test_in_flight{method="GET"} 1' in gauge.render()
+
+
+def test_command_metrics():
+    """
+    Test mongo commands are timed by collection and command name.
+    """
+    listener = CommandMetrics()
+    for request_id, command in enumerate([{'find': 'urls'}, {'getMore': 123, 'collection': 'urls'}]):
+        event = SimpleNamespace(
+            request_id=request_id, connection_id=('localhost', 27017), command_name=next(iter(command)),
+            command=command, duration_micros=1500)
+        listener.started(event)
+        listener.succeeded(event)
+
+    text = mongo_command_duration.render()
+    assert 'mongo_command_duration_seconds_count{collection="urls",command="find",outcome="success"}' in text
+    assert 'mongo_command_duration_seconds_count{collection="urls",command="getMore",outcome="success"}' in text
+    assert '123' not in text
+
+
+def test_pool_metrics():
+    """
+    Test pool checkouts are timed and connections counted.
+    """
+    listener = PoolMetrics()
+    address = ('pool-test', 27017)
+    listener.connection_created(monitoring.ConnectionCreatedEvent(address, 1))
+    listener.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+    listener.connection_checked_out(monitoring.ConnectionCheckedOutEvent(address, 1))
+    listener.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+    listener.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(address, 'timeout'))
+
+    assert 'mongo_pool_connections{address="pool-test:27017"} 1' in mongo_pool_connections.render()
+    assert 'mongo_pool_checked_out_connections{address="pool-test:27017"} 1' in mongo_pool_checked_out.render()
+    text = mongo_pool_checkout_wait.render()
+    assert 'mongo_pool_checkout_wait_seconds_count{outcome="success"}' in text
+    assert 'mongo_pool_checkout_wait_seconds_count{outcome="timeout"}' in text
+
+    listener.connection_checked_in(monitoring.ConnectionCheckedInEvent(address, 1))
+    listener.connection_closed(monitoring.ConnectionClosedEvent(address, 1, 'stale'))
+    assert 'mongo_pool_connections{address="pool-test:27017"} 0' in mongo_pool_connections.render()
+    assert 'mongo_pool_checked_out_connections{address="pool-test:27017"} 0' in mongo_pool_checked_out.render()
+
+
+def test_pool_metrics_handles_every_event(capsys):
+    """
+    Test pool events the listener does not measure are not reported as errors.
+    """
+    listeners = monitoring._EventListeners([PoolMetrics()])
+    address = ('pool-events', 27017)
+    listeners.publish_pool_created(address, {})
+    listeners.publish_pool_ready(address)
+    listeners.publish_connection_created(address, 1)
+    listeners.publish_connection_ready(address, 1)
+    listeners.publish_connection_check_out_started(address)
+    listeners.publish_connection_checked_out(address, 1)
+    listeners.publish_connection_checked_in(address, 1)
+    listeners.publish_connection_closed(address, 1, 'poolClosed')
+    listeners.publish_pool_cleared(address, None)
+    listeners.publish_pool_closed(address)
+
+    assert capsys.readouterr().err == ''
+
+
+def test_metrics_route(test_client, create_test_token):
+    """
+    Test requests are labelled by route template.
+    """
+    data = create_test_token
+    headers = {'Authorization': data.get('token')}
+    res = test_client.post(LINKS_URL, headers=headers, json={'url': 'https://example.com'})
+    link_id = res.json()['_id']
+    test_client.get(LINKS_URL + link_id, headers=headers)
+
+    response = test_client.get(METRICS_URL)
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'http_request_duration_seconds_count{method="GET",route="/links/{item_id}",status="200"}' in response.text
+    assert link_id not in response.text
+    assert 'app_cache_hits{cache="user",collection=""}' in response.text
+    assert 'app_pool_pending{pool="hash",executor="thread"}' in response.text
@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+import pytest
+from bson.objectid import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+from app.responses import FastJSONResponse, etag_matches, get_json_encoder, make_etag
+from models.schemas import Link, LinkCursorPage
+
+
+@pytest.mark.parametrize('backend', ['orjson', 'ujson'])
+def test_fast_json_response(backend):
+    """
+    Test content is encoded like jsonable_encoder does.
+    """
+    link_id = ObjectId()
+    link = Link(
+        _id=link_id, url='https://example.com/path', added_by='Someone',
+        date_added=datetime(2023, 5, 19, 19, 11, 22, 651000))
+    content = {
+        'page': LinkCursorPage(items=[link], next=None),
+        'id': link_id,
+        'date': datetime(2023, 5, 19),
+        'text': 'zażółć',
+    }
+
+    with patch.object(settings, 'JSON_BACKEND', backend):
+        body = FastJSONResponse(content).body
+
+    assert json.loads(body) == jsonable_encoder(content, custom_encoder={ObjectId: str})
+    assert json.loads(body)['page']['items'][0]['_id'] == str(link_id)
+    assert 'zażółć'.encode('utf-8') in body
+
+
+def test_get_json_encoder_fallback():
+    """
+    Test ujson is used when orjson is not installed.
+    """
+    with patch('app.responses.orjson', None):
+        assert get_json_encoder('orjson') is get_json_encoder('ujson')
+
+
+def test_get_json_encoder_unknown():
+    """
+    Test unknown backend is rejected with the valid choices.
+    """
+    with pytest.raises(ValueError, match='orjson, ujson'):
+        get_json_encoder('orjosn')
+
+
+def test_etag_matches():
+    """
+    Test If-None-Match comparison.
+    """
+    etag = make_etag('version', 'page=1')
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag != make_etag('version', 'page=2')
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_routes_use_fast_json_response(test_client, create_test_token):
+    """
+    Test routes are encoded with the configured backend.
+    """
+    data = create_test_token
+    dumps = Mock(return_value=b'{"message":"patched"}')
+    with patch.object(settings, 'JSON_BACKEND', 'orjson'), patch.dict('app.responses.JSON_ENCODERS', {'orjson': dumps}):
+        response = test_client.get('/user/me', headers={'Authorization': data.get('token')})
+    assert response.json() == {'message': 'patched'}
+    dumps.assert_called_once()
@@ -0,0 +1,103 @@
+from unittest.mock import patch
+
+from bson.objectid import ObjectId
+
+from app.config import settings
+from models.link_services import add_link, search_links
+from models.schemas import Link
+from models.search import LinkSearchIndex, tokenize, tokenize_link
+
+
+def build_index(urls):
+    """
+    Helper function that will build search index of given urls.
+    """
+    search_index = LinkSearchIndex(refresh_interval=60)
+    search_index._ready = True
+    ids = []
+    for url, added_by in urls:
+        document = {'_id': ObjectId(), 'url': url, 'added_by': added_by}
+        search_index.add(document)
+        ids.append(document['_id'])
+    return search_index, ids
+
+
+def test_tokenize_link():
+    """
+    Test link tokens come from host, path and author.
+    """
+    document = {'url': 'https://www.Example.com/blog/python-tips/?q=x', 'added_by': 'Someone'}
+    assert tokenize_link(document) == {'example', 'com', 'blog', 'python', 'tips', 'someone'}
+    assert tokenize('Python, TIPS!') == ['python', 'tips']
+
+
+def test_search_index():
+    """
+    Test search ranks links that match all words.
+    """
+    search_index, ids = build_index([
+        ('https://docs.python.org/3/tutorial', 'alice'),
+        ('https://example.com/python/tips', 'bob'),
+        ('https://example.com/rust', 'alice'),
+        ('https://pythonista.example.com/', 'bob'),
+    ])
+
+    found, total = search_index.search('python', 0, 10)
+    assert total == 3
+    # Exact matches rank above the prefix match, newest first
+    assert found == [ids[1], ids[0], ids[3]]
+
+    found, total = search_index.search('example alice', 0, 10)
+    assert found == [ids[2]]
+    assert total == 1
+
+    assert search_index.search('python', 1, 1) == ([ids[0]], 3)
+    assert search_index.search('golang', 0, 10) == ([], 0)
+    assert search_index.search('!!!', 0, 10) == ([], 0)
+
+
+def test_search_index_many_candidates():
+    """
+    Test intersection of a rare and a common word.
+    """
+    search_index, ids = build_index(
+        [(f'https://example.com/page{i}', 'alice') for i in range(200)]
+        + [('https://example.com/special', 'bob')])
+
+    assert search_index.search('example special', 0, 10) == ([ids[-1]], 1)
+    assert search_index.search('alice page19', 0, 200)[1] == 11
+    assert search_index.stats()['documents'] == 201
+
+
+def test_search_links(test_urls_database):
+    """
+    Test search links stored in the database.
+    """
+    collection = test_urls_database
+    add_link(Link(url='https://example.com/python', added_by='test_user'), collection)
+    other = add_link(Link(url='https://example.com/rust', added_by='test_user'), collection)
+
+    links, total = search_links('rust', collection, 1, 10)
+    assert total == 1
+    assert links == [other]
+
+    # Link added by another worker is found after refresh
+    collection.insert_one({'url': 'https://rust-lang.org', 'added_by': 'someone'})
+    assert search_links('rust', collection, 1, 10)[1] == 1
+    with patch('models.indexing.time.monotonic', return_value=10 ** 9):
+        links, total = search_links('rust', collection, 1, 10)
+    assert total == 2
+
+
+def test_search_links_text_index(test_urls_database):
+    """
+    Test search links with the database text index.
+    """
+    collection = test_urls_database
+    add_link(Link(url='https://docs.python.org/3/library', added_by='test_user'), collection)
+    add_link(Link(url='https://example.com/rust', added_by='test_user'), collection)
+
+    with patch.object(settings, 'SEARCH_BACKEND', 'mongo'):
+        links, total = search_links('python', collection, 1, 10)
+    assert total == 1
+    assert links[0].url == 'https://docs.python.org/3/library'
@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from app.slow_queries import SlowQueryLog, query_shape, slow_query_log, summarize_plan
+
+SLOW_QUERIES_URL = "/admin/slow-queries"
+
+
+def run_command(log: SlowQueryLog, command: dict, duration_ms: float, request_id: int = 1) -> None:
+    """
+    Publish started and succeeded events of given command.
+    """
+    event = SimpleNamespace(
+        request_id=request_id, connection_id=('localhost', 27017), database_name='links',
+        command_name=next(iter(command)), command=command, duration_micros=int(duration_ms * 1000))
+    log.started(event)
+    log.succeeded(event)
+
+
+def test_query_shape():
+    """
+    Test filter values are removed.
+    """
+    shape = query_shape({'email': 'user@example.com', 'url_hash': {'$in': [b'a', b'b']}, '$or': []})
+    assert shape == {'email': '?', 'url_hash': {'$in': ['?']}, '$or': []}
+
+
+def test_query_shape_clauses():
+    """
+    Test every clause and pipeline stage keeps its shape.
+    """
+    shape = query_shape({'$or': [{'url': 'a'}, {'added_by': {'$nin': ['x', 'y', 'z']}}]})
+    assert shape == {'$or': [{'url': '?'}, {'added_by': {'$nin': ['?']}}]}
+    assert query_shape({'$or': [{'url': 'a'}, {'added_by': 'b'}]}) != query_shape({'$or': [{'url': 'a'}]})
+
+    pipeline = [{'$match': {'added_by': 'a'}}, {'$group': {'_id': '$added_by', 'count': {'$sum': 1}}}]
+    assert query_shape(pipeline) == [{'$match': {'added_by': '?'}}, {'$group': {'_id': '?', 'count': {'$sum': '?'}}}]
+
+
+def test_slow_query_log():
+    """
+    Test only slow commands are recorded, newest first, in a bounded buffer.
+    """
+    log = SlowQueryLog(threshold_ms=100, size=2)
+    run_command(log, {'find': 'urls', 'filter': {'url': 'https://example.com'}}, 5)
+    assert log.entries() == []
+
+    run_command(log, {'find': 'user', 'filter': {'email': 'user@example.com'}, 'sort': {'_id': -1}}, 150)
+    run_command(log, {'insert': 'urls', 'documents': [{'url': 'https://example.com'}]}, 200, 2)
+    run_command(log, {'count': 'urls', 'query': {}}, 300, 3)
+
+    entries = log.entries()
+    assert [entry['command'] for entry in entries] == ['count', 'insert']
+    assert entries[1] == {
+        **entries[1], 'collection': 'urls', 'duration_ms': 200, 'filter': None, 'plan': None}
+    assert log.entries(limit=1) == entries[:1]
+    log.clear()
+    assert log.entries() == []
+
+
+def test_slow_query_explain():
+    """
+    Test plans of slow commands are captured in the background.
+    """
+    client = MagicMock()
+    client.__getitem__.return_value.command.return_value = {
+        'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN', 'filter': {}}}}
+    log = SlowQueryLog(threshold_ms=100, size=10, explain=True)
+    log.attach(client)
+
+    run_command(log, {'find': 'urls', 'filter': {'url': 'https://example.com'}, 'lsid': {}, '$db': 'links'}, 150)
+    log.shutdown(wait=True)
+
+    assert log.entries()[0]['plan'] == {'stages': ['COLLSCAN'], 'indexes': [], 'collscan': True}
+    explain = client.__getitem__.return_value.command.call_args.args[0]
+    assert explain == {'explain': {'find': 'urls', 'filter': {'url': 'https://example.com'}}, 'verbosity': 'queryPlanner'}
+
+
+def test_summarize_plan():
+    """
+    Test stages and indexes of nested plans.
+    """
+    explain = {'queryPlanner': {'winningPlan': {
+        'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'email_1'}}}}
+    assert summarize_plan(explain) == {'stages': ['FETCH', 'IXSCAN'], 'indexes': ['email_1'], 'collscan': False}
+
+
+def test_slow_queries_route(test_client, create_test_token_admin):
+    """
+    Test admins can read and clear slow commands.
+    """
+    data = create_test_token_admin
+    headers = {'Authorization': data.get('token')}
+    slow_query_log.clear()
+    run_command(slow_query_log, {'find': 'urls', 'filter': {'url': 'https://example.com'}}, 10 ** 6)
+
+    response = test_client.get(SLOW_QUERIES_URL, headers=headers)
+    assert response.status_code == 200
+    assert response.json()[0]['filter'] == {'url': '?'}
+    assert 'example.com' not in response.text
+
+    response = test_client.delete(SLOW_QUERIES_URL, headers=headers)
+    assert response.status_code == 204
+    assert slow_query_log.entries() == []
+
+
+def test_slow_queries_route_not_admin(test_client, create_test_token):
+    """
+    Test slow commands are available only to admins.
+    """
+    data = create_test_token
+    response = test_client.get(SLOW_QUERIES_URL, headers={'Authorization': data.get('token')})
+    assert response.status_code == 403
@@ -1,12 +1,17 @@
+from unittest.mock import patch
+
 from fastapi import status
 
+from models.hashing import hash_pool
 from models.schemas import DBUser
-from models.user_services import create_user
+from models.user_services import create_access_token, create_user, revoke_access_token, update_user_status
 
 USER_URL = "/user"
 TOKEN_URL = USER_URL + "/token"
 USER_DETAIL_URL = USER_URL + "/me"
 USER_PASSWORD_UPDATE = USER_URL + "/update-password"
+REFRESH_URL = USER_URL + "/refresh"
+LOGOUT_URL = USER_URL + "/logout"
 
 
 def test_get_token_user_not_exists(test_user_client):
@@ -343,3 +348,158 @@ def test_update_user_password(test_user_client, create_test_token):
     }
     response = test_user_client.post(TOKEN_URL, json=payload)
     assert response.status_code == status.HTTP_201_CREATED
+
+    # Token issued before the change is rejected
+    for url in (USER_DETAIL_URL, '/links/'):
+        response = test_user_client.get(url, headers={'Authorization': token})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_current_claims_without_user_lookup(test_client, create_test_token):
+    """
+    Test routes authorized by token claims do not read the user.
+    """
+    headers = {'Authorization': create_test_token.get('token')}
+    with patch('routes.users.get_cached_user_with_password') as get_user:
+        response = test_client.post('/links/', headers=headers, json={'url': 'https://example.com'})
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()['added_by'] == 'someone1'
+    get_user.assert_not_called()
+
+
+def test_current_claims_token_without_claims(test_client, create_test_token):
+    """
+    Test tokens issued before claims were added still work.
+    """
+    token = create_access_token({'sub': create_test_token.get('user').email})
+    response = test_client.get('/links/', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == status.HTTP_200_OK
+
+    token = create_access_token({'sub': 'missing@email.com'})
+    response = test_client.get('/links/', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_current_user_disabled(test_user_client, test_user_database, create_test_token):
+    """
+    Test disabled user is rejected even if it was cached before.
+    Tokens issued before disabling are invalid, new ones belong to an inactive user.
+    """
+    data = create_test_token
+    token = data.get('token')
+    response = test_user_client.get(
+        USER_DETAIL_URL, headers={'Authorization': token})
+    assert response.status_code == status.HTTP_200_OK
+
+    update_user_status(data.get('user').id, test_user_database, disabled=True)
+
+    response = test_user_client.get(
+        USER_DETAIL_URL, headers={'Authorization': token})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = test_user_client.post(TOKEN_URL, json={'email': 'example@email.com', 'password': 'password'})
+    token = f"Bearer {response.json()['access_token']}"
+    for url in (USER_DETAIL_URL, '/links/'):
+        response = test_user_client.get(url, headers={'Authorization': token})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_current_user_revoked_token(test_user_client, test_user_database, create_test_token):
+    """
+    Test revoked token is rejected even if it was cached before.
+    """
+    token = create_test_token.get('token')
+    response = test_user_client.get(
+        USER_DETAIL_URL, headers={'Authorization': token})
+    assert response.status_code == status.HTTP_200_OK
+
+    revoke_access_token(token.split()[1], test_user_database)
+
+    response = test_user_client.get(
+        USER_DETAIL_URL, headers={'Authorization': token})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def get_tokens(client) -> dict:
+    response = client.post(TOKEN_URL, json={'email': 'example@email.com', 'password': 'password'})
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.json()
+
+
+def test_refresh_token(test_user_client, create_test_token):
+    """
+    Test refresh endpoint issues access tokens without hashing the password.
+    """
+    tokens = get_tokens(test_user_client)
+    assert tokens['refresh_token']
+
+    with patch.object(hash_pool, 'run') as run:
+        response = test_user_client.post(REFRESH_URL, json={'refresh_token': tokens['refresh_token']})
+    run.assert_not_called()
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()['refresh_token'] == tokens['refresh_token']
+    access_token = response.json()['access_token']
+    assert access_token != tokens['access_token']
+
+    response = test_user_client.get(USER_DETAIL_URL, headers={'Authorization': f'Bearer {access_token}'})
+    assert response.status_code == status.HTTP_200_OK
+    # Access tokens are not refresh tokens
+    response = test_user_client.post(REFRESH_URL, json={'refresh_token': tokens['access_token']})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = test_user_client.get(USER_DETAIL_URL, headers={'Authorization': f'Bearer {tokens["refresh_token"]}'})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_refresh_token_after_password_update(test_user_client, create_test_token):
+    """
+    Test refresh tokens issued before password change are rejected.
+    """
+    tokens = get_tokens(test_user_client)
+    response = test_user_client.put(
+        USER_PASSWORD_UPDATE,
+        headers={'Authorization': f'Bearer {tokens["access_token"]}'},
+        json={'old_password': 'password', 'new_password': 'new_password'},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = test_user_client.post(REFRESH_URL, json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_logout(test_user_client, create_test_token):
+    """
+    Test logout revokes access and refresh tokens.
+    """
+    tokens = get_tokens(test_user_client)
+    headers = {'Authorization': f'Bearer {tokens["access_token"]}'}
+    assert test_user_client.get(USER_DETAIL_URL, headers=headers).status_code == status.HTTP_200_OK
+
+    response = test_user_client.post(LOGOUT_URL, headers=headers, json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    assert test_user_client.get(USER_DETAIL_URL, headers=headers).status_code == status.HTTP_401_UNAUTHORIZED
+    response = test_user_client.post(REFRESH_URL, json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    # Other sessions are not affected
+    headers = {'Authorization': create_test_token.get('token')}
+    assert test_user_client.get(USER_DETAIL_URL, headers=headers).status_code == status.HTTP_200_OK
+
+
+def test_get_token_hash_pool_full(test_user_client, test_user_database):
+    """
+    Test get token endpoint fails fast when password hashing pool is full.
+    """
+    data = DBUser(
+        username='someone1',
+        email='example@email.com',
+        password='password'
+    )
+    create_user(data, test_user_database)
+    payload = {
+        'email': data.email,
+        'password': 'password'
+    }
+    with patch.object(hash_pool, 'max_pending', 0):
+        response = test_user_client.post(TOKEN_URL, json=payload)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers.get('Retry-After')
@@ -10,6 +10,8 @@ from freezegun import freeze_time
 from pydantic import error_wrappers
 
 from models.schemas import DBUser
+from models.revocations import RevocationSet
+from models.token_versions import TokenVersions
 from models.user_services import (
     get_hashed_password,
     get_user,
@@ -18,7 +20,20 @@ from models.user_services import (
     get_user_with_password,
     authenticate_user,
     create_access_token,
+    decode_access_token,
+    decode_refresh_token,
+    create_access_token_from_refresh,
+    create_refresh_token,
+    get_revocation_collection,
+    get_token_version,
+    get_token_versions,
+    is_token_revoked,
+    revoke_access_token,
+    token_cache,
     update_user_password,
+    update_user_status,
+    get_cached_user_with_password,
+    user_cache,
 )
 from app.config import settings
 
@@ -271,3 +286,183 @@ def test_update_user_password(test_user_database):
     )
     user_obj = collection.find_one({'_id': ObjectId(obj.id)})
     assert pbkdf2_sha256.verify('new-password', user_obj.get('password')) is True
+
+
+def test_get_cached_user_with_password(test_user_database):
+    """
+    Test user is read from database once and then from the cache.
+    """
+    collection = test_user_database
+    data = DBUser(
+        username='user', password='password', email='example@email.com')
+    create_user(data, collection)
+    stats = user_cache.stats()
+
+    user_obj = get_cached_user_with_password(data.email, collection)
+    assert user_obj.email == data.email
+    assert user_cache.stats()['misses'] == stats['misses'] + 1
+
+    # Cached user is returned even if database changes behind the cache
+    collection.update_one({'email': data.email}, {'$set': {'username': 'changed'}})
+    assert get_cached_user_with_password(data.email, collection).username == 'user'
+    assert user_cache.stats()['hits'] == stats['hits'] + 1
+
+
+def test_cached_user_invalidated_on_password_update(test_user_database):
+    """
+    Test updating password removes the user from the cache.
+    """
+    collection = test_user_database
+    data = DBUser(
+        username='user', password='password', email='example@email.com')
+    obj = create_user(data, collection)
+    old_hash = get_cached_user_with_password(data.email, collection).password
+
+    update_user_password(
+        user_id=obj.id, old_password='password',
+        new_password='new-password', collection=collection
+    )
+    assert get_cached_user_with_password(data.email, collection).password != old_hash
+
+
+def test_update_user_status(test_user_database):
+    """
+    Test update user flags and invalidate cached user.
+    """
+    collection = test_user_database
+    data = DBUser(
+        username='user', password='password', email='example@email.com')
+    obj = create_user(data, collection)
+    assert get_cached_user_with_password(data.email, collection).disabled is False
+
+    user_obj = update_user_status(obj.id, collection, disabled=True, is_admin=True)
+    assert user_obj.disabled is True
+    assert user_obj.is_admin is True
+
+    cached = get_cached_user_with_password(data.email, collection)
+    assert cached.disabled is True
+    assert cached.is_admin is True
+
+    with pytest.raises(ValueError):
+        update_user_status(str(ObjectId()), collection, disabled=True)
+
+
+def test_decode_access_token_cached():
+    """
+    Test token signature is verified once and claims are cached until expiry.
+    """
+    token = create_access_token({'sub': 'someone'})
+    hits = token_cache.stats()['hits']
+    with patch('jwt.decode', wraps=jwt.decode) as decode:
+        assert decode_access_token(token)['sub'] == 'someone'
+        assert decode_access_token(token)['sub'] == 'someone'
+    decode.assert_called_once()
+    assert token_cache.stats()['hits'] == hits + 1
+    assert decode_access_token('invalid-token') is None
+
+
+def test_decode_access_token_cached_expires():
+    """
+    Test cached token is rejected once it expires.
+    """
+    with freeze_time("2023-05-27T10:00:00Z"):
+        with patch.object(settings, "ACCESS_TOKEN_EXPIRE_MINUTES", 10):
+            token = create_access_token({'sub': 'someone'})
+        assert decode_access_token(token) is not None
+    with freeze_time("2023-05-27T10:11:00Z"):
+        assert decode_access_token(token) is None
+    assert len(token_cache) == 0
+
+
+def test_revoke_access_token(test_user_database):
+    """
+    Test revoked token is rejected until it expires, also by other workers.
+    """
+    collection = test_user_database
+    token = create_access_token({'sub': 'someone'})
+    payload = decode_access_token(token)
+    assert not is_token_revoked(token, payload, collection)
+
+    revoke_access_token(token, collection)
+
+    assert is_token_revoked(token, payload, collection)
+    other = create_access_token({'sub': 'someone'})
+    assert not is_token_revoked(other, decode_access_token(other), collection)
+    # Set of another worker reads revocations from the database
+    revocation_set = RevocationSet(refresh_interval=60)
+    revocation_set.refresh(get_revocation_collection(collection))
+    assert payload['jti'] in revocation_set
+
+
+def test_refresh_token(test_user_database):
+    """
+    Test refresh tokens are not accepted as access tokens and the other way round.
+    """
+    create_user(DBUser(username='user', password='password', email='example@email.com'), test_user_database)
+    user = get_user_with_password('example@email.com', test_user_database)
+    refresh_token = create_refresh_token(user)
+    access_token = create_access_token({'sub': user.email}, user)
+
+    assert decode_access_token(refresh_token) is None
+    assert decode_refresh_token(access_token) is None
+    payload = decode_refresh_token(refresh_token)
+    assert payload['uid'] == user.id
+
+    new_payload = decode_access_token(create_access_token_from_refresh(payload))
+    assert new_payload['uid'] == user.id
+    assert new_payload['jti'] != payload['jti']
+    assert 'type' not in new_payload
+
+
+def test_create_access_token_with_user_claims(test_user_database):
+    """
+    Test token carries user id, role flags and token version.
+    """
+    create_user(DBUser(username='user', password='password', email='example@email.com'), test_user_database)
+    user = get_user_with_password('example@email.com', test_user_database)
+
+    payload = decode_access_token(create_access_token({'sub': user.email}, user))
+
+    assert payload['sub'] == user.email
+    assert payload['uid'] == user.id
+    assert payload['username'] == 'user'
+    assert payload['is_admin'] is False
+    assert payload['disabled'] is False
+    assert payload['token_version'] == 0
+
+
+def test_token_version_bumped(test_user_database):
+    """
+    Test password and status changes bump token version.
+    """
+    collection = test_user_database
+    user = create_user(DBUser(username='user', password='password', email='example@email.com'), collection)
+    assert get_token_version(user.id, collection) == 0
+
+    update_user_password(user.id, collection, 'new-password', 'password')
+    assert get_token_version(user.id, collection) == 1
+    update_user_status(user.id, collection, disabled=True)
+    assert get_token_version(user.id, collection) == 2
+    assert get_user_with_password('example@email.com', collection).token_version == 2
+
+
+def test_token_versions_refresh(test_user_database):
+    """
+    Test versions bumped by other workers are read on refresh.
+    """
+    collection = test_user_database
+    user = create_user(DBUser(username='user', password='password', email='example@email.com'), collection)
+    other = create_user(DBUser(username='other', password='password', email='other@email.com'), collection)
+    update_user_status(user.id, collection, is_admin=True)
+    # Map of another worker built before the second bump
+    versions = TokenVersions(refresh_interval=60)
+    versions.refresh(collection)
+    assert versions.is_fresh
+    assert versions.get(user.id) == 1
+
+    update_user_status(other.id, collection, disabled=True)
+    assert versions.get(other.id) == 0
+    versions.refresh(collection)
+    assert versions.get(other.id) == 1
+    assert versions.get(user.id) == 1
+    assert get_token_versions(collection).stats()['size'] == 2
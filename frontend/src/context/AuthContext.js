@@ -23,6 +23,17 @@ export const AuthProvider = ({children}) => {
 
     const history = useHistory()
 
+    // Store access token, its expiration time and refresh token
+    let saveTokens = (data) => {
+        setAuthToken(`${data.token_type} ${data.access_token}`);
+        localStorage.setItem('token',`${data.token_type} ${data.access_token}`);
+        localStorage.setItem('refreshToken', data.refresh_token);
+
+        const expirationDate = new Date(getExpirationTime(data.access_token) * 1000);
+        setExpirationDate(expirationDate.getTime());
+        localStorage.setItem('expirationDate', expirationDate.getTime());
+    };
+
     // Get user info
     let login = async (e) => {
         e.preventDefault();
@@ -39,13 +50,7 @@ export const AuthProvider = ({children}) => {
         // Set token
         let data = await response.json();
         if (response.ok){
-            setAuthToken(`${data.token_type} ${data.access_token}`);
-            localStorage.setItem('token',`${data.token_type} ${data.access_token}`);
-
-            // // Set expiration time to half of token expiration time
-            const expirationDate = new Date(getExpirationTime(data.access_token) * 1000);
-            setExpirationDate(expirationDate.getTime());
-            localStorage.setItem('expirationDate', expirationDate.getTime());
+            saveTokens(data);
 
             // Get user info
             let response = await fetch('/api/user/me', {
@@ -76,10 +81,37 @@ export const AuthProvider = ({children}) => {
         
     };
 
-    // Clear user info
+    // Get new access token with refresh token, logout if it is not valid
+    let refresh = async () => {
+        let response = await fetch('/api/user/refresh', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({'refresh_token': localStorage.getItem('refreshToken')})
+        });
+        if (response.ok){
+            saveTokens(await response.json());
+        }else{
+            logout();
+        }
+    };
+
+    // Revoke tokens and clear user info
     let logout = () => {
+        if (localStorage.getItem('token')){
+            fetch('/api/user/logout', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': localStorage.getItem('token')
+                },
+                body: JSON.stringify({'refresh_token': localStorage.getItem('refreshToken')})
+            });
+        }
         setAuthToken(null);
         localStorage.removeItem('token');
+        localStorage.removeItem('refreshToken');
         setExpirationDate(null);
         localStorage.removeItem('expirationDate');
         setUser(null);
@@ -96,10 +128,20 @@ export const AuthProvider = ({children}) => {
     }
 
     useEffect(()=> {
-        // Logout if token expired
-        if (expirationDate && new Date().getTime() > parseInt(expirationDate)){
-            logout();
+        if (!expirationDate){
+            return;
+        }
+        // Refresh access token a minute before it expires
+        const refreshIn = parseInt(expirationDate) - new Date().getTime() - 60000;
+        if (!localStorage.getItem('refreshToken')){
+            // Logged in before refresh tokens, logout if token expired
+            if (refreshIn + 60000 < 0){
+                logout();
+            }
+            return;
         }
+        const timeout = setTimeout(refresh, Math.max(refreshIn, 0));
+        return () => clearTimeout(timeout);
     }, [expirationDate])
 
 